@@ -1,12 +1,23 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, send_from_directory, Response, stream_with_context, abort, g
+import json
 from flask_cors import CORS
 import logging
+import math
 import os
-import requests
+import time
 from datetime import datetime
 from services.ollama_service import OllamaService
 from services.comfyui_service import ComfyUIService
 from services.comic_generator import ComicGenerator
+from services.book_generator import BookGenerator, EXPORT_FORMATS
+from services.job_queue import JobQueue, COMPLETED, FINISHED_STATUSES
+from services.renditions import RenditionStore
+from services.health_monitor import HealthMonitor
+from services.deadline import Deadline
+from services import metrics
+from services.workflow_cache import workflow_cache
+from utils.layout_engine import PAGE_SIZES, PAGE_LABELS, get_layout, normalize_page
+from utils.layout_presets import LAYOUT_PRESETS, DEFAULT_LAYOUT
 import config
 
 # Setup logging
@@ -19,8 +30,53 @@ app.config.from_object(config)
 
 # Initialize services
 ollama = OllamaService(config.OLLAMA_URL, config.OLLAMA_MODEL)
-comfyui = ComfyUIService(config.COMFYUI_URL)
-comic_gen = ComicGenerator(ollama, comfyui)
+# Every configured backend, so renders are balanced and fail over between them
+comfyui = ComfyUIService(backend_urls=config.COMFYUI_URLS or [config.COMFYUI_URL])
+renditions = RenditionStore(config.OUTPUT_DIR, config.RENDITIONS_DIR, config.COMIC_RENDITIONS)
+comic_gen = ComicGenerator(ollama, comfyui, renditions=renditions if config.RENDITIONS_EAGER else None)
+book_gen = BookGenerator(comic_gen)
+job_queue = JobQueue(comic_gen, config.JOB_DB_PATH, config.JOB_WORKERS)
+health = HealthMonitor(ollama, comfyui, config.HEALTH_CHECK_INTERVAL)
+metrics.watch_cache('panels', comfyui.image_cache)
+metrics.watch_cache('stories', ollama.story_cache)
+metrics.watch_cache('workflows', workflow_cache)
+
+@app.before_request
+def start_job_workers():
+    """Start job workers and health checks in the process that actually serves requests"""
+    job_queue.start()
+    health.start()
+
+def metrics_endpoint():
+    # Label by route pattern, not path, so job and file URLs don't each get their own series
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@app.before_request
+def start_request_timer():
+    if config.METRICS_ENABLED:
+        g.metrics_started = time.perf_counter()
+        metrics.HTTP_IN_PROGRESS.inc(endpoint=metrics_endpoint())
+
+@app.after_request
+def observe_request(response):
+    if 'metrics_started' in g:
+        metrics.HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.metrics_started, endpoint=metrics_endpoint(),
+                                             method=request.method, status=response.status_code)
+    return response
+
+@app.teardown_request
+def finish_request_timer(error=None):
+    if 'metrics_started' in g:
+        metrics.HTTP_IN_PROGRESS.dec(endpoint=metrics_endpoint())
+        if error is not None:
+            metrics.record_error('http', error)
+
+@app.route('/metrics')
+def get_metrics():
+    """Latency histograms, error and cache counters and in-flight gauges, in the Prometheus text format"""
+    if not config.METRICS_ENABLED:
+        abort(404)
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/')
 def index():
@@ -29,35 +85,22 @@ def index():
 
 @app.route('/api/status')
 def get_status():
-    """Check status of Ollama and ComfyUI services"""
-    try:
-        # Check Ollama
-        ollama_status = "checking"
-        try:
-            ollama_response = requests.get(f"{config.OLLAMA_URL}/api/tags", timeout=3)
-            ollama_status = "online" if ollama_response.status_code == 200 else "offline"
-        except:
-            ollama_status = "offline"
-        
-        # Check ComfyUI
-        comfyui_status = "checking"
-        try:
-            comfyui_response = requests.get(f"{config.COMFYUI_URL}/system_stats", timeout=3)
-            comfyui_status = "online" if comfyui_response.status_code == 200 else "offline"
-        except:
-            comfyui_status = "offline"
-        
-        return jsonify({
-            'ollama': ollama_status,
-            'comfyui': comfyui_status
-        })
-        
-    except Exception as e:
-        logger.error(f"Status check failed: {str(e)}")
-        return jsonify({
-            'ollama': 'offline',
-            'comfyui': 'offline'
-        }), 500
+    """Status of Ollama and ComfyUI, from the health monitor's last probe"""
+    status = health.snapshot()
+    checked_at = status['checked_at']
+    return jsonify({
+        **status,
+        'age': round(time.time() - checked_at, 3) if checked_at else None
+    })
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """Report hit/miss statistics for the generation caches"""
+    return jsonify({
+        'panels': comfyui.image_cache.stats() if comfyui.image_cache else None,
+        'stories': ollama.story_cache.stats(),
+        'workflows': workflow_cache.stats()
+    })
 
 @app.route('/api/generate_story', methods=['POST'])
 def generate_story():
@@ -67,14 +110,20 @@ def generate_story():
         prompt = data.get('prompt', '')
         style = data.get('style', 'anime')
         num_panels = data.get('num_panels', 4)
+        try:
+            deadline = request_deadline(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid timeout: {e}"}), 400
         
         logger.info(f"Generating story for prompt: {prompt[:100]}...")
         
-        # Use Ollama to expand the prompt into panel descriptions
-        panels = ollama.generate_comic_panels(prompt, num_panels, style)
+        # Use Ollama to expand the prompt into panel descriptions; regenerate asks for a new take
+        story_id, panels = ollama.generate_story(prompt, num_panels, style, deadline,
+                                                 regenerate=bool(data.get('regenerate')))
         
         return jsonify({
             'success': True,
+            'story_id': story_id,
             'panels': panels,
             'timestamp': datetime.now().isoformat()
         })
@@ -91,6 +140,10 @@ def generate_panel():
         panel_description = data.get('description', '')
         style = data.get('style', 'anime')
         panel_index = data.get('panel_index', 0)
+        try:
+            deadline = request_deadline(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid timeout: {e}"}), 400
         
         logger.info(f"Generating panel {panel_index}: {panel_description[:100]}...")
         
@@ -98,7 +151,8 @@ def generate_panel():
         image_path = comfyui.generate_image(
             prompt=panel_description,
             style=style,
-            seed=panel_index  # Use panel index as seed for consistency
+            seed=panel_index,  # Use panel index as seed for consistency
+            deadline=deadline
         )
         
         return send_file(image_path, mimetype='image/png')
@@ -115,11 +169,36 @@ def generate_comic():
         prompt = data.get('prompt', '')
         style = data.get('style', 'anime')
         num_panels = data.get('num_panels', 4)
-        layout_preset = data.get('layout_preset', 'Layout0')
-        page = data.get('page', 'A4-P')
+        layout_preset = data.get('layout_preset', DEFAULT_LAYOUT)
+        page = data.get('page', config.DEFAULT_PAGE)
         geometry = data.get('geometry', {})
+        margin = data.get('margin', config.LAYOUT_MARGIN)
+        gutter = data.get('gutter', config.LAYOUT_GUTTER)
+        story_id = data.get('story_id')
+        try:
+            deadline = request_deadline(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid timeout: {e}"}), 400
+        try:
+            seed = request_seed(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid seed: {e}"}), 400
+        
+        try:
+            output_format = comic_gen.output_format(data.get('output'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid output options: {e}"}), 400
+        try:
+            comic_gen.page_layout(layout_preset, page, geometry, margin, gutter)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid layout: {e}"}), 400
         
         logger.info(f"Generating complete comic: {prompt[:100]}...")
+        unrendered = []
+        
+        def on_progress(event, details):
+            if event == 'deadline_exceeded':
+                unrendered.extend(details['panels'])
         
         # Generate the complete comic
         comic_path = comic_gen.create_comic(
@@ -129,12 +208,22 @@ def generate_comic():
             layout_preset=layout_preset,
             page=page,
             geometry=geometry,
-            show_prompts=True  # Show prompts when ComfyUI unavailable
+            margin=margin,
+            gutter=gutter,
+            show_prompts=True,  # Show prompts when ComfyUI unavailable
+            story_id=story_id,
+            output_format=data.get('output'),
+            progress_callback=on_progress,
+            deadline=deadline,
+            seed=seed
         )
         
         return jsonify({
             'success': True,
-            'comic_url': f'/comics/{os.path.basename(comic_path)}',
+            **comic_urls(comic_path),
+            'format': output_format.format,
+            'partial': bool(unrendered),
+            'unrendered_panels': unrendered,
             'timestamp': datetime.now().isoformat()
         })
         
@@ -142,10 +231,303 @@ def generate_comic():
         logger.error(f"Comic generation failed: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/generate_book', methods=['POST'])
+def generate_book():
+    """Generate a multi-page comic exported as a PDF or CBZ"""
+    try:
+        data = request.json
+        try:
+            num_panels = int(data.get('num_panels', 8))
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': "num_panels must be an integer"}), 400
+        export = data.get('export', 'pdf')
+        if not 1 <= num_panels <= config.BOOK_MAX_PANELS:
+            return jsonify({'success': False, 'error': f"num_panels must be between 1 and {config.BOOK_MAX_PANELS}"}), 400
+        if export not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': f"export must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+        try:
+            page = normalize_page(data.get('page'))
+            unknown = [layout for layout in data.get('layouts') or [] if layout not in LAYOUT_PRESETS]
+            if unknown:
+                raise ValueError(f"Unknown layout presets: {', '.join(unknown)}")
+            margin = int(data.get('margin', config.LAYOUT_MARGIN))
+            gutter = int(data.get('gutter', config.LAYOUT_GUTTER))
+            for layout in data.get('layouts') or [DEFAULT_LAYOUT]:
+                get_layout(layout, page, margin, gutter)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid layout: {e}"}), 400
+        try:
+            deadline = request_deadline(data, config.BOOK_DEADLINE)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid timeout: {e}"}), 400
+        try:
+            seed = request_seed(data)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid seed: {e}"}), 400
+        
+        logger.info(f"Generating {num_panels}-panel book: {data.get('prompt', '')[:100]}...")
+        unrendered = []
+        
+        def on_progress(event, details):
+            if event == 'deadline_exceeded':
+                unrendered.extend(details['panels'])
+        
+        book = book_gen.create_book(
+            prompt=data.get('prompt', ''),
+            style=data.get('style', 'anime'),
+            num_panels=num_panels,
+            layouts=data.get('layouts'),
+            page=page,
+            gutter=gutter,
+            margin=margin,
+            export=export,
+            story_id=data.get('story_id'),
+            progress_callback=on_progress,
+            deadline=deadline,
+            seed=seed
+        )
+        
+        return jsonify({
+            'success': True,
+            'book_url': f"/books/{os.path.basename(book['path'])}",
+            'pages': book['pages'],
+            'partial': bool(unrendered),
+            'unrendered_panels': unrendered,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except Exception as e:
+        logger.error(f"Book generation failed: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/layouts')
+def get_layouts():
+    """Layout presets and page formats, with each preset's cells in page pixels"""
+    try:
+        page = normalize_page(request.args.get('page'))
+        margin = request.args.get('margin', config.LAYOUT_MARGIN, type=int)
+        gutter = request.args.get('gutter', config.LAYOUT_GUTTER, type=int)
+        layouts = []
+        for layout_id, preset in LAYOUT_PRESETS.items():
+            layouts.append({
+                'id': layout_id,
+                **preset,
+                'layout': get_layout(layout_id, page, margin, gutter).as_dict()
+            })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'default_layout': DEFAULT_LAYOUT,
+        'default_page': config.DEFAULT_PAGE,
+        'page': page,
+        'pages': [{'id': name, 'label': PAGE_LABELS[name], 'width': size[0], 'height': size[1]}
+                  for name, size in PAGE_SIZES.items()],
+        'layouts': layouts
+    })
+
+def comic_job_params(data):
+    """Extract create_comic arguments from a generation request"""
+    return {
+        'prompt': data.get('prompt', ''),
+        'style': data.get('style', 'anime'),
+        'num_panels': data.get('num_panels', 4),
+        'layout_preset': data.get('layout_preset', DEFAULT_LAYOUT),
+        'page': data.get('page', config.DEFAULT_PAGE),
+        'geometry': data.get('geometry', {}),
+        'margin': data.get('margin', config.LAYOUT_MARGIN),
+        'gutter': data.get('gutter', config.LAYOUT_GUTTER),
+        'show_prompts': True,
+        'story_id': data.get('story_id'),
+        'output_format': data.get('output'),
+        'timeout': data.get('timeout'),
+        'seed': data.get('seed')
+    }
+
+def request_deadline(data, default=config.REQUEST_DEADLINE):
+    """Time budget for a request: its 'timeout' in seconds, capped at REQUEST_DEADLINE_MAX"""
+    seconds = float(data.get('timeout') or default)
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError("timeout must be a positive number of seconds")
+    return Deadline(min(seconds, config.REQUEST_DEADLINE_MAX))
+
+def request_seed(data):
+    """A request's 'seed' for repeatable panels, or None to render with random seeds"""
+    seed = data.get('seed')
+    if seed is None or seed == '':
+        return None
+    if isinstance(seed, bool) or int(seed) != float(seed):
+        raise ValueError("seed must be an integer")
+    return int(seed)
+
+def comic_urls(comic_path):
+    """URLs of a finished comic and its renditions"""
+    comic_url = f"/comics/{os.path.basename(comic_path)}"
+    return {
+        'comic_url': comic_url,
+        'renditions': {name: f"{comic_url}?rendition={name}" for name in renditions.names}
+    }
+
+# Directories panel images may be served from, by URL prefix
+PANEL_SOURCES = {
+    'cache': config.IMAGE_CACHE_DIR,
+    'temp': config.TEMP_DIR,
+    'comfyui': config.COMFYUI_OUTPUT_DIR
+}
+
+def panel_url(image_path):
+    """URL for a rendered panel image, or None if it isn't in a served directory"""
+    if not image_path:
+        return None
+    directory = os.path.dirname(os.path.abspath(image_path))
+    for source, source_dir in PANEL_SOURCES.items():
+        if directory == os.path.abspath(source_dir):
+            return f"/panels/{source}/{os.path.basename(image_path)}"
+    return None
+
+def stream_event(event, data):
+    """Public form of a job progress event, with file paths turned into URLs"""
+    if event == 'story_ready':
+        return {'panels': data['panels']}
+    if event == 'panel_described':
+        return {'index': data['index'], 'panel': data['panel']}
+    if event in ('panel_done', 'panel_cache_hit'):
+        return {'index': data['index'], 'image_url': panel_url(data.get('image_path'))}
+    if event == 'panel_prompt_queued':
+        return {'index': data['index'], 'prompt_id': data['prompt_id']}
+    if event == 'comic_assembled':
+        return comic_urls(data['comic_path'])
+    if event in FINISHED_STATUSES:
+        payload = {'error': data.get('error')}
+        if data.get('result'):
+            payload.update(comic_urls(data['result']))
+        return payload
+    return data
+
+def job_response(job):
+    """Public view of a job record"""
+    response = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at']
+    }
+    if job['status'] == COMPLETED and job['result']:
+        response.update(comic_urls(job['result']))
+    return response
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue a comic for background generation"""
+    try:
+        params = comic_job_params(request.json)
+        try:
+            comic_gen.output_format(params['output_format'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid output options: {e}"}), 400
+        try:
+            comic_gen.page_layout(params['layout_preset'], params['page'], params['geometry'],
+                                  params['margin'], params['gutter'])
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid layout: {e}"}), 400
+        try:
+            # The budget starts when a worker picks the job up; only validate it here
+            params['timeout'] = request_deadline(params).seconds
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid timeout: {e}"}), 400
+        try:
+            params['seed'] = request_seed(params)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': f"Invalid seed: {e}"}), 400
+        logger.info(f"Queueing comic job: {params['prompt'][:100]}...")
+        job_id = job_queue.submit(params)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+        
+    except Exception as e:
+        logger.error(f"Job submission failed: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Job status with per-panel progress"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, **job_response(job)})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    if job_queue.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': job_queue.cancel(job_id)})
+
+@app.route('/api/jobs/<job_id>/result')
+def get_job_result(job_id):
+    """Final comic URL once the job has completed"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if job['status'] != COMPLETED:
+        return jsonify({'success': False, 'status': job['status'], 'error': job['error']}), 409
+    return jsonify({'success': True, **comic_urls(job['result'])})
+
+@app.route('/api/jobs/<job_id>/events')
+def stream_job_events(job_id):
+    """Server-sent events for a job: story, each panel as it lands, final comic"""
+    if job_queue.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('after', '0')
+    after = int(last_event_id) if last_event_id.isdigit() else 0
+    
+    def generate():
+        for item in job_queue.events(job_id, after=after):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event, data = item
+            yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(stream_event(event, data))}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/panels/<source>/<filename>')
+def serve_panel(source, filename):
+    """Serve individual panel images while a comic is still being generated"""
+    if source not in PANEL_SOURCES:
+        abort(404)
+    return send_from_directory(os.path.abspath(PANEL_SOURCES[source]), filename, mimetype='image/png')
+
 @app.route('/comics/<filename>')
 def serve_comic(filename):
-    """Serve generated comic images"""
-    return send_file(os.path.join(config.OUTPUT_DIR, filename))
+    """Serve generated comic images, or a smaller rendition with ?rendition=thumb|screen|print"""
+    try:
+        path = renditions.path_for(filename, request.args.get('rendition', 'print'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if path is None:
+        abort(404)
+    
+    # Names are random and files are never rewritten, so browsers may keep them forever;
+    # the ETag still lets a revalidating client get a 304
+    response = send_file(os.path.abspath(path), conditional=True, etag=True)
+    response.headers['Cache-Control'] = f"public, max-age={config.COMIC_CACHE_MAX_AGE}, immutable"
+    return response
+
+@app.route('/books/<filename>')
+def serve_book(filename):
+    """Serve exported multi-page comics"""
+    return send_from_directory(os.path.abspath(config.BOOK_DIR), filename, as_attachment=True)
 
 if __name__ == '__main__':
     os.makedirs(config.OUTPUT_DIR, exist_ok=True)
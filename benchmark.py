@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Benchmark
+Drives story and comic generation at a set concurrency against local fake
+Ollama and ComfyUI servers, and reports latency percentiles, throughput,
+peak memory and per-stage timings. Needs no GPU or LLM, so any performance
+change can be measured before and after on the same box.
+
+    python benchmark.py --scenario comic --requests 20 --concurrency 4
+    python benchmark.py --render-time 2 --backends 2 --comfyui-fail-rate 0.1 --json bench.json
+
+Scenarios:
+    story      POST /api/generate_story
+    comic      POST /api/generate_comic
+    generator  ComicGenerator.create_comic, with per-stage pipeline timings
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import config
+from fakes.comfyui_server import FakeComfyUIServer
+from fakes.ollama_server import FakeOllamaServer
+
+SCENARIOS = ('story', 'comic', 'generator')
+
+# App services swapped for ones pointed at the fakes for the run, and put back afterwards
+PATCHED_APP = ('ollama', 'comfyui', 'comic_gen', 'health')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, if the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return round(peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+class ScenarioResult:
+    """Timings of every request in one scenario run"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = []
+        self.stage_timings = []  # One {stage: timing} per comic, from the generator's 'stage_timings' event
+        self.wall_seconds = 0.0
+        self.traced_peak_mb = None
+        self.lock = threading.Lock()
+
+    def record(self, seconds, error=None, stage_timings=None):
+        with self.lock:
+            if error is None:
+                self.latencies.append(seconds)
+            else:
+                self.errors.append(str(error))
+            if stage_timings:
+                self.stage_timings.append(stage_timings)
+
+    def stages(self):
+        """Mean busy and active seconds per stage across the comics"""
+        summary = {}
+        for timings in self.stage_timings:
+            for stage, timing in timings.items():
+                entry = summary.setdefault(stage, {'busy_seconds': 0.0, 'active_seconds': 0.0, 'items': 0})
+                entry['busy_seconds'] += timing['busy_seconds']
+                entry['active_seconds'] += timing['active_seconds']
+                entry['items'] += timing['items']
+        runs = len(self.stage_timings) or 1
+        return {stage: {key: round(value / runs, 3) for key, value in entry.items()}
+                for stage, entry in summary.items()}
+
+    def as_dict(self):
+        latencies = self.latencies
+        report = {
+            'scenario': self.name,
+            'requests': len(latencies) + len(self.errors),
+            'errors': len(self.errors),
+            'wall_seconds': round(self.wall_seconds, 3),
+            'throughput_per_second': round(len(latencies) / self.wall_seconds, 3) if self.wall_seconds else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+            'traced_peak_mb': self.traced_peak_mb,
+        }
+        if latencies:
+            report['latency_seconds'] = {
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'mean': round(sum(latencies) / len(latencies), 3),
+                'max': round(max(latencies), 3),
+            }
+        if self.stage_timings:
+            report['stages'] = self.stages()
+        if self.errors:
+            report['first_errors'] = self.errors[:3]
+        return report
+
+
+class Benchmark:
+    def __init__(self, args):
+        self.args = args
+        self.ollama_server = None
+        self.comfyui_servers = []
+        self.app = None
+        self._generator = None
+        self._saved_app = {}
+        # Requests build the app and generator on first use, possibly several at once
+        self._setup_lock = threading.Lock()
+
+    def start_servers(self):
+        args = self.args
+        self.ollama_server = FakeOllamaServer(
+            latency=args.http_latency, generation_time=args.llm_time, fail_rate=args.ollama_fail_rate,
+            seed=args.seed
+        ).start()
+        self.comfyui_servers = [FakeComfyUIServer(
+            render_time=args.render_time, render_jitter=args.render_jitter, latency=args.http_latency,
+            fail_rate=args.comfyui_fail_rate, websocket=not args.no_websocket, seed=args.seed
+        ).start() for _ in range(args.backends)]
+
+    def services(self):
+        """
+        New Ollama and ComfyUI services pointed at the fakes. They're built with
+        explicit URLs rather than from config, which modules importing names
+        from it have already read.
+        """
+        from services.comfyui_service import ComfyUIService
+        from services.ollama_service import OllamaService
+        comfyui = ComfyUIService(backend_urls=[server.url for server in self.comfyui_servers],
+                                 image_cache=None if self.args.cache else False)
+        return OllamaService(self.ollama_server.url, config.OLLAMA_MODEL), comfyui
+
+    def stop_servers(self):
+        services = [self._generator.comfyui] if self._generator else []
+        if self.app is not None:
+            self.app.health.stop()
+            services.append(self.app.comfyui)
+        for comfyui in services:
+            for backend in comfyui.pool.backends:
+                backend.tracker.stop()
+        for server in [self.ollama_server] + self.comfyui_servers:
+            if server is not None:
+                server.stop()
+        for name, value in self._saved_app.items():
+            setattr(self.app, name, value)
+
+    def flask_app(self):
+        with self._setup_lock:
+            if self.app is None:
+                self._patch_app()
+        return self.app
+
+    def _patch_app(self):
+        import app
+        from services.comic_generator import ComicGenerator
+        from services.health_monitor import HealthMonitor
+        # The story and comic routes only go through these
+        self._saved_app = {name: getattr(app, name) for name in PATCHED_APP}
+        app.ollama, app.comfyui = self.services()
+        app.comic_gen = ComicGenerator(app.ollama, app.comfyui)
+        app.health = HealthMonitor(app.ollama, app.comfyui, config.HEALTH_CHECK_INTERVAL)
+        self.app = app
+
+    def run(self, scenario):
+        request = getattr(self, f"_{scenario}_request")
+        # Warm-up requests open connections and load the workflow; they aren't counted
+        for i in range(self.args.warmup):
+            request(f"warm-up {i}", ScenarioResult('warm-up'))
+
+        result = ScenarioResult(scenario)
+        if self.args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            # Distinct prompts, so story caching doesn't turn requests into lookups
+            list(executor.map(lambda i: request(f"benchmark {scenario} {i}", result), range(self.args.requests)))
+        result.wall_seconds = time.perf_counter() - started
+        if self.args.trace_memory:
+            result.traced_peak_mb = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+            tracemalloc.stop()
+        return result
+
+    def _timed(self, result, call):
+        started = time.perf_counter()
+        try:
+            stage_timings = call()
+            result.record(time.perf_counter() - started, stage_timings=stage_timings)
+        except Exception as e:
+            result.record(time.perf_counter() - started, error=e)
+
+    def _story_request(self, prompt, result):
+        def call():
+            response = self.flask_app().app.test_client().post('/api/generate_story', json={
+                'prompt': prompt, 'num_panels': self.args.panels, 'style': 'comic'
+            })
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.get_json()}")
+        self._timed(result, call)
+
+    def _comic_request(self, prompt, result):
+        def call():
+            response = self.flask_app().app.test_client().post('/api/generate_comic', json={
+                'prompt': prompt, 'num_panels': self.args.panels, 'style': 'comic',
+                'layout_preset': self.args.layout
+            })
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.get_json()}")
+        self._timed(result, call)
+
+    def _generator_request(self, prompt, result):
+        def call():
+            timings = {}
+
+            def on_progress(event, data):
+                if event == 'stage_timings':
+                    timings.update(data['timings'])
+
+            self.generator.create_comic(prompt, 'comic', self.args.panels, layout_preset=self.args.layout,
+                                        progress_callback=on_progress)
+            return timings
+        self._timed(result, call)
+
+    @property
+    def generator(self):
+        # Built directly so it uses every fake backend and no page renditions
+        with self._setup_lock:
+            if self._generator is None:
+                from services.comic_generator import ComicGenerator
+                self._generator = ComicGenerator(*self.services())
+        return self._generator
+
+
+def print_report(report):
+    print(f"\n{report['scenario']}: {report['requests']} requests, {report['errors']} errors, "
+          f"{report['wall_seconds']:.2f}s, {report['throughput_per_second']:.2f} req/s")
+    latency = report.get('latency_seconds')
+    if latency:
+        print(f"  latency  p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s  "
+              f"max {latency['max']:.3f}s")
+    memory = f"  memory   peak RSS {report['peak_rss_mb']} MB"
+    if report['traced_peak_mb'] is not None:
+        memory += f", traced Python peak {report['traced_peak_mb']} MB"
+    print(memory)
+    for stage, timing in report.get('stages', {}).items():
+        print(f"  stage    {stage:<10} busy {timing['busy_seconds']:.3f}s  active {timing['active_seconds']:.3f}s  "
+              f"items {timing['items']:g}")
+    for error in report.get('first_errors', []):
+        print(f"  error    {error}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark comic generation against fake Ollama and ComfyUI servers")
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--requests', type=int, default=8, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=2, help="Requests in flight at once")
+    parser.add_argument('--warmup', type=int, default=1, help="Uncounted requests before each scenario")
+    parser.add_argument('--panels', type=int, default=4)
+    parser.add_argument('--layout', default='Layout0')
+    parser.add_argument('--backends', type=int, default=1, help="Fake ComfyUI servers (generator scenario)")
+    parser.add_argument('--render-time', type=float, default=0.2, help="Seconds per ComfyUI prompt")
+    parser.add_argument('--render-jitter', type=float, default=0.05, help="Up to this much longer per prompt")
+    parser.add_argument('--llm-time', type=float, default=0.3, help="Seconds for the fake LLM to write a story")
+    parser.add_argument('--http-latency', type=float, default=0.0, help="Added to every fake server response")
+    parser.add_argument('--ollama-fail-rate', type=float, default=0.0)
+    parser.add_argument('--comfyui-fail-rate', type=float, default=0.0)
+    parser.add_argument('--no-websocket', action='store_true', help="Make ComfyUI completion fall back to polling")
+    parser.add_argument('--cache', action='store_true', help="Keep the panel image cache on")
+    parser.add_argument('--trace-memory', action='store_true', help="Also report tracemalloc's peak (slower)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed for jitter and failure injection")
+    parser.add_argument('--json', help="Write the reports to this file as JSON")
+    parser.add_argument('--verbose', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Set up before app.py's own basicConfig, whose per-panel INFO lines would swamp the report
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    benchmark = Benchmark(args)
+    benchmark.start_servers()
+    reports = []
+    try:
+        for scenario in (SCENARIOS if args.scenario == 'all' else (args.scenario,)):
+            report = benchmark.run(scenario).as_dict()
+            print_report(report)
+            reports.append(report)
+    finally:
+        benchmark.stop_servers()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'reports': reports}, f, indent=2)
+        print(f"\nWrote {args.json}")
+    return reports
+
+
+if __name__ == "__main__":
+    main()
@@ -4,20 +4,100 @@ import os
 SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 DEBUG = True
 
+# HTTP client settings (shared by the Ollama and ComfyUI services)
+HTTP_POOL_SIZE = 16  # Keep-alive connections per host; keep >= COMFYUI_MAX_IN_FLIGHT
+HTTP_CONNECT_TIMEOUT = 3.05  # Seconds to establish a connection
+HTTP_READ_TIMEOUT = 30  # Seconds to wait for a response
+HTTP_RETRIES = 2  # Retries for idempotent requests on connection errors / 502-504
+HTTP_RETRY_BACKOFF = 0.3  # Exponential backoff factor between retries
+
+# Overall time budgets in seconds; panels not rendered in time come back as placeholders
+REQUEST_DEADLINE = 600  # Stories, panels and single-page comics
+BOOK_DEADLINE = 3600
+REQUEST_DEADLINE_MAX = 3600  # Largest 'timeout' a request may ask for
+
 # Ollama settings
 OLLAMA_URL = "http://localhost:11434"
 OLLAMA_MODEL = "llama3.1:8b"  # Use a model that outputs proper JSON
+OLLAMA_READ_TIMEOUT = 300  # Story generation can take minutes on a busy box
+OLLAMA_STREAMING = True  # Start rendering panels while the LLM is still writing the story
+STORY_CACHE_TTL = 3600  # Seconds a generated story stays reusable
+STORY_CACHE_MAX_ENTRIES = 256
 
 # ComfyUI settings
 COMFYUI_URL = "http://127.0.0.1:8000"
+# All ComfyUI servers to spread renders across; each prompt goes to the least-loaded healthy one
+COMFYUI_URLS = [u.strip() for u in os.environ.get('COMFYUI_URLS', COMFYUI_URL).split(',') if u.strip()]
+COMFYUI_POOL_REFRESH_INTERVAL = 5  # Seconds between /queue probes when routing
+COMFYUI_FAILURE_COOLDOWN = 30  # Seconds before retrying a backend that failed
 COMFYUI_WORKFLOW = "workflows/comic_workflow_api.json"  # API format workflow
+COMFYUI_MAX_IN_FLIGHT = 4  # Max prompts (panels or batches) in ComfyUI at once (1 = sequential)
+COMFYUI_BATCH_SIZE = 1  # Panels rendered per ComfyUI prompt; >1 loads the models once per group of panels
+COMFYUI_USE_WEBSOCKET = True  # Track completion over /ws instead of polling /history
+COMFYUI_VALIDATE_WORKFLOW = True  # Check workflows against /object_info (cached per server) before queueing
+COMFYUI_POLL_INTERVAL = 0.5  # Initial /history poll delay when the websocket is down
+COMFYUI_POLL_MAX_INTERVAL = 5  # Poll backoff cap in seconds
+COMFYUI_FETCH_IMAGES = True  # Download results over /view; False reads them from COMFYUI_OUTPUT_DIR
+COMFYUI_OUTPUT_DIR = "comfyui_output"  # ComfyUI's output directory, when it is shared with this host
+
+# Panel image cache (keyed on the fully patched workflow)
+IMAGE_CACHE_ENABLED = True
+IMAGE_CACHE_DIR = "output/cache/panels"
+IMAGE_CACHE_MAX_BYTES = 2 * 1024 ** 3  # LRU eviction beyond 2 GB
+
+# Comic page encoding (each request may override these)
+OUTPUT_FORMAT = "png"  # png, webp or jpeg
+OUTPUT_QUALITY = 90  # WebP / JPEG quality
+OUTPUT_PNG_COMPRESS_LEVEL = 3  # 0-9; above 3 is much slower for a few percent smaller files
+OUTPUT_LOSSLESS_WEBP = False
 
 # Output directories
 OUTPUT_DIR = "output/comics"
 TEMP_DIR = "output/temp"
 
+# Smaller renditions of finished pages, served as /comics/<file>?rendition=<name>
+COMIC_RENDITIONS = {'thumb': 320, 'screen': 1200}  # Name -> max width in pixels
+RENDITIONS_DIR = "output/comics/renditions"
+RENDITIONS_EAGER = True  # Build them in the background as each page is saved, not on first request
+COMIC_CACHE_MAX_AGE = 31536000  # Comic files never change once written
+
+# Multi-page books
+BOOK_DIR = "output/books"
+BOOK_PROCESSES = 0  # Page assembly processes; 0 = one per CPU core
+BOOK_DPI = 300  # Pages are rendered at this resolution (see page dimensions)
+BOOK_PAGE_QUALITY = 90  # JPEG quality of pages inside PDF / CBZ exports
+BOOK_MAX_PANELS = 48
+
+# Background comic jobs
+JOB_DB_PATH = "output/jobs.db"
+JOB_WORKERS = 2  # Comics generated at the same time
+
+# Background health checks, served by /api/status and used to route around dead services
+HEALTH_CHECK_INTERVAL = 5  # Seconds between probes of Ollama and every ComfyUI backend
+HEALTH_PROBE_TIMEOUT = 2
+HEALTH_MAX_AGE = 3 * HEALTH_CHECK_INTERVAL  # Older results are ignored
+
+# Prometheus metrics (latency histograms, error and cache counters) served at /metrics
+METRICS_ENABLED = True
+
 # Comic generation settings
 DEFAULT_STYLE = "anime"
 DEFAULT_PANELS = 4
 PANEL_WIDTH = 512
 PANEL_HEIGHT = 768
+# Panels are rendered at their layout cell's shape and size rather than the workflow's fixed one
+PANEL_RENDER_TO_CELL = True
+PANEL_RENDER_PIXELS = 768 * 1152  # Latent area the checkpoint works best at
+PANEL_RENDER_MULTIPLE = 64  # Latent sides are rounded to a multiple of this
+PANEL_RENDER_MIN_SIDE = 512
+PANEL_RENDER_MAX_SIDE = 1536
+PANEL_UPSCALE_MIN = 1.15  # Cells needing less than this are resized instead of upscaled by node 42
+PANEL_UPSCALE_MAX = 2.0
+PANEL_FIT_MODE = "cover"  # cover, contain, crop or stretch; a layout may set panel.fit or cell.fit
+
+# Page layout (page sizes are in pixels at 300 DPI, see utils/layout_engine.py)
+DEFAULT_PAGE = "A4-P"
+LAYOUT_MARGIN = 24  # Outer page margin in pixels
+LAYOUT_GUTTER = 8  # Space between panels, in thousandths of the page's content box
+PANEL_BORDER_PX = 4  # 0 disables panel borders
+PANEL_BORDER_COLOR = "#000000"
@@ -0,0 +1 @@
+# Make fakes a Python package
@@ -0,0 +1,417 @@
+"""
+Fake ComfyUI Server
+A small in-process stand-in for the ComfyUI HTTP and websocket API, used to
+exercise the services without a GPU
+"""
+
+import io
+import json
+import uuid
+import time
+import random
+import base64
+import hashlib
+import struct
+import socket
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class _WebSocketClient:
+    """Server side of one websocket connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def send_json(self, payload):
+        data = json.dumps(payload).encode('utf-8')
+        header = bytearray([0x81])
+        if len(data) < 126:
+            header.append(len(data))
+        elif len(data) < 65536:
+            header.append(126)
+            header += struct.pack('!H', len(data))
+        else:
+            header.append(127)
+            header += struct.pack('!Q', len(data))
+        with self.lock:
+            self.connection.sendall(bytes(header) + data)
+
+    def close(self):
+        try:
+            with self.lock:
+                self.connection.sendall(b'\x88\x00')
+        except OSError:
+            pass
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections, e.g. on stop(), aren't worth a traceback
+        logger.debug(f"fake comfyui: request from {client_address} failed", exc_info=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections.add(self.connection)
+
+    def finish(self):
+        with self.server.fake.lock:
+            self.server.fake.connections.discard(self.connection)
+        super().finish()
+
+    def log_message(self, format, *args):
+        logger.debug("fake comfyui: " + format % args)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        time.sleep(fake.latency)
+
+        if url.path == '/ws':
+            return self._handle_websocket(parse_qs(url.query).get('clientId', [''])[0])
+        if url.path == '/system_stats':
+            return self._send_json(fake.system_stats())
+        if url.path == '/object_info' and fake.object_info is not None:
+            fake.object_info_requests += 1
+            return self._send_json(fake.object_info)
+        if url.path == '/queue':
+            return self._send_json(fake.queue_state())
+        if url.path.startswith('/history/'):
+            prompt_id = url.path[len('/history/'):]
+            with fake.lock:
+                entry = fake.history.get(prompt_id)
+            return self._send_json({prompt_id: entry} if entry else {})
+        if url.path == '/view':
+            filename = parse_qs(url.query).get('filename', [''])[0]
+            with fake.lock:
+                data = fake.images.get(filename)
+            if data is None:
+                return self._send_json({'error': 'not found'}, status=404)
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(fake.latency)
+
+        if self.path == '/prompt':
+            node_errors = fake.validate(payload.get('prompt', {}))
+            if node_errors:
+                error = {'type': 'prompt_outputs_failed_validation', 'message': 'Prompt outputs failed validation',
+                         'details': '', 'extra_info': {}}
+                return self._send_json({'error': error, 'node_errors': node_errors}, status=400)
+            prompt_id = fake.submit(payload.get('prompt', {}), payload.get('client_id'))
+            return self._send_json({'prompt_id': prompt_id, 'number': fake.submitted, 'node_errors': {}})
+        if self.path == '/interrupt':
+            fake.interrupt(payload.get('prompt_id'))
+            return self._send_json({})
+        if self.path == '/queue':
+            fake.delete(payload.get('delete') or [])
+            return self._send_json({})
+        self._send_json({'error': 'not found'}, status=404)
+
+    def _handle_websocket(self, client_id):
+        fake = self.server.fake
+        key = self.headers.get('Sec-WebSocket-Key')
+        if not fake.websocket or not key:
+            return self._send_json({'error': 'websocket disabled'}, status=400)
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+
+        client = _WebSocketClient(self.connection)
+        with fake.lock:
+            fake.ws_clients[client_id] = client
+        client.send_json({'type': 'status', 'data': {'sid': client_id}})
+
+        try:
+            while self._read_frame():
+                pass
+        except OSError:
+            pass
+        finally:
+            with fake.lock:
+                if fake.ws_clients.get(client_id) is client:
+                    del fake.ws_clients[client_id]
+            self.close_connection = True
+
+    def _read_frame(self):
+        """Read one client frame; returns False once the connection is closing"""
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return False
+        opcode = header[0] & 0x0F
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if header[1] & 0x80 else b'\x00\x00\x00\x00'
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rfile.read(length)))
+        if opcode == 0x8:
+            return False
+        if opcode == 0x9:
+            self.connection.sendall(bytes([0x8A, len(payload)]) + payload)
+        return True
+
+
+class FakeComfyUIServer:
+    """
+    Queues prompts, 'renders' them after render_time seconds and reports like
+    ComfyUI. Images are small placeholders unless true_size is set, in which
+    case they have the size the workflow would produce.
+
+    object_info, if given, is served from /object_info and prompts using node
+    types it doesn't list are rejected. fail_with set to 'error' makes every
+    render fail in the sampler (node 31), like a CUDA out-of-memory error;
+    fail_rate makes that share of renders fail that way.
+
+    For benchmarks, latency delays every HTTP response and each render takes
+    up to render_jitter seconds longer than render_time.
+    """
+
+    def __init__(self, render_time=0.2, websocket=True, host='127.0.0.1', port=0, true_size=False,
+                 object_info=None, fail_with=None, fail_rate=0.0, latency=0.0, render_jitter=0.0, seed=None):
+        self.render_time = render_time
+        self.render_jitter = render_jitter
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self.websocket = websocket
+        self.true_size = true_size
+        self.object_info = object_info
+        self.object_info_requests = 0
+        self.fail_with = fail_with
+        self.interrupted = set()  # Prompt IDs told to stop
+        self.workflows = []  # Every workflow submitted, in order
+        self.connections = set()  # Open client sockets, closed on stop like a dying server would
+        self.lock = threading.Lock()
+        self.history = {}
+        self.images = {}
+        self.ws_clients = {}
+        self.pending = []
+        self.running = None
+        self.submitted = 0
+
+        self._work = threading.Condition(self.lock)
+        self._stopped = False
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.fake = self
+        self._threads = []
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        for target in (self._httpd.serve_forever, self._execute_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        with self.lock:
+            self._stopped = True
+            self._work.notify_all()
+            clients = list(self.ws_clients.values())
+            connections = list(self.connections)
+        for client in clients:
+            client.close()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def drop_websockets(self):
+        """Simulate a dropped event stream"""
+        with self.lock:
+            clients = list(self.ws_clients.values())
+        for client in clients:
+            client.close()
+
+    def submit(self, workflow, client_id):
+        prompt_id = str(uuid.uuid4())
+        with self.lock:
+            self.submitted += 1
+            self.workflows.append(workflow)
+            self.pending.append((prompt_id, workflow, client_id))
+            self._work.notify()
+        return prompt_id
+
+    def validate(self, workflow):
+        """node_errors for node types ComfyUI wouldn't know, as /prompt reports them"""
+        if self.object_info is None:
+            return {}
+        return {
+            node_id: {'errors': [{'type': 'invalid_node', 'message': 'Node type not found',
+                                  'details': node.get('class_type')}],
+                      'dependent_outputs': [], 'class_type': node.get('class_type')}
+            for node_id, node in workflow.items() if node.get('class_type') not in self.object_info
+        }
+
+    def interrupt(self, prompt_id=None):
+        with self.lock:
+            if self.running and prompt_id in (None, self.running):
+                self.interrupted.add(self.running)
+                self._work.notify_all()
+
+    def delete(self, prompt_ids):
+        with self.lock:
+            self.pending = [entry for entry in self.pending if entry[0] not in prompt_ids]
+
+    def system_stats(self):
+        return {
+            'system': {'os': 'fake', 'comfyui_version': 'fake'},
+            'devices': [{'name': 'fake-gpu', 'type': 'cuda', 'vram_total': 8 << 30, 'vram_free': 6 << 30}],
+        }
+
+    def queue_state(self):
+        with self.lock:
+            running = [[0, self.running, {}, {}, []]] if self.running else []
+            pending = [[i + 1, prompt_id, {}, {}, []] for i, (prompt_id, _, _) in enumerate(self.pending)]
+        return {'queue_running': running, 'queue_pending': pending}
+
+    def _send(self, client_id, msg_type, data):
+        with self.lock:
+            client = self.ws_clients.get(client_id)
+        if client is None:
+            return
+        try:
+            client.send_json({'type': msg_type, 'data': data})
+        except OSError:
+            pass
+
+    def _execute_loop(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self._stopped:
+                    self._work.wait()
+                if self._stopped:
+                    return
+                prompt_id, workflow, client_id = self.pending.pop(0)
+                self.running = prompt_id
+
+            self._send(client_id, 'execution_start', {'prompt_id': prompt_id})
+            with self.lock:
+                # Rendering; /interrupt cuts it short
+                deadline = time.time() + self.render_time + self._random.uniform(0, self.render_jitter)
+                fails = self.fail_with == 'error' or self._random.random() < self.fail_rate
+                while prompt_id not in self.interrupted and not self._stopped and time.time() < deadline:
+                    self._work.wait(deadline - time.time())
+                interrupted = prompt_id in self.interrupted
+
+            failure = None
+            if interrupted:
+                failure = ('execution_interrupted', {'prompt_id': prompt_id, 'node_id': '31', 'node_type': 'KSampler',
+                                                     'executed': []})
+            elif fails:
+                failure = ('execution_error', {
+                    'prompt_id': prompt_id, 'node_id': '31', 'node_type': 'KSampler', 'executed': [],
+                    'exception_message': 'Allocation on device', 'exception_type': 'torch.OutOfMemoryError',
+                    'traceback': [], 'current_inputs': {}, 'current_outputs': {},
+                })
+            outputs = {} if failure else self._render(prompt_id, workflow)
+            for node_id, output in outputs.items():
+                self._send(client_id, 'executed', {'node': node_id, 'output': output, 'prompt_id': prompt_id})
+
+            with self.lock:
+                self.history[prompt_id] = {
+                    'prompt': [self.submitted, prompt_id, workflow, {}, list(outputs)],
+                    'outputs': outputs,
+                    'status': {
+                        'status_str': 'error' if failure else 'success',
+                        'completed': not failure,
+                        'messages': [list(failure)] if failure else [],
+                    },
+                }
+                self.running = None
+            if failure:
+                self._send(client_id, *failure)
+            else:
+                self._send(client_id, 'execution_success', {'prompt_id': prompt_id})
+            self._send(client_id, 'executing', {'node': None, 'prompt_id': prompt_id})
+
+    def _render(self, prompt_id, workflow):
+        outputs = {}
+        saves = [node_id for node_id, node in workflow.items()
+                 if isinstance(node, dict) and node.get('class_type') == 'SaveImage']
+        # Like ComfyUI, save what's ready first: the decoded image (43) before the upscaled one (9)
+        for node_id in sorted(saves, key=lambda node_id: self._upstream(workflow, node_id)):
+            filename = f"ComfyUI_{prompt_id[:8]}_{node_id}.png"
+            size = self._output_size(workflow, node_id) if self.true_size else (64, 96)
+            buffer = io.BytesIO()
+            Image.new('RGB', size, '#336699').save(buffer, format='PNG')
+            with self.lock:
+                self.images[filename] = buffer.getvalue()
+            outputs[node_id] = {'images': [{'filename': filename, 'subfolder': '', 'type': 'output'}]}
+        return outputs
+
+    def _upstream(self, workflow, node_id, seen=None):
+        """How many nodes feed into node_id"""
+        seen = set() if seen is None else seen
+        for value in workflow.get(node_id, {}).get('inputs', {}).values():
+            if isinstance(value, list) and len(value) == 2 and value[0] in workflow and value[0] not in seen:
+                seen.add(value[0])
+                self._upstream(workflow, value[0], seen)
+        return len(seen)
+
+    def _output_size(self, workflow, node_id):
+        """Size of the image a node produces: its latent's size times any upscales on the way"""
+        scale = 1.0
+        while node_id in workflow:
+            inputs = workflow[node_id].get('inputs', {})
+            if 'width' in inputs and 'height' in inputs:
+                return round(inputs['width'] * scale), round(inputs['height'] * scale)
+            scale *= inputs.get('upscale_by', 1)
+            # Follow the image / latent input upstream
+            links = [value for name, value in inputs.items()
+                     if name in ('images', 'image', 'samples', 'latent_image') and isinstance(value, list)]
+            if not links:
+                break
+            node_id = links[0][0]
+        return 64, 96
@@ -0,0 +1,160 @@
+"""
+Fake Ollama Server
+A small in-process stand-in for the Ollama HTTP API (/api/tags and
+/api/generate, streamed or not), used to exercise the services without an LLM
+"""
+
+import re
+import json
+import time
+import random
+import socket
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CAMERA_ANGLES = ('wide shot', 'medium shot', 'close-up', 'over the shoulder', "bird's eye view")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping keep-alive connections, e.g. on stop(), aren't worth a traceback
+        logger.debug(f"fake ollama: request from {client_address} failed", exc_info=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.fake.lock:
+            self.server.fake.connections.add(self.connection)
+
+    def finish(self):
+        with self.server.fake.lock:
+            self.server.fake.connections.discard(self.connection)
+        super().finish()
+
+    def log_message(self, format, *args):
+        logger.debug("fake ollama: " + format % args)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        fake = self.server.fake
+        time.sleep(fake.latency)
+        if self.path == '/api/tags':
+            return self._send_json({'models': [{'name': fake.model}]})
+        self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        fake = self.server.fake
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(fake.latency)
+
+        if self.path != '/api/generate':
+            return self._send_json({'error': 'not found'}, status=404)
+        with fake.lock:
+            fake.requests += 1
+        if fake.should_fail():
+            return self._send_json({'error': 'model runner has unexpectedly stopped'}, status=500)
+
+        text = fake.story(payload.get('prompt', ''))
+        if not payload.get('stream', True):
+            time.sleep(fake.generation_time)
+            return self._send_json({'model': fake.model, 'response': text, 'done': True})
+
+        # Stream the story in chunks, spread over generation_time
+        chunks = [text[i:i + fake.chunk_size] for i in range(0, len(text), fake.chunk_size)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                time.sleep(fake.generation_time / len(chunks))
+                self._write_chunk({'model': fake.model, 'response': chunk, 'done': False})
+            self._write_chunk({'model': fake.model, 'response': '', 'done': True})
+            self.wfile.write(b'0\r\n\r\n')
+        except OSError:
+            self.close_connection = True
+
+    def _write_chunk(self, payload):
+        line = json.dumps(payload).encode('utf-8') + b'\n'
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+class FakeOllamaServer:
+    """
+    Answers /api/generate with a story of as many panels as the prompt asks
+    for. latency delays every response; the story itself takes
+    generation_time seconds, streamed in chunk_size pieces when asked to.
+    fail_rate is the share of generate calls that fail with a 500.
+    """
+
+    def __init__(self, latency=0.0, generation_time=0.2, chunk_size=40, fail_rate=0.0, model='fake-llm',
+                 host='127.0.0.1', port=0, seed=None):
+        self.latency = latency
+        self.generation_time = generation_time
+        self.chunk_size = max(1, chunk_size)
+        self.fail_rate = fail_rate
+        self.model = model
+        self.requests = 0
+        self.connections = set()  # Open client sockets, closed on stop like a dying server would
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        self._httpd = _Server((host, port), _Handler)
+        self._httpd.fake = self
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self.lock:
+            connections = list(self.connections)
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def should_fail(self):
+        with self.lock:
+            return self._random.random() < self.fail_rate
+
+    def story(self, prompt):
+        """The JSON text of a story with the panel count the prompt asks for"""
+        match = re.search(r"Create a (\d+)-panel comic", prompt)
+        num_panels = int(match.group(1)) if match else 4
+        subject = prompt.rsplit('based on:', 1)[-1].strip()[:80] or 'a quiet day'
+        panels = [{
+            'description': f"(detailed scene:1.2) Panel {i + 1} of {subject}, the hero in a red coat "
+                           f"crossing a rain-soaked street at dusk, neon reflections on the asphalt",
+            'dialogue': f"Line {i + 1}",
+            'camera_angle': CAMERA_ANGLES[i % len(CAMERA_ANGLES)],
+            'emotion': 'determined',
+            'characters': 'Mara, a courier in a red coat',
+            'setting': 'a rainy city street at dusk',
+        } for i in range(num_panels)]
+        return json.dumps({'panels': panels})
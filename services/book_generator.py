@@ -0,0 +1,227 @@
+"""
+Book Generator
+Renders a story longer than one page: panels go through the shared render
+pipeline, and pages are composed and encoded in a process pool as soon as
+all of their panels are ready, then bound into a PDF or CBZ
+"""
+
+import io
+import os
+import zipfile
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from PIL import Image, ImageDraw
+
+from config import (BOOK_DIR, BOOK_PROCESSES, BOOK_DPI, BOOK_PAGE_QUALITY, PANEL_FIT_MODE, DEFAULT_PAGE,
+                    LAYOUT_MARGIN, LAYOUT_GUTTER)
+from services.deadline import Deadline
+from utils.image_fit import fit_image, open_for_size
+from utils.layout_engine import PageLayout, get_layout
+from utils.layout_presets import plan_pages
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('pdf', 'cbz')
+
+
+def compose_page(layout: PageLayout, panels: List[Tuple], quality: int) -> bytes:
+    """
+    Build one page and return it JPEG-encoded. Runs in a worker process, so it
+    only takes picklable arguments: panels are (source, fit_mode) pairs where
+    source is encoded bytes, a file path, a PIL image, or None for an empty cell.
+    """
+    canvas = layout.new_canvas()
+    for i, (source, mode) in enumerate(panels):
+        rect = layout.rect(i)
+        if rect is None:
+            break
+        x, y, w, h = rect
+        if source is None:
+            continue
+        try:
+            if not isinstance(source, Image.Image):
+                source = open_for_size(io.BytesIO(source) if isinstance(source, bytes) else source, (w, h))
+            mode = mode or layout.fit_mode(i) or PANEL_FIT_MODE
+            canvas.paste(fit_image(source, (w, h), mode, background=layout.panel_background), (x, y))
+        except Exception as e:
+            logger.error(f"Failed to place panel {i + 1}: {e}")
+            draw = ImageDraw.Draw(canvas)
+            draw.rectangle([x, y, x + w, y + h], fill='#f0f0f0')
+            draw.text((x + w // 2, y + h // 2), f"Panel {i + 1}", fill='black', anchor='mm')
+    layout.draw_borders(canvas)
+
+    buffer = io.BytesIO()
+    canvas.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class BookGenerator:
+    def __init__(self, comic_generator, processes: int = None, book_dir: str = None):
+        self.comic_generator = comic_generator
+        self.book_dir = book_dir or BOOK_DIR
+        self.processes = max(1, processes or BOOK_PROCESSES or os.cpu_count() or 1)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def create_book(self, prompt: str, style: str, num_panels: int, layouts: List[str] = None,
+                    page: str = DEFAULT_PAGE, gutter: int = LAYOUT_GUTTER, margin: int = LAYOUT_MARGIN,
+                    export: str = 'pdf',
+                    story_id: str = None, progress_callback: Callable = None,
+                    cancel_event: threading.Event = None, deadline: Deadline = None,
+                    seed: int = None) -> Dict:
+        """
+        Generate a multi-page comic and export it as 'pdf' or 'cbz'.
+
+        layouts are preset IDs cycled across pages (all presets by default).
+        Returns the book path and its page plan. progress_callback gets the
+        panel events from ComicGenerator plus 'page_done' and 'book_assembled'.
+        As with create_comic, seed or a reused story_id fixes the panel
+        seeds, and panels still unrendered when deadline runs out are bound
+        in as placeholders.
+        """
+        if export not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export}")
+        pages = plan_pages(num_panels, layouts)
+        generator = self.comic_generator
+        page_layouts = [get_layout(layout, page, margin, gutter, count) for layout, count in pages]
+        page_size = page_layouts[0].page_size
+
+        # Panel position -> (page number, slot on the page)
+        slots = {}
+        for page_number, (_, count) in enumerate(pages):
+            for slot in range(count):
+                slots[len(slots)] = (page_number, slot)
+
+        panel_sources = [[(None, None)] * count for _, count in pages]
+        remaining = [count for _, count in pages]
+        futures = [None] * len(pages)
+        lock = threading.Lock()
+        pool = self._get_pool()
+
+        def render_size(position):
+            if position not in slots:
+                return None
+            page_number, slot = slots[position]
+            return page_layouts[page_number].rect(slot)[2:]
+
+        def keep_source(position, source, mode=None):
+            # Hand the encoded panel (or placeholder) to the page workers undecoded
+            return source, mode
+
+        def collect(group):
+            for item in group:
+                page_number, slot = slots[item['position']]
+                with lock:
+                    panel_sources[page_number][slot] = item['image']
+                    remaining[page_number] -= 1
+                    ready = remaining[page_number] == 0
+                item['image'] = None
+                if ready:
+                    # Every panel of this page is in; compose it while the rest render
+                    futures[page_number] = pool.submit(
+                        compose_page, page_layouts[page_number], panel_sources[page_number], BOOK_PAGE_QUALITY
+                    )
+                    panel_sources[page_number] = None
+            return group
+
+        story = generator.story_panels(prompt, num_panels, style, story_id, deadline)
+
+        try:
+            generator.render_panels(story, style, progress_callback, cancel_event, collect,
+                                    persist_panels=False, fit=keep_source, render_size=render_size,
+                                    deadline=deadline, seed=generator.request_seed(seed, story_id))
+            # Pages the story came up short for still get composed, with empty cells
+            for page_number, sources in enumerate(panel_sources):
+                if futures[page_number] is None:
+                    futures[page_number] = pool.submit(
+                        compose_page, page_layouts[page_number], sources, BOOK_PAGE_QUALITY
+                    )
+
+            encoded_pages = []
+            for page_number, future in enumerate(futures):
+                generator.check_cancelled(cancel_event)
+                encoded_pages.append(future.result())
+                generator.notify(progress_callback, 'page_done', page=page_number)
+        except BaseException:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+            raise
+
+        book_path = self._export(encoded_pages, page_size, export)
+        generator.notify(progress_callback, 'book_assembled', book_path=book_path)
+        logger.info(f"Book with {len(pages)} pages written to {book_path}")
+        return {'path': book_path, 'pages': [{'layout': layout, 'panels': count} for layout, count in pages]}
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn rather than fork: the server process has threads holding locks
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def _export(self, encoded_pages: List[bytes], page_size: Tuple[int, int], export: str) -> str:
+        os.makedirs(self.book_dir, exist_ok=True)
+        path = os.path.join(self.book_dir, f"book_{os.urandom(8).hex()}.{export}")
+        temp_path = f"{path}.tmp"
+        if export == 'cbz':
+            # JPEG pages don't compress further, so store them as is
+            with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as archive:
+                for number, data in enumerate(encoded_pages, start=1):
+                    archive.writestr(f"page_{number:03d}.jpg", data)
+        else:
+            with open(temp_path, 'wb') as f:
+                _write_pdf(f, encoded_pages, page_size, BOOK_DPI)
+        os.replace(temp_path, path)
+        return path
+
+
+def _write_pdf(f, jpeg_pages: List[bytes], page_size: Tuple[int, int], dpi: int):
+    """Write JPEG pages into a PDF as-is (DCTDecode), without decoding them again"""
+    width, height = page_size
+    points = (width * 72 / dpi, height * 72 / dpi)
+    offsets = []
+
+    def write_object(body: bytes, stream: bytes = None):
+        offsets.append(f.tell())
+        f.write(f"{len(offsets)} 0 obj\n".encode() + body)
+        if stream is not None:
+            f.write(b"\nstream\n" + stream + b"\nendstream")
+        f.write(b"\nendobj\n")
+
+    f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    # Objects: 1 catalog, 2 page tree, then page, image and contents for each page
+    kids = " ".join(f"{3 + 3 * i} 0 R" for i in range(len(jpeg_pages)))
+    write_object(b"<< /Type /Catalog /Pages 2 0 R >>")
+    write_object(f"<< /Type /Pages /Kids [{kids}] /Count {len(jpeg_pages)} >>".encode())
+    for i, data in enumerate(jpeg_pages):
+        page_id = 3 + 3 * i
+        contents = f"q {points[0]:.2f} 0 0 {points[1]:.2f} 0 0 cm /Im0 Do Q".encode()
+        write_object(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {points[0]:.2f} {points[1]:.2f}] "
+            f"/Resources << /XObject << /Im0 {page_id + 1} 0 R >> >> /Contents {page_id + 2} 0 R >>".encode()
+        )
+        write_object(
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+            f"/BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>".encode(),
+            data
+        )
+        write_object(f"<< /Length {len(contents)} >>".encode(), contents)
+
+    xref = f.tell()
+    f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        f.write(f"{offset:010d} 00000 n \n".encode())
+    f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
@@ -0,0 +1,88 @@
+"""
+ComfyUI Errors
+Typed failures for prompts ComfyUI rejected, failed or was told to stop, built
+from /prompt responses, websocket events and /history status records
+"""
+
+from typing import Dict, Optional
+
+
+class ComfyUIError(Exception):
+    """A prompt ComfyUI could not render"""
+
+    def __init__(self, message: str, prompt_id: str = None, node_id: str = None, node_type: str = None,
+                 details: Dict = None):
+        super().__init__(message)
+        self.prompt_id = prompt_id
+        self.node_id = node_id
+        self.node_type = node_type
+        self.details = details or {}
+
+
+class BackendUnavailable(ComfyUIError):
+    """The ComfyUI server handling a prompt stopped responding"""
+
+
+class PromptRejected(ComfyUIError):
+    """ComfyUI refused to queue the workflow (unknown node, missing model, bad input)"""
+
+
+class ExecutionError(ComfyUIError):
+    """A node raised while the prompt was running"""
+
+
+class ExecutionInterrupted(ComfyUIError):
+    """The prompt was interrupted or removed from the queue before it finished"""
+
+
+class RenderTimeout(ComfyUIError):
+    """The prompt didn't finish in the time allowed"""
+
+
+def error_from_event(msg_type: str, data: Dict) -> Optional[ComfyUIError]:
+    """The error a websocket event or history status message reports, if any"""
+    prompt_id = data.get('prompt_id')
+    node_id, node_type = data.get('node_id'), data.get('node_type')
+    if msg_type == 'execution_error':
+        message = data.get('exception_message') or 'unknown error'
+        kind = data.get('exception_type') or 'Exception'
+        return ExecutionError(
+            f"ComfyUI node {node_id} ({node_type}) failed: {kind}: {message.strip()}",
+            prompt_id, node_id, node_type, data
+        )
+    if msg_type == 'execution_interrupted':
+        return ExecutionInterrupted(f"ComfyUI prompt {prompt_id} was interrupted", prompt_id, node_id, node_type, data)
+    return None
+
+
+def error_from_status(prompt_id: str, status: Dict) -> Optional[ComfyUIError]:
+    """The error recorded in a /history entry's status, if the prompt failed"""
+    if not status or status.get('status_str') != 'error':
+        return None
+    for message in status.get('messages') or []:
+        if isinstance(message, (list, tuple)) and len(message) == 2:
+            error = error_from_event(message[0], {'prompt_id': prompt_id, **(message[1] or {})})
+            if error:
+                return error
+    return ExecutionError(f"ComfyUI prompt {prompt_id} failed", prompt_id)
+
+
+def error_from_rejection(body) -> PromptRejected:
+    """A PromptRejected from the JSON body of a 400 response to /prompt"""
+    if not isinstance(body, dict):
+        return PromptRejected(f"ComfyUI rejected the workflow: {str(body)[:200]}")
+    error = body.get('error') or {}
+    if isinstance(error, str):
+        error = {'message': error}
+    problems = []
+    node_id = node_type = None
+    for failed_id, node_error in (body.get('node_errors') or {}).items():
+        node_id, node_type = node_id or failed_id, node_type or node_error.get('class_type')
+        for detail in node_error.get('errors') or []:
+            problems.append(f"node {failed_id} ({node_error.get('class_type')}): "
+                            f"{detail.get('message')} {detail.get('details') or ''}".strip())
+    message = error.get('message') or 'invalid workflow'
+    if problems:
+        message = f"{message}: {'; '.join(problems)}"
+    return PromptRejected(f"ComfyUI rejected the workflow: {message}", node_id=node_id, node_type=node_type,
+                          details=body)
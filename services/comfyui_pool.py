@@ -0,0 +1,180 @@
+"""
+ComfyUI Backend Pool
+Spreads renders across several ComfyUI servers, routing each prompt to the
+least-loaded healthy one and steering around servers that stop responding
+"""
+
+import time
+import threading
+import logging
+from typing import List, Dict
+
+from services import metrics
+from services.comfyui_tracker import CompletionTracker
+
+logger = logging.getLogger(__name__)
+
+
+class ComfyUIBackend:
+    """Live state of one ComfyUI server"""
+
+    # Consecutive errors before a backend is taken out of rotation
+    MAX_ERRORS = 3
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.tracker = CompletionTracker(self.url)
+        self.tracker_started = False
+        self.healthy = True
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.latency = None  # Smoothed render time in seconds
+        self.errors = 0
+        self.retry_at = 0.0
+        self.last_checked = 0.0
+        self.probe_latency = None  # Seconds the last /queue probe took
+        self.vram_total = None  # Bytes, from /system_stats
+        self.vram_free = None
+        self.object_info = None  # Node definitions from /object_info, for validating workflows
+
+    @property
+    def load(self):
+        # Prompts ComfyUI reports plus ours it may not have listed yet
+        return max(self.queue_depth, self.in_flight)
+
+    def as_dict(self) -> Dict:
+        return {
+            'url': self.url,
+            'healthy': self.healthy,
+            'queue_depth': self.queue_depth,
+            'in_flight': self.in_flight,
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'probe_latency': round(self.probe_latency, 4) if self.probe_latency is not None else None,
+            'vram_total': self.vram_total,
+            'vram_free': self.vram_free,
+            'errors': self.errors,
+            'last_checked': self.last_checked or None,
+        }
+
+
+class ComfyUIBackendPool:
+    def __init__(self, urls: List[str], session, refresh_interval: float = 5,
+                 failure_cooldown: float = 30, probe_timeout: float = 2):
+        if not urls:
+            raise ValueError("At least one ComfyUI URL is required")
+        self.backends = [ComfyUIBackend(url) for url in urls]
+        self.session = session
+        self.refresh_interval = refresh_interval
+        self.failure_cooldown = failure_cooldown
+        self.probe_timeout = probe_timeout
+
+        # Set while a HealthMonitor keeps the backends probed; routing then
+        # trusts its health checks instead of probing or retrying dead servers
+        self.monitored = False
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._last_refresh = 0.0
+
+    @property
+    def fresh(self) -> bool:
+        """Whether a monitor has probed the backends recently enough to go by"""
+        return self.monitored and time.time() - self._last_refresh <= 3 * self.refresh_interval
+
+    def acquire(self, exclude=()) -> ComfyUIBackend:
+        """Pick the least-loaded healthy backend and count a prompt against it"""
+        fresh = self.fresh
+        if not fresh and len(self.backends) > 1 and time.time() - self._last_refresh > self.refresh_interval:
+            self.refresh()
+
+        now = time.time()
+        with self._lock:
+            candidates = [b for b in self.backends if b not in exclude and (b.healthy or b.retry_at <= now)]
+            if fresh:
+                # A backend that failed its last health check won't take this prompt either
+                candidates = [b for b in candidates if b.healthy]
+                if not candidates:
+                    raise Exception("No healthy ComfyUI backend")
+            if not candidates:
+                # Everything is down; try the one that failed longest ago
+                candidates = sorted((b for b in self.backends if b not in exclude), key=lambda b: b.retry_at)[:1]
+            if not candidates:
+                raise Exception("No ComfyUI backend available")
+
+            backend = min(candidates, key=lambda b: (not b.healthy, b.load, b.latency or 0.0))
+            backend.in_flight += 1
+            metrics.COMFYUI_IN_FLIGHT.set(backend.in_flight, backend=backend.url)
+            return backend
+
+    def release(self, backend: ComfyUIBackend, elapsed: float = None):
+        """A prompt finished (or was abandoned) on backend"""
+        with self._lock:
+            backend.in_flight = max(0, backend.in_flight - 1)
+            metrics.COMFYUI_IN_FLIGHT.set(backend.in_flight, backend=backend.url)
+            if elapsed is not None:
+                backend.errors = 0
+                backend.healthy = True
+                backend.latency = elapsed if backend.latency is None else 0.7 * backend.latency + 0.3 * elapsed
+
+    def record_error(self, backend: ComfyUIBackend, force: bool = False):
+        """Count a failed call; enough of them take the backend out of rotation"""
+        with self._lock:
+            backend.errors += 1
+            if force or backend.errors >= backend.MAX_ERRORS:
+                if backend.healthy:
+                    logger.warning(f"ComfyUI backend {backend.url} marked unhealthy")
+                backend.healthy = False
+                backend.retry_at = time.time() + self.failure_cooldown
+
+    def refresh(self):
+        """Probe every backend's /queue for health and queue depth"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # Another thread is already refreshing
+        try:
+            for backend in self.backends:
+                self._probe(backend)
+            self._last_refresh = time.time()
+        finally:
+            self._refresh_lock.release()
+
+    def statuses(self) -> List[Dict]:
+        with self._lock:
+            return [backend.as_dict() for backend in self.backends]
+
+    def _probe(self, backend):
+        started = time.time()
+        try:
+            response = self.session.get(f"{backend.url}/queue", timeout=self.probe_timeout)
+            response.raise_for_status()
+            queue = response.json()
+            depth = len(queue.get('queue_running', [])) + len(queue.get('queue_pending', []))
+        except Exception as e:
+            logger.debug(f"ComfyUI backend {backend.url} probe failed: {e}")
+            self.record_error(backend, force=True)
+            with self._lock:
+                backend.last_checked = time.time()
+            return
+        probe_latency = time.time() - started
+
+        vram_total = vram_free = None
+        if self.monitored:
+            # Only the health monitor reports VRAM; routing needs just the queue
+            try:
+                response = self.session.get(f"{backend.url}/system_stats", timeout=self.probe_timeout)
+                response.raise_for_status()
+                devices = response.json().get('devices') or []
+                vram_total = sum(device.get('vram_total', 0) for device in devices) or None
+                vram_free = sum(device.get('vram_free', 0) for device in devices) if vram_total else None
+            except Exception as e:
+                logger.debug(f"ComfyUI backend {backend.url} system_stats failed: {e}")
+
+        with self._lock:
+            if not backend.healthy:
+                logger.info(f"ComfyUI backend {backend.url} is healthy again")
+            backend.healthy = True
+            backend.errors = 0
+            backend.queue_depth = depth
+            backend.probe_latency = probe_latency
+            if vram_total is not None:
+                backend.vram_total, backend.vram_free = vram_total, vram_free
+            backend.last_checked = time.time()
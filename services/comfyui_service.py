@@ -3,28 +3,107 @@ ComfyUI Service
 Handles communication with ComfyUI API for image generation
 """
 
-import json
 import uuid
 import time
-import requests
 import logging
 import random
-from config import COMFYUI_URL, COMFYUI_WORKFLOW
+import threading
+import os
+import requests
+from config import (COMFYUI_URL, COMFYUI_URLS, COMFYUI_WORKFLOW, COMFYUI_USE_WEBSOCKET,
+                    COMFYUI_POLL_INTERVAL, COMFYUI_POLL_MAX_INTERVAL,
+                    COMFYUI_FETCH_IMAGES, COMFYUI_OUTPUT_DIR, TEMP_DIR,
+                    COMFYUI_POOL_REFRESH_INTERVAL, COMFYUI_FAILURE_COOLDOWN,
+                    IMAGE_CACHE_ENABLED, IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES,
+                    PANEL_RENDER_PIXELS, PANEL_RENDER_MULTIPLE, PANEL_RENDER_MIN_SIDE,
+                    PANEL_RENDER_MAX_SIDE, PANEL_UPSCALE_MIN, PANEL_UPSCALE_MAX,
+                    COMFYUI_VALIDATE_WORKFLOW)
+from services.comfyui_errors import (ComfyUIError, BackendUnavailable, PromptRejected, ExecutionInterrupted,
+                                     RenderTimeout, error_from_status, error_from_rejection)
+from services import metrics
+from services.comfyui_pool import ComfyUIBackendPool
+from services.deadline import Deadline, NO_DEADLINE
+from services.http_client import create_session, DEFAULT_TIMEOUT
+from services.workflow_cache import workflow_cache, batch_workflow, validate_workflow, output_nodes
+from services.image_cache import ImageCache
 
 logger = logging.getLogger(__name__)
 
+def render_plan(size):
+    """
+    How to render a panel shown at size (w, h): returns the latent (width,
+    height), at the cell's aspect ratio and the checkpoint's preferred area,
+    and the upscale factor for node 42, or None to skip the upscale pass
+    """
+    target_width, target_height = max(1, size[0]), max(1, size[1])
+    aspect = target_width / target_height
+    # Never render more pixels than the cell shows
+    area = min(PANEL_RENDER_PIXELS, target_width * target_height)
+    
+    def snap(side):
+        side = round(side / PANEL_RENDER_MULTIPLE) * PANEL_RENDER_MULTIPLE
+        return int(min(PANEL_RENDER_MAX_SIDE, max(PANEL_RENDER_MIN_SIDE, side)))
+    
+    width, height = snap((area * aspect) ** 0.5), snap((area / aspect) ** 0.5)
+    # Enough to cover the cell on both sides
+    upscale_by = max(target_width / width, target_height / height)
+    if upscale_by < PANEL_UPSCALE_MIN:
+        return width, height, None
+    return width, height, round(min(upscale_by, PANEL_UPSCALE_MAX), 2)
+
+class RenderTicket:
+    """A submitted image: its ComfyUI prompt ID, or the cached result"""
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.prompt_id = None
+        self.generation = None
+        self.cache_key = None
+        self.image_path = None
+        self.image_data = None  # Encoded image, when it was downloaded rather than read from disk
+        self.workflow = None
+        self.backend = None
+        self.submitted_at = None
+        self.batch = None  # Shared ticket of the batched prompt this panel is part of
+        self.output_nodes = None  # This panel's SaveImage nodes (in the batched workflow), final image first
+        self.panels = []  # Panel tickets, on a batch ticket
+        self.deadline = NO_DEADLINE  # Budget of the request the image is for
+
 class ComfyUIService:
-    def __init__(self, base_url=None):
-        self.base_url = base_url or COMFYUI_URL
+    def __init__(self, base_url=None, session=None, image_cache=None, backend_urls=None):
+        urls = backend_urls or ([base_url] if base_url else COMFYUI_URLS or [COMFYUI_URL])
+        self.base_url = urls[0]
+        self.session = session or create_session()
+        self.pool = ComfyUIBackendPool(urls, self.session, COMFYUI_POOL_REFRESH_INTERVAL, COMFYUI_FAILURE_COOLDOWN)
+        if image_cache is None and IMAGE_CACHE_ENABLED:
+            image_cache = ImageCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+        self.image_cache = image_cache
         self.workflow_path = COMFYUI_WORKFLOW
+        self.use_websocket = COMFYUI_USE_WEBSOCKET
+        self.poll_interval = COMFYUI_POLL_INTERVAL
+        self.poll_max_interval = COMFYUI_POLL_MAX_INTERVAL
+        self.fetch_images = COMFYUI_FETCH_IMAGES
+        self.output_dir = COMFYUI_OUTPUT_DIR
+        self.validate_workflows = COMFYUI_VALIDATE_WORKFLOW
+        self._tracker_lock = threading.Lock()
+    
+    @property
+    def tracker(self):
+        """Event stream of the primary backend"""
+        return self.pool.backends[0].tracker
         
     def is_available(self):
-        """Check if ComfyUI server is running"""
-        try:
-            response = requests.get(f"{self.base_url}/system_stats", timeout=5)
-            return response.status_code == 200
-        except:
-            return False
+        """Check if any ComfyUI server is running"""
+        if self.pool.fresh:
+            # The health monitor has just probed them all
+            return any(backend.healthy for backend in self.pool.backends)
+        for backend in self.pool.backends:
+            try:
+                response = self.session.get(f"{backend.url}/system_stats", timeout=5)
+                if response.status_code == 200:
+                    return True
+            except:
+                pass
+        return False
     
     def get_status(self):
         """Get ComfyUI server status"""
@@ -35,43 +114,301 @@ class ComfyUIService:
         except Exception as e:
             return {"status": "error", "message": f"Error: {str(e)}"}
     
-    def generate_image(self, prompt, style="comic", seed=-1):
-        """Generate an image using ComfyUI"""
+    def generate_image(self, prompt, style="comic", seed=-1, on_event=None, size=None, deadline=None):
+        """
+        Generate an image using ComfyUI.
+        
+        on_event(event, data), if given, is told when the prompt is queued
+        ('prompt_queued') or served from the panel cache ('cache_hit').
+        size is the (w, h) the image will be shown at, if known (see render_plan).
+        Every request and wait for the image is held to deadline, if given.
+        Raises a ComfyUIError subclass saying why if no image was produced.
+        """
         try:
-            logger.info(f"Starting image generation for prompt: {prompt[:50]}...")
-            
-            # Load workflow
-            workflow = self._load_workflow()
-            if not workflow:
-                raise Exception("Failed to load workflow")
-            
-            # Update workflow with prompt and settings
-            workflow = self._update_workflow_prompt(workflow, prompt, style, seed)
-            
-            # Submit to ComfyUI
-            logger.info("Submitting workflow to ComfyUI...")
-            prompt_id = self._queue_prompt(workflow)
+            return self.collect_image(self.submit_image(prompt, style, seed, on_event, size, deadline))
             
+        except Exception as e:
+            logger.error(f"Failed to generate image: {e}")
+            raise
+    
+    def submit_image(self, prompt, style="comic", seed=-1, on_event=None, size=None, deadline=None):
+        """Queue an image without waiting for it; pass the ticket to collect_image"""
+        logger.info(f"Starting image generation for prompt: {prompt[:50]}...")
+        ticket = self._prepare_ticket(prompt, style, seed, size, deadline)
+        if ticket.image_path:
+            self._emit(on_event, 'cache_hit', image_path=ticket.image_path)
+            return ticket
+        
+        # Submit to ComfyUI
+        logger.info("Submitting workflow to ComfyUI...")
+        self._submit_to_backend(ticket)
+        self._emit(on_event, 'prompt_queued', prompt_id=ticket.prompt_id, backend=ticket.backend.url)
+        return ticket
+    
+    def collect_image(self, ticket, timeout=300, persist=True):
+        """
+        Wait for a submitted image and return its path. With persist=False a
+        downloaded image that isn't going into the cache is only kept in
+        ticket.image_data, and None is returned. timeout is cut short by the
+        deadline the ticket was submitted with.
+        """
+        if ticket.image_path:
+            return ticket.image_path
+        
+        outputs = self._await_ticket(ticket, timeout, self._wait_for_outputs)
+        image_info = self._final_image(ticket, outputs)
+        image_path = self._retrieve(ticket, image_info, ticket.backend, persist)
+        logger.info(f"Image generated successfully: {image_path or image_info['filename']}")
+        return image_path
+    
+    def submit_batch(self, prompts, style="comic", seed=-1, on_event=None, sizes=None, deadline=None):
+        """
+        Queue several panels as a single ComfyUI prompt and return one ticket
+        per panel; pass them to collect_batch.
+        
+        The checkpoint, LoRAs and other nodes that don't depend on the panel
+        run once for the whole batch. Panels already in the image cache are
+        left out of the prompt. on_event gets the same events as for
+        submit_image, each tagged with the panel's batch_index. sizes gives
+        each panel's display size and deadline the budget, as for submit_image.
+        seed is either a list with each panel's seed or one seed, which panel
+        i gets i added to.
+        """
+        logger.info(f"Starting batched generation of {len(prompts)} panels...")
+        sizes = sizes or [None] * len(prompts)
+        if isinstance(seed, int):
+            seed = [seed if seed == -1 else seed + i for i in range(len(prompts))]
+        tickets = []
+        for i, (prompt, size) in enumerate(zip(prompts, sizes)):
+            ticket = self._prepare_ticket(prompt, style, seed[i], size, deadline)
+            if ticket.image_path:
+                self._emit(on_event, 'cache_hit', batch_index=i, image_path=ticket.image_path)
+            tickets.append(ticket)
+        
+        pending = [ticket for ticket in tickets if not ticket.image_path]
+        if not pending:
+            return tickets
+        
+        batch = RenderTicket(f"{len(pending)} panels")
+        batch.workflow, outputs = batch_workflow([ticket.workflow for ticket in pending])
+        batch.panels = pending
+        batch.deadline = deadline or NO_DEADLINE
+        for ticket, output_nodes in zip(pending, outputs):
+            ticket.batch = batch
+            ticket.output_nodes = output_nodes
+        
+        logger.info(f"Submitting {len(pending)} panels to ComfyUI as one workflow...")
+        self._submit_to_backend(batch)
+        for i, ticket in enumerate(tickets):
+            if ticket.batch is batch:
+                self._emit(on_event, 'prompt_queued', batch_index=i, prompt_id=batch.prompt_id,
+                           backend=batch.backend.url)
+        return tickets
+    
+    def collect_batch(self, tickets, timeout=300, persist=True):
+        """
+        Wait for tickets from submit_batch and return their image paths in the
+        same order; None for a panel ComfyUI finished without an image for, or
+        whose image couldn't be fetched. persist is as for collect_image.
+        """
+        batches = []
+        for ticket in tickets:
+            if not ticket.image_path and ticket.batch not in batches:
+                batches.append(ticket.batch)
+        
+        for batch in batches:
+            outputs = self._await_ticket(batch, timeout, self._wait_for_outputs)
+            for ticket in batch.panels:
+                # Split the page's images back out by each panel's own SaveImage nodes
+                images = [image for node_id in ticket.output_nodes for image in outputs.get(node_id, [])]
+                if not images:
+                    logger.error(f"ComfyUI returned no image for panel prompt: {ticket.prompt[:50]}")
+                    continue
+                try:
+                    self._retrieve(ticket, images[0], batch.backend, persist)
+                except Exception as e:
+                    logger.error(f"Failed to fetch panel image {images[0].get('filename')}: {e}")
+        
+        return [ticket.image_path for ticket in tickets]
+    
+    def cancel(self, ticket):
+        """
+        Stop a submitted prompt: drop it from the queue if it hasn't started,
+        interrupt it if it's running. Waiters get ExecutionInterrupted.
+        """
+        ticket = ticket.batch or ticket
+        if not ticket.prompt_id or ticket.backend is None:
+            return
+        backend = ticket.backend
+        deleted = False
+        try:
+            # A second look catches a prompt that started running just before it was deleted
+            for _ in range(2):
+                response = self.session.get(f"{backend.url}/queue", timeout=DEFAULT_TIMEOUT)
+                response.raise_for_status()
+                queue = response.json()
+                if any(item[1] == ticket.prompt_id for item in queue.get('queue_pending', [])):
+                    self.session.post(f"{backend.url}/queue", json={"delete": [ticket.prompt_id]},
+                                      timeout=DEFAULT_TIMEOUT)
+                    deleted = True
+                elif any(item[1] == ticket.prompt_id for item in queue.get('queue_running', [])):
+                    # /interrupt stops whatever is running, so only send it while that's our prompt
+                    self.session.post(f"{backend.url}/interrupt", json={"prompt_id": ticket.prompt_id},
+                                      timeout=DEFAULT_TIMEOUT)
+                    logger.info(f"Interrupted prompt {ticket.prompt_id} on {backend.url}")
+                    return
+                else:
+                    break
+            if deleted:
+                # A deleted prompt never reports back, so wake its waiters here
+                backend.tracker.interrupt(ticket.prompt_id)
+                logger.info(f"Removed prompt {ticket.prompt_id} from the {backend.url} queue")
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Failed to cancel prompt {ticket.prompt_id} on {backend.url}: {e}")
+    
+    def _prepare_ticket(self, prompt, style, seed, size=None, deadline=None):
+        """Build the panel's workflow; the ticket has image_path set on a cache hit"""
+        # Load workflow
+        workflow = self._load_workflow()
+        if not workflow:
+            raise Exception("Failed to load workflow")
+        
+        # Update workflow with prompt and settings
+        workflow = self._update_workflow_prompt(workflow, prompt, style, seed)
+        if size:
+            workflow = self._update_workflow_size(workflow, size)
+        ticket = RenderTicket(prompt)
+        ticket.workflow = workflow
+        ticket.output_nodes = output_nodes(workflow)
+        ticket.deadline = deadline or NO_DEADLINE
+        
+        # Identical workflows produce identical images, so serve repeats from disk.
+        # A random seed makes every workflow unique, so there is nothing to look up or keep
+        if self.image_cache and seed != -1:
+            ticket.cache_key = self.image_cache.key_for(workflow)
+            cached_path = self.image_cache.get(ticket.cache_key)
+            if cached_path:
+                logger.info(f"Panel cache hit: {cached_path}")
+                ticket.image_path = cached_path
+        return ticket
+    
+    def _await_ticket(self, ticket, timeout, wait):
+        """Run wait(prompt_id, timeout, generation, backend), resubmitting if the backend dies"""
+        start_time = time.time()
+        failed = []
+        while True:
             # Wait for completion and get result
-            logger.info(f"Waiting for completion of prompt ID: {prompt_id}")
-            image_path = self._wait_for_completion(prompt_id)
-            
-            logger.info(f"Image generated successfully: {image_path}")
+            logger.info(f"Waiting for completion of prompt ID: {ticket.prompt_id} on {ticket.backend.url}")
+            try:
+                result = wait(
+                    ticket.prompt_id, ticket.deadline.timeout(timeout - (time.time() - start_time)),
+                    generation=ticket.generation, backend=ticket.backend
+                )
+                break
+            except BackendUnavailable as e:
+                # The server died mid-render; run the prompt somewhere else
+                self.pool.release(ticket.backend)
+                failed.append(ticket.backend)
+                logger.warning(f"{e}; resubmitting prompt elsewhere")
+                self._submit_to_backend(ticket, exclude=failed)
+            except Exception as e:
+                self.pool.release(ticket.backend)
+                metrics.record_error('render', e)
+                raise
+        
+        finished = time.time()
+        self.pool.release(ticket.backend, finished - ticket.submitted_at)
+        self._observe_render(ticket, finished)
+        return result
+    
+    def _observe_render(self, ticket, finished):
+        """Split a finished prompt's time into queue wait and execution, when the websocket saw it start"""
+        metrics.COMFYUI_RENDER_SECONDS.observe(finished - ticket.submitted_at)
+        started = ticket.backend.tracker.started_at(ticket.prompt_id)
+        if started is not None:
+            metrics.COMFYUI_QUEUE_WAIT_SECONDS.observe(max(0.0, started - ticket.submitted_at))
+            metrics.COMFYUI_EXECUTION_SECONDS.observe(max(0.0, finished - started))
+    
+    def _retrieve(self, ticket, image_info, backend, persist=True):
+        """Bring a finished image onto this host and return its local path, if it has one"""
+        if not self.fetch_images:
+            # ComfyUI's output directory is shared with this host
+            image_path = self._image_path(image_info)
+            if ticket.cache_key and os.path.exists(image_path):
+                image_path = self.image_cache.put_file(ticket.cache_key, image_path)
+            ticket.image_path = image_path
             return image_path
+        
+        data = self._download_image(image_info, backend, ticket.deadline)
+        ticket.image_data = data
+        if ticket.cache_key:
+            image_path = self.image_cache.put_bytes(ticket.cache_key, data)
+        elif not persist:
+            image_path = None
+        else:
+            image_path = os.path.join(TEMP_DIR, f"comfyui_{uuid.uuid4().hex[:8]}_{os.path.basename(image_info['filename'])}")
+            os.makedirs(TEMP_DIR, exist_ok=True)
+            with open(image_path, 'wb') as f:
+                f.write(data)
+        ticket.image_path = image_path
+        return image_path
+    
+    def _download_image(self, image_info, backend, deadline=NO_DEADLINE):
+        """Stream an output image from ComfyUI's /view endpoint into memory"""
+        params = {
+            "filename": image_info["filename"],
+            "subfolder": image_info.get("subfolder", ""),
+            "type": image_info.get("type", "output")
+        }
+        with metrics.COMFYUI_DOWNLOAD_SECONDS.time(), \
+                self.session.get(f"{backend.url}/view", params=params, stream=True,
+                                 timeout=deadline.http_timeout()) as response:
+            response.raise_for_status()
+            data = b"".join(response.iter_content(chunk_size=64 * 1024))
+        logger.debug(f"Fetched {params['filename']} ({len(data)} bytes) from {backend.url}")
+        return data
+    
+    def _submit_to_backend(self, ticket, exclude=()):
+        """Queue the ticket's workflow on the best backend, failing over if it's down"""
+        tried = list(exclude)
+        last_error = None
+        while True:
+            try:
+                backend = self.pool.acquire(exclude=tried)
+            except Exception:
+                raise last_error or BackendUnavailable("No ComfyUI backend available")
             
+            try:
+                if self.validate_workflows:
+                    self._validate_workflow(ticket.workflow, backend, ticket.deadline)
+                self._ensure_tracker(backend)
+                ticket.generation = backend.tracker.generation
+                ticket.prompt_id = self._queue_prompt(ticket.workflow, backend, ticket.deadline)
+                ticket.backend = backend
+                ticket.submitted_at = time.time()
+                return
+            except (BackendUnavailable, requests.exceptions.RequestException) as e:
+                self.pool.release(backend)
+                self.pool.record_error(backend, force=True)
+                tried.append(backend)
+                last_error = e
+                logger.warning(f"ComfyUI backend {backend.url} failed to queue prompt: {e}")
+            except Exception:
+                self.pool.release(backend)
+                raise
+    
+    def _emit(self, on_event, event, **data):
+        if on_event is None:
+            return
+        try:
+            on_event(event, data)
         except Exception as e:
-            logger.error(f"Failed to generate image: {e}")
-            # Return placeholder path for now
-            import hashlib
-            placeholder_name = f"prompt_placeholder_{hashlib.md5(prompt.encode()).hexdigest()[:8]}.png"
-            return f"output/temp/{placeholder_name}"
+            logger.warning(f"Event hook failed for {event}: {e}")
     
     def _load_workflow(self):
-        """Load the ComfyUI workflow from file"""
+        """Get a patchable copy of the ComfyUI workflow from the template cache"""
         try:
-            logger.debug(f"Loading workflow from {self.workflow_path}")
-            with open(self.workflow_path, 'r') as f:
-                workflow = json.load(f)
+            workflow = workflow_cache.checkout(self.workflow_path)
             logger.debug(f"Workflow loaded successfully with {len(workflow)} nodes")
             return workflow
         except Exception as e:
@@ -112,57 +449,202 @@ class ComfyUIService:
         
         return workflow
     
-    def _queue_prompt(self, workflow):
+    def _update_workflow_size(self, workflow, size):
+        """Render at the panel's display size: latent shape (node 27) and upscale pass (node 42)"""
+        width, height, upscale_by = render_plan(size)
+        
+        # Node 27 is shared with the template, so replace it rather than patching it
+        if "27" in workflow:
+            latent = workflow["27"]
+            workflow["27"] = {**latent, "inputs": {**latent["inputs"], "width": width, "height": height}}
+            logger.debug(f"Latent size {width}x{height} for a {size[0]}x{size[1]} panel")
+        
+        if "42" in workflow:
+            if upscale_by is None and "43" in workflow:
+                # The cell is small enough that a resize does the job; keep the decoded image (node 43)
+                workflow.pop("42")
+                workflow.pop("9", None)
+            else:
+                workflow["42"]["inputs"]["upscale_by"] = upscale_by or 1
+                if "9" in workflow:
+                    # Only the upscaled image is wanted; don't save the intermediate one (node 43)
+                    workflow.pop("43", None)
+            logger.debug(f"Upscale by {upscale_by or 'none'} in node 42")
+        
+        return workflow
+    
+    def _validate_workflow(self, workflow, backend, deadline=NO_DEADLINE):
+        """Check the workflow against the backend's /object_info before queueing it"""
+        object_info = self._object_info(backend, deadline=deadline)
+        if not object_info:
+            return
+        problems = validate_workflow(workflow, object_info)
+        if problems:
+            # Models may have been added since the node list was fetched
+            object_info = self._object_info(backend, refresh=True, deadline=deadline)
+            problems = validate_workflow(workflow, object_info) if object_info else []
+        if problems:
+            raise PromptRejected(f"Workflow not valid on {backend.url}: {'; '.join(problems)}",
+                                 details={'problems': problems})
+    
+    def _object_info(self, backend, refresh=False, deadline=NO_DEADLINE):
+        """The backend's node definitions, fetched once; {} if it doesn't serve them"""
+        if backend.object_info is not None and not refresh:
+            return backend.object_info
+        try:
+            response = self.session.get(f"{backend.url}/object_info", timeout=deadline.http_timeout())
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Couldn't fetch /object_info from {backend.url}: {e}")
+            return None  # Try again next time
+        backend.object_info = response.json() if response.status_code == 200 else {}
+        return backend.object_info
+    
+    def _queue_prompt(self, workflow, backend=None, deadline=NO_DEADLINE):
         """Submit workflow to ComfyUI queue"""
+        backend = backend or self.pool.backends[0]
         prompt_id = str(uuid.uuid4())
         
         data = {
             "prompt": workflow,
-            "client_id": prompt_id
+            "client_id": backend.tracker.client_id
         }
         
-        logger.debug(f"Submitting prompt to {self.base_url}/prompt")
-        response = requests.post(f"{self.base_url}/prompt", json=data)
+        logger.debug(f"Submitting prompt to {backend.url}/prompt")
+        response = self.session.post(f"{backend.url}/prompt", json=data, timeout=deadline.http_timeout())
         
+        if response.status_code >= 500:
+            raise BackendUnavailable(f"ComfyUI backend {backend.url} returned {response.status_code}")
         if response.status_code != 200:
             logger.error(f"Queue prompt failed: {response.status_code} - {response.text}")
-            raise Exception(f"Failed to queue prompt: {response.status_code} - {response.text}")
+            try:
+                body = response.json()
+            except ValueError:
+                body = response.text
+            raise error_from_rejection(body)
         
         result = response.json()
         actual_prompt_id = result.get("prompt_id", prompt_id)
         logger.info(f"Prompt queued successfully with ID: {actual_prompt_id}")
         return actual_prompt_id
     
-    def _wait_for_completion(self, prompt_id, timeout=300):
-        """Wait for image generation to complete"""
+    def _ensure_tracker(self, backend=None):
+        """Open the backend's shared event stream on first use"""
+        backend = backend or self.pool.backends[0]
+        if not self.use_websocket:
+            return False
+        with self._tracker_lock:
+            if not backend.tracker_started:
+                backend.tracker_started = True
+                if not backend.tracker.start():
+                    logger.warning(f"ComfyUI websocket unavailable at {backend.url}, using /history polling")
+        return backend.tracker.is_connected()
+    
+    def _final_image(self, ticket, outputs):
+        """The image info of the panel's final output node, not an intermediate save"""
+        for node_id in ticket.output_nodes or []:
+            if outputs.get(node_id):
+                return outputs[node_id][0]
+        for images in outputs.values():
+            return images[0]
+        raise ComfyUIError(f"ComfyUI prompt {ticket.prompt_id} finished without saving an image", ticket.prompt_id)
+    
+    def _wait_for_outputs(self, prompt_id, timeout=300, generation=None, backend=None):
+        """Wait for a prompt to finish and return {node_id: images} for its output nodes"""
+        backend = backend or self.pool.backends[0]
         start_time = time.time()
-        logger.info(f"Waiting for completion of prompt {prompt_id}, timeout: {timeout}s")
+        logger.info(f"Waiting for completion of prompt {prompt_id}, timeout: {timeout:.0f}s")
         
-        while time.time() - start_time < timeout:
+        if self._ensure_tracker(backend):
             try:
-                response = requests.get(f"{self.base_url}/history/{prompt_id}")
+                outputs = backend.tracker.wait_for_outputs(prompt_id, timeout, generation)
+            except TimeoutError:
+                logger.error(f"Image generation timed out after {timeout}s")
+                raise RenderTimeout(f"Image generation timed out after {timeout:.0f}s", prompt_id)
+            
+            if outputs:
+                return outputs
+            if outputs is None:
+                logger.warning(f"Event stream dropped while waiting for {prompt_id}, falling back to polling")
+            # Empty means ComfyUI finished without streaming outputs (fully cached
+            # prompt); history has the images, so a single poll picks them up
+        
+        remaining = timeout - (time.time() - start_time)
+        return self._poll_for_completion(prompt_id, remaining, backend)
+    
+    def _poll_for_completion(self, prompt_id, timeout, backend=None):
+        """
+        Poll /history with backoff until the prompt has produced images;
+        returns {node_id: images} for the nodes that saved any. Raises the
+        prompt's ComfyUIError as soon as history records it failing.
+        """
+        backend = backend or self.pool.backends[0]
+        start_time = time.time()
+        delay = self.poll_interval
+        # A slow /history response mustn't run the wait past its timeout
+        budget = Deadline(timeout)
+        
+        while True:
+            # Once the budget is spent, one last poll gets a connect timeout's grace
+            last_poll = budget.expired
+            try:
+                http_timeout = DEFAULT_TIMEOUT[0] if last_poll else budget.http_timeout()
+                response = self.session.get(f"{backend.url}/history/{prompt_id}", timeout=http_timeout)
                 if response.status_code == 200:
                     history = response.json()
                     if prompt_id in history:
-                        outputs = history[prompt_id].get("outputs", {})
+                        entry = history[prompt_id]
+                        error = error_from_status(prompt_id, entry.get("status"))
+                        if error:
+                            raise error
+                        outputs = entry.get("outputs", {})
                         logger.debug(f"Found outputs for {prompt_id}: {list(outputs.keys())}")
                         
-                        for node_id, output in outputs.items():
-                            if "images" in output:
-                                images = output["images"]
-                                if images:
-                                    image_info = images[0]
-                                    filename = image_info["filename"]
-                                    image_path = f"comfyui_output/{filename}"
-                                    logger.info(f"Image generation completed: {image_path}")
-                                    return image_path
+                        images = {node_id: output["images"] for node_id, output in outputs.items()
+                                  if output.get("images")}
+                        if images:
+                            return images
+                        if (entry.get("status") or {}).get("completed"):
+                            raise ComfyUIError(f"ComfyUI prompt {prompt_id} finished without saving an image", prompt_id)
+                    elif not last_poll and self._prompt_lost(prompt_id, backend, budget):
+                        raise ExecutionInterrupted(f"ComfyUI prompt {prompt_id} is no longer queued on {backend.url}",
+                                                   prompt_id)
                 
                 logger.debug(f"Still waiting for {prompt_id}... ({int(time.time() - start_time)}s)")
-                time.sleep(2)
                 
+            except ComfyUIError:
+                raise
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Error checking completion: {e}")
+                self.pool.record_error(backend)
+                if not backend.healthy:
+                    raise BackendUnavailable(f"ComfyUI backend {backend.url} stopped responding")
             except Exception as e:
                 logger.warning(f"Error checking completion: {e}")
-                time.sleep(2)
+            
+            if last_poll:
+                break
+            time.sleep(min(delay, budget.remaining()))
+            delay = min(delay * 2, self.poll_max_interval)
         
-        logger.error(f"Image generation timed out after {timeout}s")
-        raise Exception("Image generation timed out")
+        logger.error(f"Image generation timed out after {timeout:.0f}s")
+        raise RenderTimeout(f"Image generation timed out after {timeout:.0f}s", prompt_id)
+    
+    def _prompt_lost(self, prompt_id, backend, deadline=NO_DEADLINE):
+        """Whether a prompt missing from history isn't queued or running either (deleted, or the server restarted)"""
+        response = self.session.get(f"{backend.url}/queue", timeout=deadline.http_timeout())
+        if response.status_code != 200:
+            return False
+        queue = response.json()
+        for item in queue.get("queue_running", []) + queue.get("queue_pending", []):
+            if len(item) > 1 and item[1] == prompt_id:
+                return False
+        # It may have finished between the two requests
+        response = self.session.get(f"{backend.url}/history/{prompt_id}", timeout=deadline.http_timeout())
+        return response.status_code == 200 and prompt_id not in response.json()
+    
+    def _image_path(self, image_info):
+        """Map a ComfyUI image record to its path in the shared output directory"""
+        subfolder = image_info.get('subfolder') or ''
+        image_path = "/".join(part for part in (self.output_dir, subfolder, image_info['filename']) if part)
+        logger.info(f"Image generation completed: {image_path}")
+        return image_path
@@ -0,0 +1,231 @@
+"""
+ComfyUI Completion Tracker
+Listens on ComfyUI's /ws event stream and resolves in-flight prompts as soon
+as they finish, so callers don't have to poll /history
+"""
+
+import json
+import time
+import uuid
+import threading
+import logging
+from collections import OrderedDict
+
+import websocket
+
+from services.comfyui_errors import ExecutionInterrupted, error_from_event
+
+logger = logging.getLogger(__name__)
+
+
+class _PromptWaiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.outputs = {}  # node_id -> images saved by that node
+        self.done = False
+        self.dropped = False
+        self.error = None  # ComfyUIError if the prompt failed or was interrupted
+
+
+class CompletionTracker:
+    """One shared websocket per service instance, multiplexing all in-flight prompts"""
+
+    # Completions that arrive before anyone waits for them are kept this long
+    MAX_UNCLAIMED = 256
+
+    def __init__(self, base_url, client_id=None, connect_timeout=5, reconnect_delay=5):
+        self.base_url = base_url.rstrip('/')
+        self.client_id = client_id or str(uuid.uuid4())
+        self.connect_timeout = connect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.generation = 0
+
+        self._lock = threading.Lock()
+        self._waiters = {}
+        self._unclaimed = OrderedDict()
+        self._started = OrderedDict()  # Prompt ID -> when ComfyUI started running it
+        self._connected = threading.Event()
+        self._attempted = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._ws = None
+
+    @property
+    def ws_url(self):
+        if self.base_url.startswith('https://'):
+            host = 'wss://' + self.base_url[len('https://'):]
+        elif self.base_url.startswith('http://'):
+            host = 'ws://' + self.base_url[len('http://'):]
+        else:
+            host = 'ws://' + self.base_url
+        return f"{host}/ws?clientId={self.client_id}"
+
+    def start(self, timeout=None):
+        """Start the listener thread and wait up to timeout for the socket to open"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='comfyui-ws', daemon=True)
+                self._thread.start()
+        self._attempted.wait(self.connect_timeout if timeout is None else timeout)
+        return self._connected.is_set()
+
+    def stop(self):
+        """Close the socket and stop reconnecting"""
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=self.connect_timeout)
+
+    def is_connected(self):
+        return self._connected.is_set()
+
+    def wait_for_outputs(self, prompt_id, timeout, generation=None):
+        """
+        Block until prompt_id has finished executing and return the images
+        each output node saved, as {node_id: [image info, ...]}. Output nodes
+        can run well before the end (an intermediate save ahead of an
+        upscale), so only completion resolves the wait.
+
+        The result is empty if ComfyUI served every node from its cache, and
+        None if the socket was not connected or dropped and the caller should
+        fall back to polling. Raises TimeoutError if the prompt didn't finish
+        in time, and the ComfyUIError ComfyUI reported if it failed or was
+        interrupted.
+        """
+        waiter = self._wait(prompt_id, timeout, generation)
+        return None if waiter is None else dict(waiter.outputs)
+
+    def interrupt(self, prompt_id):
+        """Wake anyone waiting on prompt_id with ExecutionInterrupted (e.g. it was removed from the queue)"""
+        self._resolve(prompt_id, done=True, error=ExecutionInterrupted(f"ComfyUI prompt {prompt_id} was cancelled", prompt_id))
+
+    def _wait(self, prompt_id, timeout, generation):
+        with self._lock:
+            if not self._connected.is_set():
+                return None
+            if generation is not None and generation != self.generation:
+                # Reconnected since the prompt was queued; events may have been lost
+                return None
+
+            # The prompt may have finished (or started saving) before we started waiting
+            waiter = self._unclaimed.pop(prompt_id, None)
+            if waiter is not None and waiter.error is not None:
+                raise waiter.error
+            if waiter is not None and waiter.done:
+                return waiter
+            if waiter is None:
+                waiter = _PromptWaiter()
+            waiter.event.clear()
+            self._waiters[prompt_id] = waiter
+
+        try:
+            if not waiter.event.wait(timeout):
+                raise TimeoutError(f"Prompt {prompt_id} did not finish within {timeout}s")
+        finally:
+            with self._lock:
+                self._waiters.pop(prompt_id, None)
+
+        if waiter.error is not None:
+            raise waiter.error
+        if waiter.dropped:
+            return None
+        return waiter
+
+    def _run(self):
+        while not self._stop.is_set():
+            ws = None
+            try:
+                ws = websocket.create_connection(self.ws_url, timeout=self.connect_timeout)
+                ws.settimeout(None)
+                with self._lock:
+                    self._ws = ws
+                    self.generation += 1
+                    self._connected.set()
+                self._attempted.set()
+                logger.info(f"Connected to ComfyUI event stream at {self.ws_url}")
+
+                while not self._stop.is_set():
+                    message = ws.recv()
+                    if not message:
+                        break
+                    if isinstance(message, bytes):
+                        continue  # Binary frames are live previews
+                    self._handle_message(json.loads(message))
+
+            except Exception as e:
+                if not self._stop.is_set():
+                    logger.warning(f"ComfyUI event stream unavailable: {e}")
+            finally:
+                self._disconnect(ws)
+                self._attempted.set()
+
+            self._stop.wait(self.reconnect_delay)
+
+    def _disconnect(self, ws):
+        with self._lock:
+            was_connected = self._connected.is_set()
+            self._connected.clear()
+            self._ws = None
+            # Wake everyone so they can fall back to polling
+            for waiter in self._waiters.values():
+                waiter.dropped = True
+                waiter.event.set()
+            self._unclaimed.clear()
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        if was_connected and not self._stop.is_set():
+            logger.warning("ComfyUI event stream disconnected")
+
+    def started_at(self, prompt_id):
+        """When ComfyUI reported starting prompt_id (time.time()), if it did; forgotten once asked"""
+        with self._lock:
+            return self._started.pop(prompt_id, None)
+
+    def _handle_message(self, message):
+        msg_type = message.get('type')
+        data = message.get('data') or {}
+        prompt_id = data.get('prompt_id')
+        if not prompt_id:
+            return
+
+        if msg_type == 'execution_start':
+            with self._lock:
+                self._started[prompt_id] = time.time()
+                while len(self._started) > self.MAX_UNCLAIMED:
+                    self._started.popitem(last=False)
+        elif msg_type == 'executed':
+            images = (data.get('output') or {}).get('images') or []
+            if images:
+                self._resolve(prompt_id, node=data.get('node'), images=images)
+        elif msg_type in ('execution_error', 'execution_interrupted'):
+            self._resolve(prompt_id, done=True, error=error_from_event(msg_type, data))
+        elif msg_type == 'execution_success':
+            self._resolve(prompt_id, done=True)
+        elif msg_type == 'executing' and data.get('node') is None:
+            self._resolve(prompt_id, done=True)
+
+    def _resolve(self, prompt_id, node=None, images=None, done=False, error=None):
+        with self._lock:
+            waiter = self._waiters.get(prompt_id)
+            if waiter is None:
+                waiter = self._unclaimed.get(prompt_id)
+                if waiter is None:
+                    waiter = _PromptWaiter()
+                    self._unclaimed[prompt_id] = waiter
+                    while len(self._unclaimed) > self.MAX_UNCLAIMED:
+                        self._unclaimed.popitem(last=False)
+            if images:
+                waiter.outputs.setdefault(node, []).extend(images)
+            waiter.done = waiter.done or done
+            waiter.error = waiter.error or error
+            if done:
+                waiter.event.set()
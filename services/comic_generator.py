@@ -1,49 +1,399 @@
 from PIL import Image, ImageDraw, ImageFont
+import io
 import os
-from typing import List, Tuple, Dict
+import hashlib
+import itertools
+import threading
+import time
+from typing import List, Tuple, Dict, Callable, Iterable
 import logging
+from config import (COMFYUI_MAX_IN_FLIGHT, COMFYUI_BATCH_SIZE, OLLAMA_STREAMING,
+                    OUTPUT_FORMAT, OUTPUT_QUALITY, OUTPUT_PNG_COMPRESS_LEVEL, OUTPUT_LOSSLESS_WEBP,
+                    PANEL_FIT_MODE, DEFAULT_PAGE, LAYOUT_MARGIN, LAYOUT_GUTTER, PANEL_RENDER_TO_CELL)
+from services import metrics
+from services.deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+from services.pipeline import Pipeline, Stage
+from utils.image_encoding import OutputFormat, save_page
+from utils.image_fit import fit_image, open_for_size
+from utils.layout_engine import PageLayout, get_layout, layout_from_geometry
 
 logger = logging.getLogger(__name__)
 
+class GenerationCancelled(Exception):
+    """Raised when a comic's cancel_event is set while it is being generated"""
+
+
 class ComicGenerator:
-    def __init__(self, ollama_service, comfyui_service):
+    def __init__(self, ollama_service, comfyui_service, max_in_flight: int = None,
+                 stream_story: bool = OLLAMA_STREAMING, batch_size: int = None, renditions=None):
         self.ollama = ollama_service
         self.comfyui = comfyui_service
+        self.max_in_flight = max(1, max_in_flight or COMFYUI_MAX_IN_FLIGHT)
+        self.batch_size = max(1, batch_size or COMFYUI_BATCH_SIZE)
+        self.stream_story = stream_story
+        # RenditionStore to build page derivatives from the canvas while it's still in memory
+        self.renditions = renditions
         
     def create_comic(self, prompt: str, style: str, num_panels: int, layout_preset: str = 'Layout0', 
-                    page: str = 'A4-P', geometry: Dict = None, show_prompts: bool = False) -> str:
-        """Generate complete comic"""
+                    page: str = DEFAULT_PAGE, geometry: Dict = None, show_prompts: bool = False,
+                    story_id: str = None, progress_callback: Callable = None,
+                    cancel_event: threading.Event = None, persist_panels: bool = False,
+                    output_format: Dict = None, margin: int = LAYOUT_MARGIN,
+                    gutter: int = LAYOUT_GUTTER, deadline: Deadline = None, seed: int = None) -> str:
+        """
+        Generate complete comic.
+        
+        progress_callback(event, data) is called as stages finish; cancel_event
+        aborts generation with GenerationCancelled between panels. Panels are
+        passed between stages as decoded images; persist_panels also writes
+        each one to disk so progress events can link to it. output_format
+        overrides the configured page encoding (see OutputFormat). The page
+        is laid out from layout_preset unless geometry gives custom cells.
+        
+        Panels not rendered when deadline runs out are left as placeholders
+        and the page is assembled from what there is ('deadline_exceeded').
+        
+        Panels get random seeds unless seed is given or story_id is reused,
+        in which case the same story renders the same images again.
+        """
+        # Bad encoding or layout options should fail before any rendering is done
+        output_format = self.output_format(output_format)
+        layout = self.page_layout(layout_preset, page, geometry, margin, gutter)
+        
+        panels = self.story_panels(prompt, num_panels, style, story_id, deadline)
+        
+        # Panels are composited onto the page as soon as each one is rendered
+        canvas = layout.new_canvas()
+        compositing_seconds = [0.0]  # Composite runs in one pipeline worker
+        
+        def fit(position, source, mode=None):
+            # Runs in the render workers, so decoding and resampling happen in parallel
+            rect = layout.rect(position)
+            if rect is None:
+                return self._load_panel_image(source)
+            return self._fit_panel(source, rect[2:], layout, position, mode)
+        
+        def composite(group):
+            started = time.perf_counter()
+            for item in group:
+                self._paste_panel(canvas, layout, item['position'], item['image'])
+                item['image'] = None  # Pasted; don't hold every decoded panel until the page is done
+            compositing_seconds[0] += time.perf_counter() - started
+            return group
         
-        # Generate panel descriptions
-        panels = self.ollama.generate_comic_panels(prompt, num_panels, style)
+        def render_size(position):
+            # Render each panel at the shape and size of its cell
+            rect = layout.rect(position)
+            return rect[2:] if rect else None
         
         # Generate images for each panel or create prompt placeholders
-        panel_images = []
-        for panel in panels:
+        panels, panel_images = self.render_panels(panels, style, progress_callback, cancel_event, composite,
+                                                  persist_panels, fit, render_size, deadline,
+                                                  self.request_seed(seed, story_id))
+        
+        self.check_cancelled(cancel_event)
+        started = time.perf_counter()
+        layout.draw_borders(canvas)
+        comic_path = self._save_comic(canvas, output_format)
+        if self.renditions:
+            # Off the request path; the canvas isn't touched again
+            self.renditions.create_all_async(canvas, comic_path)
+        # Compositing overlaps rendering, so its time is added up rather than spanned
+        metrics.COMIC_ASSEMBLY_SECONDS.observe(compositing_seconds[0] + time.perf_counter() - started)
+        self.notify(progress_callback, 'comic_assembled', comic_path=comic_path)
+        
+        return comic_path
+    
+    def story_panels(self, prompt: str, num_panels: int, style: str, story_id: str = None,
+                     deadline: Deadline = None) -> Iterable[Dict]:
+        """
+        The panel descriptions to render: the story the user has already seen
+        if story_id is still cached, otherwise a new one, streamed when
+        stream_story is set so rendering overlaps the LLM. Capped at
+        num_panels, so panels the LLM adds beyond it are never rendered.
+        """
+        panels = self.ollama.get_story(story_id) if story_id else None
+        if panels is None:
+            if story_id:
+                logger.info(f"Story {story_id} expired, generating a new one")
+            if self.stream_story:
+                panels = self.ollama.stream_comic_panels(prompt, num_panels, style, deadline)
+            else:
+                panels = self.ollama.generate_comic_panels(prompt, num_panels, style, deadline)
+        return itertools.islice(panels, num_panels)
+    
+    def render_panels(self, panel_source: Iterable[Dict], style: str, progress_callback: Callable = None,
+                      cancel_event: threading.Event = None, composite: Callable = None,
+                      persist_panels: bool = True, fit: Callable = None,
+                      render_size: Callable = None, deadline: Deadline = None,
+                      seed: int = None) -> Tuple[List[Dict], List[str]]:
+        """
+        Run panels through the describe -> enhance -> submit -> render
+        (-> composite) pipeline, keeping up to max_in_flight prompts in
+        ComfyUI at once. Returns the panels and their image paths, in panel
+        order; a path is None for a panel that was only held in memory.
+        
+        Items are groups of up to batch_size panels; a group of several is
+        rendered as one batched ComfyUI prompt, and composite gets the group.
+        Each rendered item carries its decoded PIL image as item['image'],
+        already passed through fit(position, source, mode=None) if given.
+        render_size(position) gives the (w, h) a panel will be shown at, so
+        ComfyUI can render it at that shape and size. Callers building other
+        products from the panels (see BookGenerator) pass their own composite.
+        
+        Once deadline runs out nothing more is submitted, prompts still in
+        ComfyUI are cancelled, and the panels they were for become
+        placeholders; 'deadline_exceeded' lists them.
+        
+        Panels render with random seeds unless seed is given; then each
+        panel's seed is derived from it and the panel, so a repeat can be
+        served from the panel cache.
+        """
+        deadline = deadline or NO_DEADLINE
+        panels = []
+        timed_out = []
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        if not PANEL_RENDER_TO_CELL:
+            render_size = None
+        # One ticket per submitted prompt still in ComfyUI, for cancelling it
+        outstanding = {}
+        outstanding_lock = threading.Lock()
+        
+        def describe():
+            group = []
+            for panel in panel_source:
+                self.check_cancelled(cancel_event)
+                position = len(panels)
+                panels.append(panel)
+                self.notify(progress_callback, 'panel_described', index=position, panel=panel)
+                group.append({'position': position, 'panel': panel})
+                if len(group) == self.batch_size:
+                    yield group
+                    group = []
+            self.notify(progress_callback, 'story_ready', panels=panels)
+            if group:
+                yield group
+        
+        def enhance(group):
+            # Enhanced prompt with character and setting consistency; later panels
+            # may not be known yet, but consistency only needs the earlier ones
+            for item in group:
+                item['prompt'] = self._enhance_panel_prompt(item['panel'], list(panels))
+            return group
+        
+        def submit(group):
+            self.check_cancelled(cancel_event)
+            while not in_flight.acquire(timeout=0.5):
+                self.check_cancelled(cancel_event)
+                if pipeline.aborted.is_set():
+                    return group
+            if deadline.expired:
+                # Out of time; the panels go straight to placeholders
+                in_flight.release()
+                for item in group:
+                    item['error'] = DeadlineExceeded("No time left to render the panel")
+                return group
+            
+            def on_render_event(event, data):
+                # Tag ComfyUI events ('prompt_queued', 'cache_hit') with the panel they belong to
+                position = group[data.pop('batch_index', 0)]['position']
+                self.notify(progress_callback, f"panel_{event}", index=position, **data)
+            
             try:
-                # Enhanced prompt with character and setting consistency
-                enhanced_prompt = self._enhance_panel_prompt(panel, panels)
-                
-                image_path = self.comfyui.generate_image(
-                    prompt=enhanced_prompt,
-                    style=style,
-                    seed=-1  # Use random seed for variety
-                )
-                panel_images.append(image_path)
+                sizes = [render_size(item['position']) if render_size else None for item in group]
+                seeds = [-1 if seed is None else self._derive_seed(seed, item['position'], item['prompt'])
+                         for item in group]
+                if len(group) == 1:
+                    tickets = [self.comfyui.submit_image(
+                        prompt=group[0]['prompt'],
+                        style=style,
+                        seed=seeds[0],
+                        on_event=on_render_event if progress_callback else None,
+                        size=sizes[0],
+                        deadline=deadline
+                    )]
+                else:
+                    tickets = self.comfyui.submit_batch(
+                        prompts=[item['prompt'] for item in group],
+                        style=style,
+                        seed=seeds,
+                        on_event=on_render_event if progress_callback else None,
+                        sizes=sizes,
+                        deadline=deadline
+                    )
+                for item, ticket in zip(group, tickets):
+                    item['ticket'] = ticket
+                queued = self._queued_ticket(tickets)
+                if queued is not None:
+                    with outstanding_lock:
+                        outstanding[id(group)] = queued
             except Exception as e:
-                logger.warning(f"ComfyUI unavailable for panel {panel['index']}: {e}")
-                # Create a text placeholder with the prompt
-                placeholder_path = self._create_prompt_placeholder(
-                    enhanced_prompt if 'enhanced_prompt' in locals() else panel['description'], 
-                    panel['index'], 
-                    style
-                )
-                panel_images.append(placeholder_path)
-        
-        # Combine into comic layout
-        comic_path = self._assemble_comic(panel_images, layout_preset, page, geometry)
+                in_flight.release()
+                metrics.record_error('submit', e)
+                for item in group:
+                    item['error'] = e
+            return group
         
-        return comic_path
+        def render(group):
+            if 'ticket' in group[0]:
+                tickets = [item['ticket'] for item in group]
+                try:
+                    if len(group) == 1:
+                        image_paths = [self.comfyui.collect_image(tickets[0], persist=persist_panels)]
+                    else:
+                        image_paths = self.comfyui.collect_batch(tickets, persist=persist_panels)
+                    for item, ticket, image_path in zip(group, tickets, image_paths):
+                        item['image_path'] = image_path
+                        # Downloaded bytes are decoded without touching the disk
+                        item['source'] = ticket.image_data or image_path
+                except Exception as e:
+                    for item in group:
+                        item['error'] = e
+                    queued = self._queued_ticket(tickets)
+                    if deadline.expired and queued is not None:
+                        # The wait was cut short, not the render; don't leave it holding ComfyUI
+                        self.comfyui.cancel(queued)
+                finally:
+                    with outstanding_lock:
+                        outstanding.pop(id(group), None)
+                    in_flight.release()
+            
+            for item in group:
+                # Decode once, here in the render workers
+                source = item.pop('source', None)
+                if source is not None:
+                    try:
+                        item['image'] = fit(item['position'], source) if fit else self._load_panel_image(source)
+                    except Exception as e:
+                        logger.error(f"Failed to decode panel {item['position'] + 1}: {e}")
+                        item['error'] = e
+                
+                if item.get('image') is None:
+                    logger.warning(f"ComfyUI unavailable for panel {item['position']}: {item.get('error')}")
+                    if deadline.expired:
+                        timed_out.append(item['position'])
+                    # Create a text placeholder with the prompt
+                    metrics.PANEL_PLACEHOLDERS.inc()
+                    item['image'] = self._render_prompt_placeholder(item['prompt'], item['position'], style)
+                    item['image_path'] = None
+                    if persist_panels:
+                        item['image_path'] = self._save_placeholder(item['image'], item['position'])
+                    if fit:
+                        # Never crop away the prompt text
+                        item['image'] = fit(item['position'], item['image'], 'contain')
+                
+                logger.info(f"Panel {item['position'] + 1} finished")
+                self.notify(progress_callback, 'panel_done', index=item['position'], image_path=item['image_path'])
+            return group
+        
+        stages = [
+            Stage('enhance', enhance),
+            Stage('submit', submit),
+            Stage('render', render, workers=self.max_in_flight)
+        ]
+        if composite:
+            stages.append(Stage('composite', composite))
+        
+        def cancel_outstanding():
+            with outstanding_lock:
+                tickets = list(outstanding.values())
+                outstanding.clear()
+            for ticket in tickets:
+                self.comfyui.cancel(ticket)
+        
+        def watch_cancel():
+            # Render workers block on ComfyUI, so stop their prompts there rather than wait them out
+            while not stop_watch.wait(0.25):
+                if cancel_event.is_set():
+                    return cancel_outstanding()
+        
+        stop_watch = threading.Event()
+        if cancel_event is not None:
+            threading.Thread(target=watch_cancel, name='comic-cancel', daemon=True).start()
+        
+        pipeline = Pipeline(stages, queue_size=self.max_in_flight, source_name='describe')
+        try:
+            results = pipeline.run(describe())
+        finally:
+            stop_watch.set()
+            if cancel_event is not None and cancel_event.is_set():
+                # The pipeline may have stopped before the watcher noticed
+                cancel_outstanding()
+            pipeline.log_timings('Comic')
+            self.notify(progress_callback, 'stage_timings', timings=pipeline.stage_timings())
+        
+        if timed_out:
+            logger.warning(f"Time budget ran out with {len(timed_out)} panel(s) unrendered")
+            metrics.TIMEOUTS.inc(stage='deadline')
+            self.notify(progress_callback, 'deadline_exceeded', panels=sorted(timed_out))
+        
+        return panels, [item['image_path'] for group in results for item in group]
+    
+    @staticmethod
+    def output_format(options: Dict = None) -> OutputFormat:
+        """Page encoding for a request's output options, defaulting to the configured one"""
+        return OutputFormat.from_dict(
+            options,
+            format=OUTPUT_FORMAT,
+            quality=OUTPUT_QUALITY,
+            compress_level=OUTPUT_PNG_COMPRESS_LEVEL,
+            lossless=OUTPUT_LOSSLESS_WEBP
+        )
+    
+    @staticmethod
+    def page_layout(layout_preset: str = 'Layout0', page: str = DEFAULT_PAGE, geometry: Dict = None,
+                    margin: int = LAYOUT_MARGIN, gutter: int = LAYOUT_GUTTER) -> PageLayout:
+        """
+        Pixel layout of a page: the custom cells in geometry if it has any,
+        otherwise the (cached) preset. Raises ValueError for an unknown
+        preset or page format.
+        """
+        if geometry and geometry.get('cells'):
+            return layout_from_geometry(page, geometry)
+        return get_layout(layout_preset, page, margin, gutter)
+    
+    def notify(self, progress_callback: Callable, event: str, **data):
+        """Report progress without letting a broken listener fail the comic"""
+        if progress_callback is None:
+            return
+        try:
+            progress_callback(event, data)
+        except Exception as e:
+            logger.warning(f"Progress callback failed for {event}: {e}")
+    
+    @staticmethod
+    def _queued_ticket(tickets: List):
+        """
+        The ticket holding a group's ComfyUI prompt (the batch, or the panel's
+        own), or None if every panel was a cache hit. Any panel of a batch may
+        be a cache hit, so it isn't always the first ticket.
+        """
+        for ticket in tickets:
+            if ticket.batch is not None or ticket.prompt_id:
+                return ticket.batch or ticket
+        return None
+    
+    @classmethod
+    def request_seed(cls, seed: int = None, story_id: str = None):
+        """
+        The seed to render a request's panels from: the caller's own, one
+        fixed by a reused story_id, or None for random seeds.
+        """
+        if seed is not None:
+            return seed
+        if story_id:
+            return cls._derive_seed(story_id)
+        return None
+    
+    @staticmethod
+    def _derive_seed(*parts) -> int:
+        """A ComfyUI seed fixed by parts, e.g. (seed, position, prompt)"""
+        digest = hashlib.sha256(":".join(map(str, parts)).encode('utf-8')).digest()
+        return int.from_bytes(digest[:6], 'big') % 999999999999999 + 1
+    
+    def check_cancelled(self, cancel_event: threading.Event):
+        if cancel_event is not None and cancel_event.is_set():
+            raise GenerationCancelled("Comic generation cancelled")
     
     def _enhance_panel_prompt(self, current_panel: Dict, all_panels: List[Dict]) -> str:
         """Enhance panel prompt with consistency elements and weights"""
@@ -82,58 +432,61 @@ class ComicGenerator:
         logger.debug(f"Enhanced panel {current_panel['index']} prompt with consistency elements")
         return enhanced_prompt
     
-    def _assemble_comic(self, image_paths: List[str], layout_preset: str, page: str, geometry: Dict = None) -> str:
-        """Assemble panels into comic layout"""
-        
-        # Default layout if geometry not provided
-        if not geometry:
-            geometry = self._get_default_layout(layout_preset, page)
-        
-        # Calculate page dimensions based on page format
-        page_width, page_height = self._get_page_dimensions(page)
-        
-        # Create canvas
-        canvas = Image.new('RGB', (page_width, page_height), geometry.get('page', {}).get('bg', '#ffffff'))
-        
-        # Load and place images
-        for i, img_path in enumerate(image_paths):
-            if i >= len(geometry.get('cells', [])):
-                break
-                
-            cell = geometry['cells'][i]
-            
-            # Calculate actual pixel positions
-            margin = geometry.get('outerMarginPx', 24)
-            content_width = page_width - (2 * margin)
-            content_height = page_height - (2 * margin)
-            
-            x = margin + int(cell['x'] * content_width)
-            y = margin + int(cell['y'] * content_height)
-            w = int(cell['w'] * content_width)
-            h = int(cell['h'] * content_height)
-            
-            # Load and resize image
-            try:
-                img = Image.open(img_path)
-                img = img.resize((w, h), Image.LANCZOS)
-                canvas.paste(img, (x, y))
-            except Exception as e:
-                logger.error(f"Failed to load panel image {img_path}: {e}")
-                # Create placeholder
-                placeholder = Image.new('RGB', (w, h), '#f0f0f0')
-                draw = ImageDraw.Draw(placeholder)
-                draw.text((w//2, h//2), f"Panel {i+1}", fill='black', anchor='mm')
-                canvas.paste(placeholder, (x, y))
+    def _load_panel_image(self, source, size: Tuple[int, int] = None) -> Image.Image:
+        """
+        Decode a panel given as a PIL image, encoded bytes or a file path;
+        size lets JPEG decoding scale down towards the size it's needed at
+        """
+        if isinstance(source, Image.Image):
+            return source
+        source = io.BytesIO(source) if isinstance(source, bytes) else source
+        if size:
+            return open_for_size(source, size)
+        img = Image.open(source)
+        img.load()
+        return img
+    
+    def _fit_panel(self, image, size: Tuple[int, int], layout: PageLayout, i: int, mode: str = None) -> Image.Image:
+        """Scale a panel image to exactly size using the cell's (or layout's) fit mode"""
+        mode = mode or layout.fit_mode(i) or PANEL_FIT_MODE
+        img = self._load_panel_image(image, size)
+        return fit_image(img, size, mode, background=layout.panel_background)
+    
+    def _paste_panel(self, canvas: Image.Image, layout: PageLayout, i: int, image):
+        """Fit a panel image (PIL image, encoded bytes or file path) into its cell on the canvas"""
+        rect = layout.rect(i)
+        if rect is None:
+            logger.warning(f"No layout cell for panel {i + 1}, skipping it")
+            return
+        x, y, w, h = rect
         
+        # Load and fit image; one already fitted to the cell is pasted as is
+        try:
+            img = image if isinstance(image, Image.Image) and image.size == (w, h) else self._fit_panel(image, (w, h), layout, i)
+            canvas.paste(img, (x, y))
+        except Exception as e:
+            logger.error(f"Failed to load panel image {image if isinstance(image, str) else i + 1}: {e}")
+            # Create placeholder
+            placeholder = Image.new('RGB', (w, h), '#f0f0f0')
+            draw = ImageDraw.Draw(placeholder)
+            draw.text((w//2, h//2), f"Panel {i+1}", fill='black', anchor='mm')
+            canvas.paste(placeholder, (x, y))
+    
+    def _save_comic(self, canvas: Image.Image, output_format: OutputFormat = None) -> str:
         # Save comic
-        output_path = f"output/comics/comic_{os.urandom(8).hex()}.png"
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        canvas.save(output_path)
-        
-        return output_path
+        output_format = output_format or self.output_format()
+        with metrics.PAGE_ENCODE_SECONDS.time(format=output_format.format):
+            return save_page(canvas, f"output/comics/comic_{os.urandom(8).hex()}", output_format)
+    
+    def _save_placeholder(self, img: Image.Image, panel_index: int) -> str:
+        placeholder_path = f"output/temp/prompt_placeholder_{panel_index}_{os.urandom(4).hex()}.png"
+        os.makedirs(os.path.dirname(placeholder_path), exist_ok=True)
+        # Preview-only file, so favour speed over size
+        img.save(placeholder_path, compress_level=1)
+        return placeholder_path
     
-    def _create_prompt_placeholder(self, prompt_text: str, panel_index: int, style: str) -> str:
-        """Create a placeholder image showing the generated prompt"""
+    def _render_prompt_placeholder(self, prompt_text: str, panel_index: int, style: str) -> Image.Image:
+        """Draw a placeholder image showing the generated prompt"""
         try:
             from PIL import ImageFont
             
@@ -209,12 +562,7 @@ class ComicGenerator:
             draw.text((margin, img_height - 40), "ComfyUI Unavailable - Showing Generated Prompt", 
                      fill='#888888', font=font_small)
             
-            # Save placeholder
-            placeholder_path = f"output/temp/prompt_placeholder_{panel_index}_{os.urandom(4).hex()}.png"
-            os.makedirs(os.path.dirname(placeholder_path), exist_ok=True)
-            img.save(placeholder_path)
-            
-            return placeholder_path
+            return img
             
         except Exception as e:
             logger.error(f"Failed to create prompt placeholder: {e}")
@@ -223,34 +571,4 @@ class ComicGenerator:
             draw = ImageDraw.Draw(img)
             draw.text((50, 350), f"Panel {panel_index + 1}\nPrompt: {prompt_text[:100]}...", 
                      fill='black')
-            
-            placeholder_path = f"output/temp/simple_placeholder_{panel_index}.png"
-            img.save(placeholder_path)
-            return placeholder_path
-    
-    def _get_page_dimensions(self, page_format: str) -> Tuple[int, int]:
-        """Get page dimensions in pixels (assuming 300 DPI)"""
-        if page_format == 'A4-P':  # A4 Portrait
-            return (2480, 3508)  # 210x297mm at 300 DPI
-        elif page_format == 'A4-L':  # A4 Landscape
-            return (3508, 2480)  # 297x210mm at 300 DPI
-        else:
-            return (2480, 3508)  # Default to A4 Portrait
-    
-    def _get_default_layout(self, layout_preset: str, page: str) -> Dict:
-        """Get default layout geometry for preset"""
-        # Simple 2x2 layout as default
-        return {
-            'cols': 2,
-            'rows': 2,
-            'gapPx': 20,
-            'outerMarginPx': 60,
-            'page': {'bg': '#ffffff'},
-            'panel': {'bg': '#ffffff', 'borderPx': 2, 'borderColor': '#000000'},
-            'cells': [
-                {'index': 0, 'x': 0.0, 'y': 0.0, 'w': 0.48, 'h': 0.48},
-                {'index': 1, 'x': 0.52, 'y': 0.0, 'w': 0.48, 'h': 0.48},
-                {'index': 2, 'x': 0.0, 'y': 0.52, 'w': 0.48, 'h': 0.48},
-                {'index': 3, 'x': 0.52, 'y': 0.52, 'w': 0.48, 'h': 0.48},
-            ]
-        }
+            return img
@@ -0,0 +1,50 @@
+"""
+Deadline
+A request's overall time budget, set where the request comes in and handed
+down so every network call and wait made for it gets only what is left
+"""
+
+import time
+from typing import Optional, Tuple
+
+from config import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out"""
+
+
+class Deadline:
+    """A point in time (on the monotonic clock) work must finish by; no seconds means no limit"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a limit"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self):
+        if self.expired:
+            raise DeadlineExceeded(f"Time budget of {self.seconds:.0f}s used up")
+
+    def timeout(self, limit: float) -> float:
+        """limit, cut down to the time left; raises DeadlineExceeded if there is none"""
+        self.check()
+        remaining = self.remaining()
+        return limit if remaining is None else min(limit, remaining)
+
+    def http_timeout(self, read: float = HTTP_READ_TIMEOUT) -> Tuple[float, float]:
+        """(connect, read) timeout for a requests call"""
+        return self.timeout(HTTP_CONNECT_TIMEOUT), self.timeout(read)
+
+
+# For calls made outside any request; never expires
+NO_DEADLINE = Deadline()
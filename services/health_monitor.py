@@ -0,0 +1,75 @@
+"""
+Health Monitor
+Probes Ollama and every ComfyUI backend in the background, so status checks
+are answered from memory and requests skip services that are known to be down
+"""
+
+import time
+import threading
+import logging
+from typing import Dict
+
+from config import HEALTH_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    def __init__(self, ollama_service, comfyui_service, interval: float = HEALTH_CHECK_INTERVAL):
+        self.ollama = ollama_service
+        self.comfyui = comfyui_service
+        self.interval = interval
+
+        self._snapshot = {'ollama': 'checking', 'comfyui': 'checking', 'comfyui_backends': [], 'checked_at': None}
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start probing in a background thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            pool = self.comfyui.pool
+            pool.refresh_interval = self.interval
+            pool.monitored = True
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self.comfyui.pool.monitored = False
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout=self.interval)
+
+    def snapshot(self) -> Dict:
+        """The latest health of every service; never blocks on the network"""
+        return self._snapshot
+
+    def check_now(self) -> Dict:
+        """Probe every service, update the snapshot and return it"""
+        ollama_healthy = self.ollama.probe()
+        self.comfyui.pool.refresh()
+        backends = self.comfyui.pool.statuses()
+
+        # Swapped in whole, so readers never see a half-updated snapshot
+        self._snapshot = {
+            'ollama': 'online' if ollama_healthy else 'offline',
+            'comfyui': 'online' if any(b['healthy'] for b in backends) else 'offline',
+            'ollama_latency': round(self.ollama.latency, 4) if ollama_healthy else None,
+            'ollama_models': list(self.ollama.models) if ollama_healthy else [],
+            'comfyui_backends': backends,
+            'checked_at': time.time(),
+        }
+        return self._snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check_now()
+            except Exception as e:
+                logger.error(f"Health check failed: {e}")
+            self._stop.wait(self.interval)
@@ -0,0 +1,43 @@
+"""
+HTTP Client
+Pooled keep-alive sessions shared by the Ollama and ComfyUI services
+"""
+
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import (HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+                    HTTP_RETRIES, HTTP_RETRY_BACKOFF)
+
+logger = logging.getLogger(__name__)
+
+# Default (connect, read) timeout for calls that don't need a longer read
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+def create_session(pool_size: int = HTTP_POOL_SIZE, retries: int = HTTP_RETRIES,
+                   backoff: float = HTTP_RETRY_BACKOFF) -> requests.Session:
+    """
+    Build a session whose connection pool is safe to share between threads.
+
+    Connections are kept alive and reused per host. Only idempotent requests
+    are retried, so a POST that reached the server is never submitted twice.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        backoff_factor=backoff,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    logger.debug(f"Created HTTP session with pool size {pool_size}, {retries} retries")
+    return session
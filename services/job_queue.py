@@ -0,0 +1,323 @@
+"""
+Job Queue
+Runs comic generation in a bounded pool of background workers so API calls
+return immediately; jobs persist in SQLite and survive restarts
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import sqlite3
+import threading
+import logging
+from typing import Dict, Optional
+
+from config import REQUEST_DEADLINE
+from services import metrics
+from services.comic_generator import GenerationCancelled
+from services.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+
+class _EventLog:
+    """Replayable, append-only list of progress events for one job"""
+
+    def __init__(self):
+        self.events = []
+        self.finished = False
+        self.condition = threading.Condition()
+
+    def append(self, event, data, finished=False):
+        with self.condition:
+            self.events.append((event, data))
+            self.finished = self.finished or finished
+            self.condition.notify_all()
+
+
+class JobQueue:
+    # Event logs of finished jobs kept in memory for late subscribers
+    MAX_FINISHED_LOGS = 100
+
+    def __init__(self, comic_generator, db_path: str, workers: int = 2):
+        self.comic_generator = comic_generator
+        self.db_path = db_path
+        self.workers = max(1, workers)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._cancel_events = {}
+        self._event_logs = {}
+        self._finished_logs = []
+        self._threads = []
+        self._started = False
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_db()
+
+    def start(self):
+        """Requeue unfinished jobs from the last run and start the workers (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+            db.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING))
+        for (job_id,) in rows:
+            self._enqueue(job_id)
+        if rows:
+            logger.info(f"Recovered {len(rows)} unfinished jobs")
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'comic-job-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, params: Dict) -> str:
+        """Persist a new job and queue it; returns the job ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, params, progress, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), json.dumps({'stage': QUEUED}), now, now)
+            )
+        self._enqueue(job_id)
+        logger.info(f"Queued comic job {job_id}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, status, params, progress, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'status': row[1],
+            'params': json.loads(row[2]),
+            'progress': json.loads(row[3] or '{}'),
+            'result': row[4],
+            'error': row[5],
+            'created_at': row[6],
+            'updated_at': row[7],
+        }
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; returns False if it already finished"""
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            )
+            if cursor.rowcount:
+                self._publish(job_id, CANCELLED, {'result': None, 'error': None}, finished=True)
+                return True
+            row = db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] != RUNNING:
+            return False
+        # Signalled only after reading the status, which the worker rewrites once it stops
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        return True
+
+    def events(self, job_id: str, after: int = 0, timeout: float = 15):
+        """
+        Yield (event_id, event, data) for a job, replaying from after and then
+        following live events until the job finishes. Yields None whenever
+        timeout passes without news so callers can send keep-alives.
+        """
+        with self._lock:
+            log = self._event_logs.get(job_id)
+        
+        if log is None:
+            # Not run by this process (or long finished): report the stored state
+            job = self.get(job_id)
+            if job is not None:
+                yield after + 1, job['status'], {'progress': job['progress'], 'result': job['result'], 'error': job['error']}
+            return
+        
+        position = after
+        while True:
+            with log.condition:
+                if position >= len(log.events) and not log.finished:
+                    log.condition.wait(timeout)
+                pending = log.events[position:]
+                finished = log.finished
+            
+            if not pending:
+                if finished:
+                    return
+                yield None
+                continue
+            
+            for event, data in pending:
+                position += 1
+                yield position, event, data
+
+    def _publish(self, job_id, event, data, finished=False):
+        with self._lock:
+            log = self._event_logs.get(job_id)
+            if log is None:
+                log = self._event_logs[job_id] = _EventLog()
+            if finished:
+                self._finished_logs.append(job_id)
+                while len(self._finished_logs) > self.MAX_FINISHED_LOGS:
+                    self._event_logs.pop(self._finished_logs.pop(0), None)
+        log.append(event, data, finished)
+
+    def _enqueue(self, job_id):
+        with self._lock:
+            self._cancel_events[job_id] = threading.Event()
+            self._event_logs.setdefault(job_id, _EventLog())
+        self._queue.put(job_id)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.error(f"Job worker crashed on {job_id}: {e}")
+            finally:
+                with self._lock:
+                    self._cancel_events.pop(job_id, None)
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED)
+            )
+            if not cursor.rowcount:
+                return  # Cancelled while it was waiting
+            params = json.loads(db.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+
+        with self._lock:
+            cancel_event = self._cancel_events.get(job_id)
+        # Time spent waiting in the queue doesn't count against the budget
+        deadline = Deadline(params.pop('timeout', None) or REQUEST_DEADLINE)
+
+        progress = {'stage': RUNNING, 'panels_total': None, 'panels_done': 0, 'panels': []}
+        progress_lock = threading.Lock()
+        self._save_progress(job_id, progress)
+        self._publish(job_id, RUNNING, {})
+
+        def on_progress(event, data):
+            # Panel events arrive from several render threads at once
+            with progress_lock:
+                if event == 'panel_described':
+                    progress['stage'] = 'rendering'
+                    progress['panels'].append({'index': data['index'], 'status': 'pending'})
+                elif event == 'story_ready':
+                    progress['panels_total'] = len(data['panels'])
+                elif event == 'panel_prompt_queued':
+                    progress['panels'][data['index']]['status'] = 'queued'
+                elif event == 'panel_done':
+                    progress['panels_done'] += 1
+                    progress['panels'][data['index']]['status'] = 'done'
+                elif event == 'stage_timings':
+                    progress['stage_timings'] = data['timings']
+                elif event == 'deadline_exceeded':
+                    progress['unrendered_panels'] = data['panels']
+                elif event == 'comic_assembled':
+                    progress['stage'] = 'assembled'
+                self._save_progress(job_id, progress)
+            self._publish(job_id, event, data)
+
+        metrics.JOBS_RUNNING.inc()
+        try:
+            comic_path = self.comic_generator.create_comic(
+                progress_callback=on_progress,
+                cancel_event=cancel_event,
+                deadline=deadline,
+                persist_panels=True,  # Subscribers get a URL for each finished panel
+                **params
+            )
+            self._finish(job_id, COMPLETED, result=comic_path)
+            logger.info(f"Job {job_id} completed: {comic_path}")
+        except GenerationCancelled:
+            self._finish(job_id, CANCELLED)
+            logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            self._finish(job_id, FAILED, error=str(e))
+            metrics.record_error('job', e)
+            logger.error(f"Job {job_id} failed: {e}")
+        finally:
+            metrics.JOBS_RUNNING.dec()
+
+    def _save_progress(self, job_id, progress):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(progress), time.time(), job_id)
+            )
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+        self._publish(job_id, status, {'result': result, 'error': error}, finished=True)
+
+    def _connect(self):
+        # One short-lived connection per operation keeps SQLite safe across threads
+        return _Connection(self.db_path)
+
+    def _init_db(self):
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+
+
+class _Connection:
+    """sqlite3 connection that commits on success and always closes"""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, timeout=30)
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.db.commit()
+            else:
+                self.db.rollback()
+        finally:
+            self.db.close()
@@ -0,0 +1,242 @@
+"""
+Metrics
+Counters, gauges and histograms kept in process and served from /metrics in
+the Prometheus text format. Recording one is a dict lookup and an addition
+under a lock, so the instrumentation stays on under full load.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+import requests
+
+from services.comfyui_errors import RenderTimeout
+
+# Latency buckets in seconds, from a fast HTTP call to a slow upscaled render
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # Label values tuple -> value
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple, extra: Dict = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in values]
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + ''.join(f"{sample}\n" for sample in self.samples())
+
+
+class Counter(_Metric):
+    """A count that only goes up: requests, errors, fallbacks"""
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """A value that goes up and down: work in flight"""
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribution of durations (or sizes) over fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), then sum and count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return entry[2] if entry else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._labels(key, {'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """A counter or gauge read at scrape time from func(), which returns {label values: value}"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Tuple[str, ...],
+                 func: Callable[[], Dict[Tuple, float]], registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.kind = kind
+        self.func = func
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in self.func().items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return ''.join(metric.render() for metric in metrics)
+
+
+REGISTRY = Registry()
+
+# Caches reporting hits and misses through their stats(), by name
+_caches = {}
+
+
+def watch_cache(name: str, cache):
+    """Export a cache's stats() (hits, misses, hit_rate, entries) under cache=name"""
+    if cache is not None:
+        _caches[name] = cache
+
+
+def _cache_stat(stat: str) -> Callable[[], Dict[Tuple, float]]:
+    def read():
+        return {(name,): cache.stats()[stat] for name, cache in list(_caches.items())}
+    return read
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# HTTP
+HTTP_REQUEST_SECONDS = Histogram('http_request_seconds', "Time to answer an API request",
+                                 ('endpoint', 'method', 'status'))
+HTTP_IN_PROGRESS = Gauge('http_requests_in_progress', "API requests being answered", ('endpoint',))
+
+# Story generation
+OLLAMA_SECONDS = Histogram('ollama_generation_seconds', "Time for Ollama to write a story", ('mode',))
+OLLAMA_IN_FLIGHT = Gauge('ollama_requests_in_flight', "Story requests waiting on Ollama")
+STORY_FALLBACKS = Counter('story_fallbacks_total', "Stories filled in with default panels because the LLM failed")
+
+# Rendering
+COMFYUI_QUEUE_WAIT_SECONDS = Histogram('comfyui_queue_wait_seconds',
+                                       "Time a prompt waited in ComfyUI's queue before it started running")
+COMFYUI_EXECUTION_SECONDS = Histogram('comfyui_execution_seconds', "Time ComfyUI spent running a prompt")
+COMFYUI_RENDER_SECONDS = Histogram('comfyui_render_seconds', "Time from queueing a prompt to having its result")
+COMFYUI_DOWNLOAD_SECONDS = Histogram('comfyui_image_download_seconds', "Time to fetch an image over /view")
+COMFYUI_IN_FLIGHT = Gauge('comfyui_prompts_in_flight', "Prompts queued or running on each backend", ('backend',))
+PANEL_PLACEHOLDERS = Counter('panel_placeholders_total', "Panels drawn as prompt placeholders instead of rendered")
+
+# Comics
+JOBS_RUNNING = Gauge('comic_jobs_running', "Background comic jobs being generated")
+PIPELINE_STAGE_SECONDS = Histogram('pipeline_stage_seconds', "Time one item spent in a pipeline stage", ('stage',))
+COMIC_ASSEMBLY_SECONDS = Histogram('comic_assembly_seconds',
+                                   "Time spent compositing a page's panels, then finishing, encoding and saving it")
+PAGE_ENCODE_SECONDS = Histogram('page_encode_seconds', "Time to encode and write a page image", ('format',))
+
+# Failures
+ERRORS = Counter('errors_total', "Failures by the stage they happened in and their type", ('stage', 'type'))
+TIMEOUTS = Counter('timeouts_total', "Waits that ran out of time, by stage", ('stage',))
+
+# Caches
+CACHE_HITS = CallbackMetric('cache_hits_total', "Cache lookups answered from the cache", 'counter', ('cache',),
+                            _cache_stat('hits'))
+CACHE_MISSES = CallbackMetric('cache_misses_total', "Cache lookups that missed", 'counter', ('cache',),
+                              _cache_stat('misses'))
+CACHE_HIT_RATIO = CallbackMetric('cache_hit_ratio', "Share of cache lookups that hit since startup", 'gauge',
+                                 ('cache',), _cache_stat('hit_rate'))
+CACHE_ENTRIES = CallbackMetric('cache_entries', "Entries held in each cache", 'gauge', ('cache',),
+                               _cache_stat('entries'))
+
+
+def record_error(stage: str, error: BaseException):
+    """Count a failure in stage, and also as a timeout if it was one"""
+    ERRORS.inc(stage=stage, type=type(error).__name__)
+    if isinstance(error, (TimeoutError, RenderTimeout, requests.exceptions.Timeout)):
+        TIMEOUTS.inc(stage=stage)
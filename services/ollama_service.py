@@ -1,67 +1,214 @@
 import requests
 import json
+import time
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Iterator
 from utils.prompt_templates import PANEL_GENERATION_PROMPT
+from utils.json_stream import PanelStreamParser
+from services import metrics
+from services.deadline import Deadline, NO_DEADLINE
+from services.http_client import create_session
+from services.story_cache import StoryCache
+from config import (OLLAMA_READ_TIMEOUT, STORY_CACHE_TTL, STORY_CACHE_MAX_ENTRIES,
+                    HEALTH_PROBE_TIMEOUT, HEALTH_MAX_AGE)
 
 logger = logging.getLogger(__name__)
 
 class OllamaService:
-    def __init__(self, base_url: str, model: str):
+    def __init__(self, base_url: str, model: str, session: requests.Session = None,
+                 story_cache: StoryCache = None):
         self.base_url = base_url
         self.model = model
+        self.session = session or create_session()
+        self.story_cache = story_cache or StoryCache(STORY_CACHE_TTL, STORY_CACHE_MAX_ENTRIES)
         
-    def generate_comic_panels(self, prompt: str, num_panels: int, style: str) -> List[Dict]:
+        # Result of the last probe(), kept current by HealthMonitor
+        self.healthy = None  # Unknown until probed
+        self.latency = None
+        self.models = []
+        self.last_checked = 0.0
+        
+    def probe(self, timeout: float = HEALTH_PROBE_TIMEOUT) -> bool:
+        """Check that Ollama answers /api/tags and record the result"""
+        started = time.time()
+        try:
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=timeout)
+            response.raise_for_status()
+            self.models = [model.get('name') for model in response.json().get('models', [])]
+            self.latency = time.time() - started
+            healthy = True
+        except Exception as e:
+            logger.debug(f"Ollama probe failed: {e}")
+            healthy = False
+        
+        if self.healthy is not None and healthy != self.healthy:
+            if healthy:
+                logger.info("Ollama is reachable again")
+            else:
+                logger.warning("Ollama stopped responding")
+        self.healthy = healthy
+        self.last_checked = time.time()
+        return healthy
+    
+    def generate_comic_panels(self, prompt: str, num_panels: int, style: str,
+                              deadline: Deadline = None, regenerate: bool = False) -> List[Dict]:
         """Generate panel descriptions from user prompt"""
+        return self.generate_story(prompt, num_panels, style, deadline, regenerate)[1]
+    
+    def generate_story(self, prompt: str, num_panels: int, style: str,
+                       deadline: Deadline = None, regenerate: bool = False) -> Tuple[Optional[str], List[Dict]]:
+        """
+        Generate panel descriptions and return them with a story ID for reuse.
+        A story cached for the same inputs is returned instead unless
+        regenerate is set; the new story then replaces it. The LLM call gets
+        whatever is left of deadline; if that runs out the fallback panels
+        are returned.
+        """
+        cached = None if regenerate else self.story_cache.lookup(prompt, num_panels, style, self.model)
+        if cached:
+            logger.info(f"Reusing cached story {cached[0]}")
+            return cached
         
-        system_prompt = PANEL_GENERATION_PROMPT.format(
-            num_panels=num_panels,
-            style=style
-        )
+        try:
+            with metrics.OLLAMA_IN_FLIGHT.track_in_progress(), metrics.OLLAMA_SECONDS.time(mode='request'):
+                panels = self._request_panels(prompt, num_panels, style, deadline or NO_DEADLINE)
+        except Exception as e:
+            logger.error(f"Failed to generate panels: {str(e)}")
+            metrics.record_error('story', e)
+            # Fallback to simple panel generation; not cached so the LLM gets another try
+            return None, self._fallback_panels(prompt, num_panels)
         
-        user_message = f"Create a {num_panels}-panel comic story based on: {prompt}"
+        story_id = self.story_cache.store(prompt, num_panels, style, self.model, panels)
+        return story_id, panels
+    
+    def stream_comic_panels(self, prompt: str, num_panels: int, style: str,
+                            deadline: Deadline = None, regenerate: bool = False) -> Iterator[Dict]:
+        """
+        Yield panel descriptions one at a time as the LLM finishes writing each
+        one, so rendering can start before the whole story exists. Panels the
+        LLM hasn't written when deadline runs out are filled in as fallbacks.
+        As with generate_story, regenerate skips the cached story.
+        """
+        deadline = deadline or NO_DEADLINE
+        cached = None if regenerate else self.story_cache.lookup(prompt, num_panels, style, self.model)
+        if cached:
+            logger.info(f"Reusing cached story {cached[0]}")
+            yield from cached[1]
+            return
         
+        panels = []
+        started = time.perf_counter()
+        metrics.OLLAMA_IN_FLIGHT.inc()
         try:
-            response = requests.post(
+            self._check_health()
+            with self.session.post(
                 f"{self.base_url}/api/generate",
                 json={
                     "model": self.model,
-                    "prompt": f"{system_prompt}\n\n{user_message}",
-                    "stream": False,
+                    "prompt": self._build_prompt(prompt, num_panels, style),
+                    "stream": True,
                     "format": "json"
-                }
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                panels_data = json.loads(result['response'])
-                
-                # Validate and clean panel data
-                panels = []
-                for i, panel in enumerate(panels_data.get('panels', [])):
-                    panels.append({
-                        'index': i,
-                        'description': panel.get('description', ''),
-                        'dialogue': panel.get('dialogue', ''),
-                        'camera_angle': panel.get('camera_angle', 'medium shot'),
-                        'emotion': panel.get('emotion', 'neutral'),
-                        'characters': panel.get('characters', 'main character'),
-                        'setting': panel.get('setting', 'generic scene')
-                    })
+                },
+                timeout=deadline.http_timeout(OLLAMA_READ_TIMEOUT),
+                stream=True
+            ) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Ollama API error: {response.status_code}")
                 
-                logger.info(f"Generated {len(panels)} panel descriptions")
-                return panels
-                
-            else:
-                raise Exception(f"Ollama API error: {response.status_code}")
+                parser = PanelStreamParser()
+                for line in response.iter_lines():
+                    # The read timeout only bounds each chunk, so keep an eye on the total
+                    deadline.check()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    for panel in parser.feed(chunk.get('response', '')):
+                        panel = self._normalize_panel(len(panels), panel)
+                        panels.append(panel)
+                        logger.debug(f"Streamed panel {panel['index'] + 1} description")
+                        yield panel
+                    if chunk.get('done'):
+                        break
                 
         except Exception as e:
-            logger.error(f"Failed to generate panels: {str(e)}")
-            # Fallback to simple panel generation
-            return self._fallback_panels(prompt, num_panels)
+            logger.error(f"Failed to stream panels: {str(e)}")
+            metrics.record_error('story', e)
+            # Fill in whatever the LLM didn't get to; partial stories aren't cached
+            for panel in self._fallback_panels(prompt, num_panels)[len(panels):]:
+                yield panel
+            return
+        finally:
+            metrics.OLLAMA_IN_FLIGHT.dec()
+            metrics.OLLAMA_SECONDS.observe(time.perf_counter() - started, mode='stream')
+        
+        if not panels:
+            logger.error("Ollama stream contained no panels")
+            yield from self._fallback_panels(prompt, num_panels)
+            return
+        
+        logger.info(f"Streamed {len(panels)} panel descriptions")
+        self.story_cache.store(prompt, num_panels, style, self.model, panels)
+    
+    def get_story(self, story_id: str) -> Optional[List[Dict]]:
+        """Look up panels previously returned by generate_story"""
+        return self.story_cache.get(story_id)
+    
+    def _request_panels(self, prompt: str, num_panels: int, style: str,
+                        deadline: Deadline = NO_DEADLINE) -> List[Dict]:
+        """Ask the LLM for panel descriptions"""
+        self._check_health()
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json={
+                "model": self.model,
+                "prompt": self._build_prompt(prompt, num_panels, style),
+                "stream": False,
+                "format": "json"
+            },
+            timeout=deadline.http_timeout(OLLAMA_READ_TIMEOUT)
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Ollama API error: {response.status_code}")
+        
+        result = response.json()
+        panels_data = json.loads(result['response'])
+        
+        # Validate and clean panel data
+        panels = [self._normalize_panel(i, panel) for i, panel in enumerate(panels_data.get('panels', []))]
+        
+        logger.info(f"Generated {len(panels)} panel descriptions")
+        return panels
+    
+    def _check_health(self):
+        # A recent failed probe means the request would only sit until it times out
+        if self.healthy is False and time.time() - self.last_checked <= HEALTH_MAX_AGE:
+            raise Exception("Ollama failed its last health check")
+    
+    def _build_prompt(self, prompt: str, num_panels: int, style: str) -> str:
+        system_prompt = PANEL_GENERATION_PROMPT.format(
+            num_panels=num_panels,
+            style=style
+        )
+        
+        user_message = f"Create a {num_panels}-panel comic story based on: {prompt}"
+        return f"{system_prompt}\n\n{user_message}"
+    
+    def _normalize_panel(self, index: int, panel: Dict) -> Dict:
+        """Fill in defaults for fields the LLM left out"""
+        return {
+            'index': index,
+            'description': panel.get('description', ''),
+            'dialogue': panel.get('dialogue', ''),
+            'camera_angle': panel.get('camera_angle', 'medium shot'),
+            'emotion': panel.get('emotion', 'neutral'),
+            'characters': panel.get('characters', 'main character'),
+            'setting': panel.get('setting', 'generic scene')
+        }
     
     def _fallback_panels(self, prompt: str, num_panels: int) -> List[Dict]:
         """Simple fallback if LLM fails"""
+        metrics.STORY_FALLBACKS.inc()
         panels = []
         for i in range(num_panels):
             panels.append({
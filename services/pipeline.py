@@ -0,0 +1,173 @@
+"""
+Pipeline Scheduler
+Runs a sequence of stages connected by bounded queues, so every stage starts
+on an item as soon as the stage before it has finished with it
+"""
+
+import time
+import queue
+import threading
+import logging
+from typing import Callable, Dict, Iterable, List
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class Stage:
+    """One step of a pipeline; func(item) returns the item for the next stage"""
+
+    def __init__(self, name: str, func: Callable, workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_seconds = 0.0
+        self.first_start = None
+        self.last_end = None
+        self._lock = threading.Lock()
+
+    def record(self, started: float, finished: float):
+        metrics.PIPELINE_STAGE_SECONDS.observe(finished - started, stage=self.name)
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += finished - started
+            self.max_seconds = max(self.max_seconds, finished - started)
+            if self.first_start is None or started < self.first_start:
+                self.first_start = started
+            if self.last_end is None or finished > self.last_end:
+                self.last_end = finished
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'items': self.items,
+                'busy_seconds': round(self.busy_seconds, 3),
+                'mean_seconds': round(self.busy_seconds / self.items, 3) if self.items else 0.0,
+                'max_seconds': round(self.max_seconds, 3),
+                'active_seconds': round(self.last_end - self.first_start, 3) if self.items else 0.0,
+            }
+
+
+class Pipeline:
+    """
+    Feeds items from a source through the stages in order. Each stage has its
+    own worker threads; queues between stages hold at most queue_size items,
+    so a slow stage applies backpressure instead of letting work pile up.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4, source_name: str = 'source'):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.source_name = source_name
+        self.stats = {name: StageStats(name) for name in [source_name] + [stage.name for stage in stages]}
+
+        # Set once any stage fails; remaining items are dropped
+        self.aborted = threading.Event()
+        self._error = None
+        self._error_lock = threading.Lock()
+
+    def run(self, source: Iterable) -> List:
+        """Process every source item; returns the last stage's results in source order"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(source, queues[0]), name=f'pipeline-{self.source_name}', daemon=True)]
+
+        for position, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(stage, queues[position], queues[position + 1], remaining, remaining_lock),
+                    name=f'pipeline-{stage.name}-{worker}',
+                    daemon=True
+                ))
+
+        for thread in threads:
+            thread.start()
+
+        results = {}
+        while True:
+            item = queues[-1].get()
+            if item is _END:
+                break
+            index, value = item
+            results[index] = value
+
+        for thread in threads:
+            thread.join()
+
+        if self._error is not None:
+            raise self._error
+        return [results[index] for index in sorted(results)]
+
+    def stage_timings(self) -> Dict[str, Dict]:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def log_timings(self, label: str = 'Pipeline'):
+        timings = self.stage_timings()
+        bottleneck = max(timings, key=lambda name: timings[name]['busy_seconds'])
+        summary = ", ".join(
+            f"{name} {timing['busy_seconds']:.2f}s/{timing['items']}" for name, timing in timings.items()
+        )
+        logger.info(f"{label} stage timings: {summary} (busiest: {bottleneck})")
+
+    def _fail(self, error):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+        self.aborted.set()
+
+    def _feed(self, source, out_queue):
+        stats = self.stats[self.source_name]
+        try:
+            iterator = iter(source)
+            index = 0
+            while not self.aborted.is_set():
+                started = time.time()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.record(started, time.time())
+                out_queue.put((index, item))
+                index += 1
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            out_queue.put(_END)
+
+    def _work(self, stage, in_queue, out_queue, remaining, remaining_lock):
+        stats = self.stats[stage.name]
+        while True:
+            item = in_queue.get()
+            if item is _END:
+                in_queue.put(_END)  # Let this stage's other workers see it too
+                break
+            if self.aborted.is_set():
+                continue  # Drain so upstream never blocks on a full queue
+
+            index, value = item
+            started = time.time()
+            try:
+                value = stage.func(value)
+            except BaseException as e:
+                self._fail(e)
+                continue
+            stats.record(started, time.time())
+            out_queue.put((index, value))
+
+        with remaining_lock:
+            remaining[0] -= 1
+            last_worker = remaining[0] == 0
+        if last_worker:
+            out_queue.put(_END)
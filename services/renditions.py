@@ -0,0 +1,116 @@
+"""
+Comic Renditions
+Smaller derivatives of finished pages (thumbnail, screen) so the UI never has
+to download and decode a 300 DPI print file just to show a preview. The
+full-size page is written once; these are its only derivatives.
+"""
+
+import os
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image
+
+from utils.image_fit import resample
+
+logger = logging.getLogger(__name__)
+
+# The original page file is served as this rendition
+PRINT = 'print'
+
+
+class RenditionStore:
+    """
+    Derivatives of the pages in comics_dir, written to directory as WebP.
+    renditions maps a name to its maximum width in pixels.
+    """
+
+    def __init__(self, comics_dir: str, directory: str, renditions: Dict[str, int], quality: int = 82):
+        self.comics_dir = comics_dir
+        self.directory = directory
+        self.renditions = dict(renditions)
+        self.quality = quality
+
+        self._lock = threading.Lock()
+        self._building = {}  # path -> Lock, so a rendition is only ever built once at a time
+        # One background worker, so eager builds never hold up the request that saved the page
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='renditions')
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def names(self):
+        return list(self.renditions) + [PRINT]
+
+    def path_for(self, filename: str, rendition: str) -> Optional[str]:
+        """
+        Local path of a page's rendition, building and caching it on first
+        request. Returns None if the page doesn't exist; raises ValueError for
+        an unknown rendition.
+        """
+        if rendition != PRINT and rendition not in self.renditions:
+            raise ValueError(f"Unknown rendition: {rendition}")
+
+        source = os.path.join(self.comics_dir, os.path.basename(filename))
+        if not os.path.isfile(source):
+            return None
+        if rendition == PRINT:
+            return source
+
+        path = self._rendition_path(filename, rendition)
+        if not os.path.exists(path):
+            def write():
+                with Image.open(source) as page:
+                    self._write(page, path, self.renditions[rendition])
+            self._build(path, write)
+        return path
+
+    def create_all(self, page: Image.Image, page_path: str):
+        """Write every rendition of a page that is still in memory"""
+        for name, max_width in self.renditions.items():
+            path = self._rendition_path(page_path, name)
+            try:
+                self._build(path, lambda: self._write(page, path, max_width))
+            except Exception as e:
+                # The rendition will be built on first request instead
+                logger.warning(f"Failed to create {name} rendition of {page_path}: {e}")
+
+    def create_all_async(self, page: Image.Image, page_path: str) -> Future:
+        """
+        create_all in the background; page must not be changed afterwards.
+        A request arriving first builds the rendition it asks for itself.
+        """
+        return self._executor.submit(self.create_all, page, page_path)
+
+    def _build(self, path, write):
+        """Run write() unless path exists, once at a time per path"""
+        with self._lock:
+            lock = self._building.setdefault(path, threading.Lock())
+        try:
+            with lock:
+                if not os.path.exists(path):
+                    write()
+        finally:
+            with self._lock:
+                self._building.pop(path, None)
+
+    def _rendition_path(self, page_path, rendition):
+        stem = os.path.splitext(os.path.basename(page_path))[0]
+        return os.path.join(self.directory, f"{stem}_{rendition}.webp")
+
+    def _write(self, page, path, max_width):
+        if page.width > max_width:
+            if page.format == 'JPEG':
+                # Let the JPEG decoder do most of the shrinking via DCT scaling
+                page.draft('RGB', (max_width, page.height * max_width // page.width))
+            height = max(1, round(page.height * max_width / page.width))
+            image = resample(page, (max_width, height))
+        else:
+            image = page
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        image.save(temp_path, format='WEBP', quality=self.quality, method=4)
+        os.replace(temp_path, path)
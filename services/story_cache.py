@@ -0,0 +1,84 @@
+"""
+Story Cache
+Keeps generated panel descriptions for a while so a story shown to the user
+can be rendered without asking the LLM again
+"""
+
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+
+class StoryCache:
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._stories = OrderedDict()  # story_id -> (key, panels, expires_at), oldest first
+        self._ids_by_key = {}
+
+    def lookup(self, prompt: str, num_panels: int, style: str, model: str) -> Optional[Tuple[str, List[Dict]]]:
+        """Find a live story generated from the same inputs"""
+        key = (prompt, num_panels, style, model)
+        with self._lock:
+            story_id = self._ids_by_key.get(key)
+            panels = self._get_locked(story_id) if story_id else None
+            if panels is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return story_id, panels
+
+    def get(self, story_id: str) -> Optional[List[Dict]]:
+        """Fetch a story by the ID returned from store()"""
+        with self._lock:
+            panels = self._get_locked(story_id)
+            if panels is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return panels
+
+    def store(self, prompt: str, num_panels: int, style: str, model: str, panels: List[Dict]) -> str:
+        """Remember a story and return its ID"""
+        key = (prompt, num_panels, style, model)
+        story_id = uuid.uuid4().hex
+        with self._lock:
+            old_id = self._ids_by_key.pop(key, None)
+            if old_id:
+                self._stories.pop(old_id, None)
+            self._stories[story_id] = (key, [dict(panel) for panel in panels], time.time() + self.ttl)
+            self._ids_by_key[key] = story_id
+
+            while len(self._stories) > self.max_entries:
+                _, (old_key, _, _) = self._stories.popitem(last=False)
+                self._ids_by_key.pop(old_key, None)
+        return story_id
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._stories),
+            }
+
+    def _get_locked(self, story_id):
+        entry = self._stories.get(story_id)
+        if entry is None:
+            return None
+        key, panels, expires_at = entry
+        if expires_at < time.time():
+            del self._stories[story_id]
+            if self._ids_by_key.get(key) == story_id:
+                del self._ids_by_key[key]
+            return None
+        # Hand out copies so callers can't change the cached story
+        return [dict(panel) for panel in panels]
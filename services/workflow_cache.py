@@ -0,0 +1,206 @@
+"""
+Workflow Template Cache
+Parses each ComfyUI workflow file once and hands out cheap per-request copies
+"""
+
+import os
+import json
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Nodes ComfyUIService patches for every panel: prompt, sampler seed, upscale seed
+PATCHED_NODES = ("6", "31", "42")
+
+
+class WorkflowCache:
+    """Parsed workflow templates keyed by path, reloaded when the file's mtime changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+        self.hits = 0
+        self.loads = 0  # Parses of a missing or changed file, i.e. misses
+
+    def get(self, path):
+        """Return the shared parsed template; callers must not mutate it"""
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._templates.get(path)
+            if cached is not None and cached[0] == mtime:
+                self.hits += 1
+                return cached[1]
+
+        with open(path, 'r') as f:
+            template = json.load(f)
+
+        with self._lock:
+            self._templates[path] = (mtime, template)
+            self.loads += 1
+        logger.debug(f"Parsed workflow template {path} with {len(template)} nodes")
+        return template
+
+    def checkout(self, path, patched_nodes=PATCHED_NODES):
+        """
+        Return a per-request copy of the workflow.
+
+        The top-level mapping is new and the nodes listed in patched_nodes get
+        their own node and inputs dicts; every other node is shared with the
+        template, so only those nodes may be modified.
+        """
+        template = self.get(path)
+        workflow = dict(template)
+        for node_id in patched_nodes:
+            node = template.get(node_id)
+            if isinstance(node, dict):
+                workflow[node_id] = {**node, "inputs": dict(node.get("inputs", {}))}
+        return workflow
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.loads
+            return {
+                'hits': self.hits,
+                'misses': self.loads,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._templates),
+            }
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(path, None)
+
+
+def panel_nodes(workflow, patched_nodes=PATCHED_NODES):
+    """
+    IDs of the nodes that differ between panels: the patched nodes and
+    everything downstream of them. The rest (checkpoint, LoRAs, negative
+    prompt, empty latent, upscale model) can be shared by a batched page.
+    """
+    per_panel = {node_id for node_id in patched_nodes if node_id in workflow}
+    changed = True
+    while changed:
+        changed = False
+        for node_id, node in workflow.items():
+            if node_id in per_panel or not isinstance(node, dict):
+                continue
+            if any(_link_target(value) in per_panel for value in node.get("inputs", {}).values()):
+                per_panel.add(node_id)
+                changed = True
+    return [node_id for node_id in workflow if node_id in per_panel]
+
+
+def batch_workflow(panel_workflows, patched_nodes=PATCHED_NODES):
+    """
+    Merge single-panel workflows into one prompt that renders them all.
+
+    Nodes that are identical in every panel (outside the patched nodes and
+    their dependents) are taken once; each panel's own nodes keep their IDs
+    for the first panel and get an "_<n>" suffix after that, with links
+    rewired to match. Panels may differ in more than the patched nodes, e.g.
+    their latent size. Returns the merged workflow and, per panel, the IDs
+    of its SaveImage nodes, final image first (see output_nodes).
+    """
+    differing = set(patched_nodes)
+    for node_id in set().union(*panel_workflows):
+        first = panel_workflows[0].get(node_id)
+        if any(workflow.get(node_id) != first for workflow in panel_workflows[1:]):
+            differing.add(node_id)
+
+    per_panel = [panel_nodes(workflow, differing) for workflow in panel_workflows]
+    not_shared = set().union(*per_panel)
+    merged = {}
+    for workflow in panel_workflows:
+        for node_id, node in workflow.items():
+            if node_id not in not_shared:
+                merged.setdefault(node_id, node)
+
+    outputs = []
+    for n, (workflow, nodes) in enumerate(zip(panel_workflows, per_panel)):
+        ids = {node_id: node_id if n == 0 else f"{node_id}_{n}" for node_id in nodes}
+        saves = [node_id for node_id in output_nodes(workflow) if node_id in ids]
+        for node_id in nodes:
+            node = workflow[node_id]
+            inputs = {
+                name: [ids[value[0]], value[1]] if _link_target(value) in ids else value
+                for name, value in node.get("inputs", {}).items()
+            }
+            merged[ids[node_id]] = {**node, "inputs": inputs}
+        outputs.append([ids[node_id] for node_id in saves])
+    return merged, outputs
+
+
+def output_nodes(workflow):
+    """
+    IDs of the workflow's SaveImage nodes, the one with the longest chain of
+    nodes upstream (the final, e.g. upscaled, image) first
+    """
+    depths = {}
+
+    def depth(node_id):
+        if node_id not in depths:
+            depths[node_id] = 0  # Guards against a cycle
+            node = workflow.get(node_id)
+            inputs = node.get("inputs", {}).values() if isinstance(node, dict) else ()
+            depths[node_id] = 1 + max((depth(_link_target(value)) for value in inputs
+                                       if _link_target(value) in workflow), default=0)
+        return depths[node_id]
+
+    saves = [node_id for node_id, node in workflow.items()
+             if isinstance(node, dict) and node.get("class_type") == "SaveImage"]
+    # sorted is stable, so ties keep template order
+    return sorted(saves, key=depth, reverse=True)
+
+
+def validate_workflow(workflow, object_info):
+    """
+    Problems ComfyUI would reject the workflow for, checked against its
+    /object_info: unknown node types, missing required inputs, links to
+    nodes that aren't there, and choices (models, samplers) it doesn't have
+    """
+    problems = []
+    for node_id, node in workflow.items():
+        class_type = node.get("class_type")
+        info = object_info.get(class_type)
+        if info is None:
+            problems.append(f"node {node_id}: unknown node type {class_type}")
+            continue
+        inputs = node.get("inputs", {})
+        for name, spec in ((info.get("input") or {}).get("required") or {}).items():
+            if name not in inputs:
+                problems.append(f"node {node_id} ({class_type}): missing input {name}")
+                continue
+            target = _link_target(inputs[name])
+            if target is not None:
+                if target not in workflow:
+                    problems.append(f"node {node_id} ({class_type}): {name} links to missing node {target}")
+                continue
+            choices = _choices(spec)
+            if choices is not None and inputs[name] not in choices:
+                problems.append(f"node {node_id} ({class_type}): {name} {inputs[name]!r} is not available")
+    return problems
+
+
+def _choices(spec):
+    # Combo inputs are [[choice, ...], {...}], or ["COMBO", {"options": [...]}] on newer servers
+    if isinstance(spec, list) and spec:
+        if isinstance(spec[0], list):
+            return spec[0]
+        if spec[0] == "COMBO" and len(spec) > 1 and isinstance(spec[1], dict):
+            return spec[1].get("options")
+    return None
+
+
+def _link_target(value):
+    # Links between nodes are [source_node_id, output_index]
+    if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str):
+        return value[0]
+    return None
+
+
+# Shared by every ComfyUIService in the process
+workflow_cache = WorkflowCache()
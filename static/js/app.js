@@ -37,98 +37,68 @@ function stopStatusChecking() {
     }
 }
 
-// Layout presets adapted from AI Comic Factory
-const LAYOUT_PRESETS = {
-    Layout0: {
-        id: "Layout0",
-        label: "2×2 grid (4 equal)",
-        cols: 2,
-        rows: 2,
-        panels: [
-            { colStart: 1, colSpan: 1, rowStart: 1, rowSpan: 1 },
-            { colStart: 2, colSpan: 1, rowStart: 1, rowSpan: 1 },
-            { colStart: 1, colSpan: 1, rowStart: 2, rowSpan: 1 },
-            { colStart: 2, colSpan: 1, rowStart: 2, rowSpan: 1 },
-        ]
-    },
-    Layout1: {
-        id: "Layout1",
-        label: "Tall middle columns",
-        cols: 2,
-        rows: 3,
-        panels: [
-            { colStart: 1, colSpan: 1, rowStart: 1, rowSpan: 1 },
-            { colStart: 2, colSpan: 1, rowStart: 1, rowSpan: 2 },
-            { colStart: 1, colSpan: 1, rowStart: 2, rowSpan: 2 },
-            { colStart: 2, colSpan: 1, rowStart: 3, rowSpan: 1 },
-        ]
-    },
-    Layout2: {
-        id: "Layout2",
-        label: "Right column tall",
-        cols: 3,
-        rows: 2,
-        panels: [
-            { colStart: 1, colSpan: 1, rowStart: 1, rowSpan: 1 },
-            { colStart: 2, colSpan: 1, rowStart: 1, rowSpan: 1 },
-            { colStart: 3, colSpan: 1, rowStart: 1, rowSpan: 2 },
-            { colStart: 1, colSpan: 2, rowStart: 2, rowSpan: 1 },
-        ]
-    },
-    Layout3: {
-        id: "Layout3",
-        label: "Wide top + mixed right",
-        cols: 3,
-        rows: 2,
-        panels: [
-            { colStart: 1, colSpan: 2, rowStart: 1, rowSpan: 1 },
-            { colStart: 3, colSpan: 1, rowStart: 1, rowSpan: 1 },
-            { colStart: 1, colSpan: 1, rowStart: 2, rowSpan: 1 },
-            { colStart: 2, colSpan: 2, rowStart: 2, rowSpan: 1 },
-        ]
-    },
-    Layout5: {
-        id: "Layout5",
-        label: "Stacked big bottom (5 panels)",
-        cols: 3,
-        rows: 3,
-        panels: [
-            { colStart: 1, colSpan: 2, rowStart: 1, rowSpan: 1 },
-            { colStart: 3, colSpan: 1, rowStart: 1, rowSpan: 1 },
-            { colStart: 1, colSpan: 1, rowStart: 2, rowSpan: 1 },
-            { colStart: 2, colSpan: 2, rowStart: 2, rowSpan: 1 },
-            { colStart: 1, colSpan: 3, rowStart: 3, rowSpan: 1 },
-        ]
+// Layout presets and page formats come from the server, which owns the page geometry
+const layoutCache = {};
+
+async function fetchLayouts(pageFormat, margin, gutter) {
+    const key = `${pageFormat}|${margin}|${gutter}`;
+    if (!layoutCache[key]) {
+        const params = new URLSearchParams({page: pageFormat, margin, gutter});
+        layoutCache[key] = fetch(`/api/layouts?${params}`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.error || 'Failed to load layouts');
+                return data;
+            })
+            .catch(error => {
+                delete layoutCache[key];
+                throw error;
+            });
     }
-};
+    return layoutCache[key];
+}
 
-function renderLayoutPreview() {
+function fillSelect(select, options, current) {
+    if (select.options.length === options.length) return;
+    select.innerHTML = options.map(option => `<option value="${option.id}">${option.label}</option>`).join('');
+    if (options.some(option => option.id === current)) select.value = current;
+}
+
+async function renderLayoutPreview() {
     const pageFormat = document.getElementById('pageFormat').value;
     const layoutId = document.getElementById('layout').value;
-    const margin = parseInt(document.getElementById('margin').value);
-    const gutter = parseInt(document.getElementById('gutter').value);
+    const margin = parseInt(document.getElementById('margin').value) || 0;
+    const gutter = parseInt(document.getElementById('gutter').value) || 0;
     const showOutlines = document.getElementById('showOutlines').checked;
     
-    const preset = LAYOUT_PRESETS[layoutId];
+    let data;
+    try {
+        data = await fetchLayouts(pageFormat, margin, gutter);
+    } catch (error) {
+        console.error('Layout preview failed:', error);
+        return;
+    }
+    fillSelect(document.getElementById('pageFormat'), data.pages, pageFormat);
+    fillSelect(document.getElementById('layout'), data.layouts, layoutId);
+    
+    const preset = data.layouts.find(layout => layout.id === layoutId);
     if (!preset) return;
     
-    const isPortrait = pageFormat === 'a4p';
-    const orientationClass = isPortrait ? 'portrait' : 'landscape';
+    // Cells are exact page pixels; draw them as percentages of the page
+    const {width, height, cells} = preset.layout;
+    const percent = (value, total) => `${(value / total) * 100}%`;
     
-    // Create the A4 page container
     const previewHtml = `
-        <div class="a4-page ${orientationClass}">
-            <div class="a4-content" style="padding: ${margin}px;">
-                <div class="layout-grid ${showOutlines ? 'debug' : ''}" 
-                     style="grid-template-columns: repeat(${preset.cols}, minmax(0, 1fr)); 
-                            grid-template-rows: repeat(${preset.rows}, minmax(0, 1fr)); 
-                            gap: ${gutter}px;">
-                    ${preset.panels.map((panel, i) => `
-                        <div style="grid-column: ${panel.colStart} / span ${panel.colSpan}; 
-                                    grid-row: ${panel.rowStart} / span ${panel.rowSpan};">
+        <div class="a4-page" style="aspect-ratio: ${width} / ${height};">
+            <div class="a4-content">
+                <div class="layout-grid ${showOutlines ? 'debug' : ''}">
+                    ${cells.map((cell, i) => `
+                        <div class="layout-cell"
+                             style="left: ${percent(cell.x, width)}; top: ${percent(cell.y, height)};
+                                    width: ${percent(cell.w, width)}; height: ${percent(cell.h, height)};">
                             <div class="panel-box">
                                 <span>#${i + 1}</span>
-                                <div class="panel-index">${panel.colSpan}×${panel.rowSpan}</div>
+                                <div class="panel-index">${preset.panels[i].colSpan}×${preset.panels[i].rowSpan}</div>
                             </div>
                         </div>
                     `).join('')}
@@ -157,20 +127,24 @@ function setupLayoutPreview() {
 
 let currentComicUrl = null;
 
+// Inputs of the last story shown; generating them again asks for a new story
+let lastStoryKey = null;
+
 async function generateComic() {
     const prompt = document.getElementById('prompt').value;
     const style = document.getElementById('style').value;
     const layoutId = document.getElementById('layout').value;
     const pageFormat = document.getElementById('pageFormat').value;
-    const margin = parseInt(document.getElementById('margin').value);
-    const gutter = parseInt(document.getElementById('gutter').value);
+    const margin = parseInt(document.getElementById('margin').value) || 0;
+    const gutter = parseInt(document.getElementById('gutter').value) || 0;
     
     if (!prompt) {
         alert('Please enter a comic description');
         return;
     }
     
-    const preset = LAYOUT_PRESETS[layoutId];
+    const layouts = await fetchLayouts(pageFormat, margin, gutter);
+    const preset = layouts.layouts.find(layout => layout.id === layoutId);
     const num_panels = preset.panels.length;
     
     // Show progress
@@ -182,68 +156,45 @@ async function generateComic() {
     try {
         // Step 1: Generate story panels
         updateStatus('Generating story panels...');
+        const storyKey = JSON.stringify([prompt, style, num_panels]);
         const storyResponse = await fetch('/api/generate_story', {
             method: 'POST',
             headers: {'Content-Type': 'application/json'},
-            body: JSON.stringify({prompt, style, num_panels})
+            body: JSON.stringify({prompt, style, num_panels, regenerate: storyKey === lastStoryKey})
         });
         
         const storyData = await storyResponse.json();
         
         if (storyData.success) {
+            lastStoryKey = storyKey;
             displayPanelDescriptions(storyData.panels);
             
             // Step 2: Generate complete comic
             updateStatus('Creating comic images...');
             
-            // Create geometry data for backend
-            const geometry = {
-                cols: preset.cols,
-                rows: preset.rows,
-                gapPx: gutter,
-                outerMarginPx: margin,
-                page: { bg: '#ffffff', borderPx: 1, borderColor: '#e5e7eb' },
-                panel: { bg: '#ffffff', borderPx: 1, borderColor: '#d1d5db', radiusPx: 4 },
-                cells: preset.panels.map((panel, i) => {
-                    // Calculate fractional positions for backend
-                    const totalCols = preset.cols;
-                    const totalRows = preset.rows;
-                    const colGaps = totalCols - 1;
-                    const rowGaps = totalRows - 1;
-                    
-                    const cellWidth = (1 - (colGaps * gutter) / 1000) / totalCols;
-                    const cellHeight = (1 - (rowGaps * gutter) / 1000) / totalRows;
-                    
-                    const x = (panel.colStart - 1) * cellWidth + ((panel.colStart - 1) * gutter) / 1000;
-                    const y = (panel.rowStart - 1) * cellHeight + ((panel.rowStart - 1) * gutter) / 1000;
-                    const w = panel.colSpan * cellWidth + ((panel.colSpan - 1) * gutter) / 1000;
-                    const h = panel.rowSpan * cellHeight + ((panel.rowSpan - 1) * gutter) / 1000;
-                    
-                    return { index: i, x, y, w, h };
-                })
-            };
-            
-            const comicResponse = await fetch('/api/generate_comic', {
+            const jobResponse = await fetch('/api/jobs', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({
                     prompt, 
                     style, 
                     num_panels,
+                    story_id: storyData.story_id,
                     layout_preset: layoutId,
                     page: pageFormat,
-                    geometry
+                    margin,
+                    gutter
                 })
             });
             
-            const comicData = await comicResponse.json();
-            
-            if (comicData.success) {
-                displayComic(comicData.comic_url);
-                updateStatus('Comic generated successfully!');
-            } else {
-                throw new Error(comicData.error || 'Comic generation failed');
+            const jobData = await jobResponse.json();
+            if (!jobData.success) {
+                throw new Error(jobData.error || 'Comic generation failed');
             }
+            
+            const comicUrl = await streamJob(jobData.job_id);
+            displayComic(comicUrl);
+            updateStatus('Comic generated successfully!');
         } else {
             throw new Error(storyData.error || 'Story generation failed');
         }
@@ -260,6 +211,93 @@ async function generateComic() {
     }
 }
 
+const JOB_POLL_INTERVAL_MS = 2000;
+
+function streamJob(jobId) {
+    // Follow the job's event stream, showing each panel as soon as it is rendered.
+    // Falls back to polling if the browser or a proxy can't hold the stream open.
+    if (!window.EventSource) {
+        return waitForJob(jobId);
+    }
+    
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`/api/jobs/${jobId}/events`);
+        let panelsTotal = 0;
+        let panelsDone = 0;
+        
+        source.addEventListener('panel_described', event => {
+            // Panels can start rendering before the whole story is written
+            panelsTotal = Math.max(panelsTotal, JSON.parse(event.data).index + 1);
+        });
+        source.addEventListener('story_ready', event => {
+            panelsTotal = JSON.parse(event.data).panels.length;
+            updateStatus(`Creating comic images... (0/${panelsTotal} panels)`);
+        });
+        source.addEventListener('panel_done', event => {
+            const data = JSON.parse(event.data);
+            panelsDone += 1;
+            showPanelImage(data.index, data.image_url);
+            updateStatus(`Creating comic images... (${panelsDone}/${panelsTotal} panels)`);
+        });
+        source.addEventListener('comic_assembled', event => {
+            updateStatus('Finishing page...');
+        });
+        source.addEventListener('completed', event => {
+            source.close();
+            resolve(JSON.parse(event.data).comic_url);
+        });
+        ['failed', 'cancelled'].forEach(status => {
+            source.addEventListener(status, event => {
+                source.close();
+                reject(new Error(JSON.parse(event.data).error || `Comic generation ${status}`));
+            });
+        });
+        source.onerror = () => {
+            source.close();
+            waitForJob(jobId).then(resolve, reject);
+        };
+    });
+}
+
+function showPanelImage(index, url) {
+    const panelDiv = document.querySelectorAll('#panelList .panel-description')[index];
+    if (!panelDiv || !url) return;
+    
+    let img = panelDiv.querySelector('img.panel-image');
+    if (!img) {
+        img = document.createElement('img');
+        img.className = 'panel-image';
+        img.alt = `Panel ${index + 1}`;
+        panelDiv.appendChild(img);
+    }
+    img.src = url;
+}
+
+async function waitForJob(jobId) {
+    // Poll the background job until it finishes, reporting panel progress
+    while (true) {
+        const response = await fetch(`/api/jobs/${jobId}`);
+        const job = await response.json();
+        
+        if (!job.success) {
+            throw new Error(job.error || 'Comic job not found');
+        }
+        if (job.status === 'completed') {
+            return job.comic_url;
+        }
+        if (job.status === 'failed' || job.status === 'cancelled') {
+            throw new Error(job.error || `Comic generation ${job.status}`);
+        }
+        
+        const progress = job.progress || {};
+        if (progress.panels_total) {
+            updateStatus(`Creating comic images... (${progress.panels_done}/${progress.panels_total} panels)`);
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+}
+
 function updateStatus(message) {
     document.getElementById('status').textContent = message;
 }
@@ -294,7 +332,8 @@ function displayPanelDescriptions(panels) {
 
 function displayComic(url) {
     currentComicUrl = url;
-    document.getElementById('comicImage').src = url;
+    // The full page is a 300 DPI print file; the preview pane only needs the screen rendition
+    document.getElementById('comicImage').src = `${url}?rendition=screen`;
     document.getElementById('result').classList.remove('hidden');
 }
 
@@ -302,7 +341,7 @@ function downloadComic() {
     if (currentComicUrl) {
         const a = document.createElement('a');
         a.href = currentComicUrl;
-        a.download = `comic_${Date.now()}.png`;
+        a.download = `comic_${Date.now()}${currentComicUrl.slice(currentComicUrl.lastIndexOf('.'))}`;
         document.body.appendChild(a);
         a.click();
         document.body.removeChild(a);
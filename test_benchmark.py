@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test the fake Ollama server and the benchmark harness built on the fakes
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+import config
+from fakes.ollama_server import FakeOllamaServer
+from services.ollama_service import OllamaService
+
+
+def test_fake_ollama_story():
+    """The fake answers streamed and unstreamed story requests with the panel count asked for"""
+    server = FakeOllamaServer(generation_time=0.05).start()
+    try:
+        ollama = OllamaService(server.url, 'fake-llm')
+        assert ollama.probe() and ollama.models == ['fake-llm']
+
+        story_id, panels = ollama.generate_story("a courier's long night", 3, 'comic')
+        assert story_id and len(panels) == 3
+        streamed = list(ollama.stream_comic_panels("a courier's long day", 5, 'comic'))
+        assert [panel['index'] for panel in streamed] == [0, 1, 2, 3, 4]
+        assert all('courier' in panel['description'] for panel in streamed)
+        assert server.requests == 2
+        print(f"✅ Fake Ollama wrote {len(panels)} and streamed {len(streamed)} panels")
+    finally:
+        server.stop()
+
+
+def test_fake_ollama_failures():
+    """Injected failures reach the service as errors, which it answers with fallback panels"""
+    server = FakeOllamaServer(generation_time=0.01, fail_rate=1.0).start()
+    try:
+        ollama = OllamaService(server.url, 'fake-llm')
+        story_id, panels = ollama.generate_story("a courier's long night", 2, 'comic')
+        assert story_id is None and len(panels) == 2
+        print("✅ Failed story fell back to default panels")
+    finally:
+        server.stop()
+
+
+def test_benchmark_report():
+    """A small generator run reports percentiles, throughput, memory and stage timings"""
+    original_url = config.OLLAMA_URL
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench.json')
+        reports = benchmark.main(['--scenario', 'generator', '--requests', '3', '--concurrency', '2',
+                                  '--render-time', '0.05', '--llm-time', '0.05', '--backends', '2',
+                                  '--json', path])
+        with open(path) as f:
+            assert json.load(f)['reports'] == reports
+
+    report = reports[0]
+    assert report['requests'] == 3 and report['errors'] == 0, report
+    latency = report['latency_seconds']
+    assert 0 < latency['p50'] <= latency['p95'] <= latency['p99'] <= latency['max']
+    assert report['throughput_per_second'] > 0
+    assert {'describe', 'submit', 'render', 'composite'} <= set(report['stages'])
+    assert config.OLLAMA_URL == original_url
+    print(f"✅ Benchmark p50 {latency['p50']}s, {report['throughput_per_second']} comics/s")
+
+
+def test_benchmark_app_scenarios():
+    """The API scenarios reach the fakes even when app.py was imported first"""
+    import app
+    original_ollama = app.ollama
+    bench = benchmark.Benchmark(benchmark.parse_args(['--requests', '2', '--concurrency', '2', '--warmup', '0',
+                                                      '--render-time', '0.05', '--llm-time', '0.01']))
+    bench.start_servers()
+    try:
+        story = bench.run('story').as_dict()
+        assert story['errors'] == 0 and bench.ollama_server.requests == 2, story
+        comic = bench.run('comic').as_dict()
+        assert comic['errors'] == 0, comic
+        assert sum(server.submitted for server in bench.comfyui_servers) == 2 * 4
+    finally:
+        bench.stop_servers()
+    assert app.ollama is original_ollama
+    print("✅ Story and comic scenarios ran against the fakes")
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert benchmark.percentile(values, 50) == 50
+    assert benchmark.percentile(values, 99) == 99
+    assert benchmark.percentile([3.0], 95) == 3.0
+    print("✅ Percentiles")
+
+
+if __name__ == "__main__":
+    test_fake_ollama_story()
+    test_fake_ollama_failures()
+    test_benchmark_report()
+    test_benchmark_app_scenarios()
+    test_percentile()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test multi-page book planning, page assembly and export
+"""
+
+import sys
+import os
+import io
+import re
+import tempfile
+import zipfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from utils.layout_presets import plan_pages
+from utils.layout_engine import get_layout
+from services.book_generator import compose_page, _write_pdf
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story, two panels longer than asked for like a chatty LLM"""
+    def get_story(self, story_id):
+        return None
+
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels + 2)]
+
+
+def test_plan_pages():
+    """Panels are split across pages and the last page fits what's left"""
+    assert plan_pages(4, ['Layout0']) == [('Layout0', 4)]
+    assert plan_pages(9, ['Layout0', 'Layout5']) == [('Layout0', 4), ('Layout5', 5)]
+    assert plan_pages(10, ['Layout0', 'Layout5']) == [('Layout0', 4), ('Layout5', 5), ('Layout0', 1)]
+    assert plan_pages(5, ['Layout0', 'Layout5']) == [('Layout0', 4), ('Layout0', 1)]
+    print("✅ Pages planned")
+
+
+def test_compose_page_and_pdf():
+    """A composed page fills its cells and PDF pages embed the JPEG untouched"""
+    panel = io.BytesIO()
+    Image.new('RGB', (768, 1152), '#336699').save(panel, format='PNG')
+    layout = get_layout('Layout0', 'A5-P', num_cells=2)
+
+    page = compose_page(layout, [(panel.getvalue(), None), (None, None)], 90)
+    image = Image.open(io.BytesIO(page))
+    assert image.format == 'JPEG' and image.size == (1748, 2480)
+    assert abs(image.getpixel((400, 600))[2] - 153) < 8  # First cell filled
+    assert image.getpixel((1300, 600)) == (255, 255, 255)  # Second cell left empty
+
+    pdf = io.BytesIO()
+    _write_pdf(pdf, [page, page], layout.page_size, 300)
+    data = pdf.getvalue()
+    assert data.startswith(b"%PDF-1.4") and data.count(page) == 2
+    # Every xref entry points at the object it names
+    xref = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    offsets = re.findall(rb"(\d{10}) 00000 n", data[xref:])
+    for number, offset in enumerate(offsets, start=1):
+        assert data[int(offset):].startswith(f"{number} 0 obj".encode()), number
+    print(f"✅ Page composed and written into a {len(data)} byte PDF")
+
+
+def test_create_book_cbz():
+    """Panels render through the shared pipeline and pages land in a CBZ; extra story panels aren't rendered"""
+    from fakes.comfyui_server import FakeComfyUIServer
+    from services.comfyui_service import ComfyUIService
+    from services.comic_generator import ComicGenerator
+    from services.book_generator import BookGenerator
+
+    server = FakeComfyUIServer(render_time=0.05).start()
+    comfyui = ComfyUIService(server.url, image_cache=False)
+    books = BookGenerator(ComicGenerator(StoryStub(), comfyui, stream_story=False), processes=2,
+                          book_dir=tempfile.mkdtemp())
+    try:
+        events = []
+        book = books.create_book("a cat's day", "comic", 6, layouts=['Layout0'], export='cbz',
+                                 progress_callback=lambda event, data: events.append(event))
+
+        assert server.submitted == 6
+        assert book['pages'] == [{'layout': 'Layout0', 'panels': 4}, {'layout': 'Layout0', 'panels': 2}]
+        with zipfile.ZipFile(book['path']) as archive:
+            assert archive.namelist() == ['page_001.jpg', 'page_002.jpg']
+        assert events.count('page_done') == 2 and events[-1] == 'book_assembled'
+        print(f"✅ Book written to {book['path']}")
+    finally:
+        books.shutdown()
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_book_endpoint_rejects_bad_numbers():
+    """Malformed numeric fields are a 400, not a failed book"""
+    from app import app
+    client = app.test_client()
+    for body in ({'num_panels': 'eight'}, {'num_panels': None}, {'num_panels': 0},
+                 {'gutter': 'wide'}, {'margin': [10]}, {'margin': -5}, {'timeout': 'soon'},
+                 {'timeout': 'nan'}, {'timeout': 'inf'}, {'timeout': -1},
+                 {'seed': 'lucky'}, {'seed': 1.5}, {'seed': True}):
+        response = client.post('/api/generate_book', json={'prompt': "a cat's day", **body})
+        assert response.status_code == 400, (body, response.get_json())
+        assert response.get_json()['success'] is False
+    print("✅ Bad book parameters were rejected with 400")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing book generation...")
+    print("=" * 50)
+    test_plan_pages()
+    test_compose_page_and_pdf()
+    test_create_book_cbz()
+    test_book_endpoint_rejects_bad_numbers()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test rendering several panels in one batched ComfyUI prompt
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator, GenerationCancelled
+from services.image_cache import ImageCache
+from services.workflow_cache import workflow_cache, batch_workflow
+
+
+def test_batch_workflow_shares_model_nodes():
+    """Loaders are shared while each panel gets its own sampler chain"""
+    workflows = [workflow_cache.checkout("workflows/comic_workflow_api.json") for _ in range(3)]
+    merged, outputs = batch_workflow(workflows)
+
+    for node_id in ("27", "30", "33", "41", "45", "46"):
+        assert node_id in merged and f"{node_id}_1" not in merged, node_id
+    assert merged["31_2"]["inputs"]["positive"] == ["6_2", 0]
+    assert merged["31_2"]["inputs"]["model"] == ["45", 0]
+    assert outputs == [["9", "43"], ["9_1", "43_1"], ["9_2", "43_2"]], outputs
+    print(f"✅ Batched workflow has {len(merged)} nodes for 3 panels")
+
+
+def test_batch_renders_in_panel_order():
+    """One prompt renders every panel and images come back per panel"""
+    for websocket in (True, False):
+        server = FakeComfyUIServer(render_time=0.1, websocket=websocket).start()
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        comfyui.tracker.connect_timeout = 0.5
+        try:
+            tickets = comfyui.submit_batch([f"panel {i}" for i in range(4)], "comic", seed=100)
+            paths = comfyui.collect_batch(tickets)
+
+            prompt_id = tickets[0].batch.prompt_id
+            assert server.submitted == 1
+            for path, node in zip(paths, ("9", "9_1", "9_2", "9_3")):
+                assert path.endswith(f"ComfyUI_{prompt_id[:8]}_{node}.png"), paths
+            assert all(ticket.image_data for ticket in tickets)
+            print(f"✅ 4 panels from one prompt ({'websocket' if websocket else 'polling'})")
+        finally:
+            comfyui.tracker.stop()
+            server.stop()
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+def test_cancel_batch_when_first_panel_cached():
+    """A cancelled comic stops its batch even when panel 0 came from the cache and isn't in it"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=ImageCache(tempfile.mkdtemp(), 10 * 1024 ** 2))
+        generator = ComicGenerator(StoryStub(), comfyui, batch_size=3, stream_story=False)
+        batches = []
+        submit_batch = comfyui.submit_batch
+        comfyui.submit_batch = lambda *args, **kwargs: batches.append(submit_batch(*args, **kwargs)) or batches[-1]
+
+        # Render the page once, then forget every panel but the first
+        generator.create_comic("a cat's day", "comic", 3, seed=7)
+        for ticket in batches[0][1:]:
+            os.remove(comfyui.image_cache.path_for(ticket.cache_key))
+
+        server.render_time = 10
+        cancel_event = threading.Event()
+
+        def cancel_when_rendering():
+            deadline = time.time() + 5
+            while server.running is None and time.time() < deadline:
+                time.sleep(0.02)
+            cancel_event.set()
+
+        threading.Thread(target=cancel_when_rendering, daemon=True).start()
+        start = time.time()
+        try:
+            generator.create_comic("a cat's day", "comic", 3, cancel_event=cancel_event, seed=7)
+            assert False, "expected GenerationCancelled"
+        except GenerationCancelled:
+            pass
+        elapsed = time.time() - start
+        assert batches[1][0].image_path and batches[1][0].batch is None
+        assert elapsed < 5, f"took {elapsed:.2f}s"
+        assert server.running is None and server.pending == []
+        print(f"✅ Cancelled the batch behind a cached first panel after {elapsed:.2f}s")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing batched panel rendering...")
+    print("=" * 50)
+    test_batch_workflow_shares_model_nodes()
+    test_batch_renders_in_panel_order()
+    test_cancel_batch_when_first_panel_cached()
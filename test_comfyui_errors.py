@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Test that ComfyUI failures surface as typed errors as soon as ComfyUI reports
+them, against a local fake ComfyUI server
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_errors import ComfyUIError, ExecutionError, ExecutionInterrupted, PromptRejected
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator, GenerationCancelled
+from services.workflow_cache import validate_workflow
+
+
+def _object_info(workflow, without=()):
+    """A node list covering the workflow's nodes, minus the class types in without"""
+    info = {}
+    for node in workflow.values():
+        inputs = {name: ["*"] for name in node['inputs']}
+        info[node['class_type']] = {'input': {'required': inputs}}
+    info['CheckpointLoaderSimple']['input']['required']['ckpt_name'] = [["Op-PonyV2.safetensors"], {}]
+    for class_type in without:
+        info.pop(class_type)
+    return info
+
+
+def _wait_until(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    assert condition()
+
+
+def test_execution_error_fails_fast():
+    """A node failure raises ExecutionError right away, over the websocket and over polling"""
+    for websocket in (True, False):
+        server = FakeComfyUIServer(render_time=0.2, websocket=websocket, fail_with='error').start()
+        try:
+            comfyui = ComfyUIService(server.url, image_cache=False)
+            comfyui.tracker.connect_timeout = 0.5
+            start = time.time()
+            try:
+                comfyui.collect_image(comfyui.submit_image("a cute cat superhero", "comic", 12345), timeout=30)
+                assert False, "expected ExecutionError"
+            except ExecutionError as e:
+                assert e.node_id == '31' and e.node_type == 'KSampler', (e.node_id, e.node_type)
+                assert 'OutOfMemoryError' in str(e), e
+            elapsed = time.time() - start
+            assert elapsed < 3, f"took {elapsed:.2f}s"
+            print(f"✅ ExecutionError after {elapsed:.2f}s (websocket={websocket})")
+        finally:
+            comfyui.tracker.stop()
+            server.stop()
+
+
+def test_rejected_prompt():
+    """A 400 from /prompt raises PromptRejected naming the node"""
+    comfyui = ComfyUIService("http://127.0.0.1:1", image_cache=False)
+    workflow = comfyui._load_workflow()
+    server = FakeComfyUIServer(object_info=_object_info(workflow, without=['UltimateSDUpscale'])).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        comfyui.validate_workflows = False
+        try:
+            comfyui.submit_image("a cute cat superhero", "comic", 12345)
+            assert False, "expected PromptRejected"
+        except PromptRejected as e:
+            assert e.node_id == '42', e.node_id
+            assert 'UltimateSDUpscale' in str(e), e
+        assert server.submitted == 0
+        print("✅ Rejected workflow raised PromptRejected")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_workflow_validated_before_queueing():
+    """Unknown nodes and missing models are caught from /object_info without queueing"""
+    comfyui = ComfyUIService("http://127.0.0.1:1", image_cache=False)
+    workflow = comfyui._load_workflow()
+    info = _object_info(workflow)
+    assert validate_workflow(workflow, info) == []
+
+    info['CheckpointLoaderSimple']['input']['required']['ckpt_name'] = [["other.safetensors"], {}]
+    problems = validate_workflow(workflow, info)
+    assert len(problems) == 1 and 'Op-PonyV2.safetensors' in problems[0], problems
+
+    server = FakeComfyUIServer(object_info=_object_info(workflow, without=['UpscaleModelLoader'])).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        for _ in range(2):
+            try:
+                comfyui.submit_image("a cute cat superhero", "comic", 12345)
+                assert False, "expected PromptRejected"
+            except PromptRejected as e:
+                assert any('UpscaleModelLoader' in problem for problem in e.details['problems']), e
+        assert server.submitted == 0
+        # Fetched once, refetched once per failure in case models were added since
+        assert server.object_info_requests == 3, server.object_info_requests
+        print("✅ Invalid workflow rejected before queueing")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_cancel_running_and_pending():
+    """cancel interrupts a running prompt and drops a pending one; both waiters get ExecutionInterrupted"""
+    server = FakeComfyUIServer(render_time=10).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        running = comfyui.submit_image("panel 1", "comic", 1)
+        pending = comfyui.submit_image("panel 2", "comic", 2)
+        _wait_until(lambda: server.running == running.prompt_id)
+
+        start = time.time()
+        comfyui.cancel(pending)
+        assert server.pending == []
+        try:
+            comfyui.collect_image(pending, timeout=30)
+            assert False, "expected ExecutionInterrupted"
+        except ExecutionInterrupted:
+            pass
+
+        comfyui.cancel(running)
+        try:
+            comfyui.collect_image(running, timeout=30)
+            assert False, "expected ExecutionInterrupted"
+        except ExecutionInterrupted as e:
+            assert e.prompt_id == running.prompt_id
+        elapsed = time.time() - start
+        assert elapsed < 3, f"took {elapsed:.2f}s"
+        print(f"✅ Cancelled a pending and a running prompt in {elapsed:.2f}s")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+def test_cancelled_comic_stops_its_prompts():
+    """Cancelling a comic interrupts the prompt ComfyUI is rendering instead of waiting it out"""
+    server = FakeComfyUIServer(render_time=10).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        generator = ComicGenerator(StoryStub(), comfyui, max_in_flight=2, stream_story=False)
+        cancel_event = threading.Event()
+
+        def cancel_when_rendering():
+            _wait_until(lambda: server.running is not None, timeout=5)
+            cancel_event.set()
+
+        threading.Thread(target=cancel_when_rendering, daemon=True).start()
+        start = time.time()
+        try:
+            generator.create_comic("a cat's day", "comic", 4, cancel_event=cancel_event)
+            assert False, "expected GenerationCancelled"
+        except GenerationCancelled:
+            pass
+        elapsed = time.time() - start
+        assert elapsed < 5, f"took {elapsed:.2f}s"
+        _wait_until(lambda: server.running is None and server.pending == [])
+        print(f"✅ Cancelled comic stopped its prompts after {elapsed:.2f}s")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_generate_image_raises():
+    """generate_image no longer hands back a placeholder path on failure"""
+    server = FakeComfyUIServer(render_time=0.1, fail_with='error').start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        try:
+            comfyui.generate_image("a cute cat superhero", "comic", 12345)
+            assert False, "expected ComfyUIError"
+        except ComfyUIError:
+            pass
+        print("✅ generate_image raised on a failed render")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_execution_error_fails_fast()
+    test_rejected_prompt()
+    test_workflow_validated_before_queueing()
+    test_cancel_running_and_pending()
+    test_cancelled_comic_stops_its_prompts()
+    test_generate_image_raises()
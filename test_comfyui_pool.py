@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test routing renders across several fake ComfyUI servers
+"""
+
+import sys
+import os
+import json
+import subprocess
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+
+
+def _stop(comfyui, *servers):
+    for backend in comfyui.pool.backends:
+        backend.tracker.stop()
+    for server in servers:
+        server.stop()
+
+
+def test_routes_to_least_loaded_backend():
+    """Concurrent prompts are spread over both servers"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    first = FakeComfyUIServer(render_time=0.2).start()
+    second = FakeComfyUIServer(render_time=0.2).start()
+    comfyui = ComfyUIService(backend_urls=[first.url, second.url], image_cache=False)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = list(executor.map(lambda i: comfyui.generate_image(f"panel {i}", "comic", i + 1), range(4)))
+
+        assert len(set(paths)) == 4, paths
+        assert first.submitted == 2 and second.submitted == 2, (first.submitted, second.submitted)
+        assert all(backend['in_flight'] == 0 for backend in comfyui.pool.statuses())
+        print("✅ Four prompts split evenly across two backends")
+    finally:
+        _stop(comfyui, first, second)
+
+
+def test_fails_over_to_healthy_backend():
+    """A stopped server is marked unhealthy and prompts go to the other one"""
+    dead = FakeComfyUIServer().start()
+    alive = FakeComfyUIServer(render_time=0.1).start()
+    dead.stop()
+    comfyui = ComfyUIService(backend_urls=[dead.url, alive.url], image_cache=False)
+    comfyui.pool.backends[0].tracker.connect_timeout = 0.5
+    try:
+        image_path = comfyui.generate_image("a cute cat superhero", "comic", 12345)
+
+        assert os.path.exists(image_path), image_path
+        assert alive.submitted == 1
+        assert not comfyui.pool.backends[0].healthy
+        print(f"✅ Failed over to {alive.url}: {image_path}")
+    finally:
+        _stop(comfyui, alive)
+
+
+def test_app_uses_every_backend():
+    """The server's own service is built from COMFYUI_URLS, not just COMFYUI_URL"""
+    env = dict(os.environ, COMFYUI_URLS="http://a:1, http://b:2")
+    # A fresh interpreter, so config reads the variable at import
+    result = subprocess.run(
+        [sys.executable, '-c', "import json, app; print(json.dumps([b.url for b in app.comfyui.pool.backends]))"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    urls = json.loads(result.stdout.strip().splitlines()[-1])
+    assert urls == ["http://a:1", "http://b:2"], urls
+    print(f"✅ App pool spans {urls}")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing ComfyUI backend pool...")
+    print("=" * 50)
+    test_routes_to_least_loaded_backend()
+    test_fails_over_to_healthy_backend()
+    test_app_uses_every_backend()
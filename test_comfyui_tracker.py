@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test websocket completion tracking against a local fake ComfyUI server
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+
+
+def test_websocket_completion():
+    """Prompts resolve from the event stream without polling /history"""
+    server = FakeComfyUIServer(render_time=0.3).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        comfyui.poll_interval = 10  # Anything that polls would blow the time budget
+
+        start = time.time()
+        image_path = comfyui.generate_image("a cute cat superhero", "comic", 12345)
+        elapsed = time.time() - start
+
+        assert comfyui.tracker.is_connected()
+        assert os.path.exists(image_path), image_path
+        assert elapsed < 2, f"took {elapsed:.2f}s"
+        print(f"✅ Websocket completion in {elapsed:.2f}s: {image_path}")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_shared_socket_multiplexes_prompts():
+    """Several in-flight prompts share one socket and each gets its own image"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    server = FakeComfyUIServer(render_time=0.1).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = list(executor.map(lambda i: comfyui.generate_image(f"panel {i}", "comic", i + 1), range(4)))
+
+        assert len(set(paths)) == 4, paths
+        assert len(server.ws_clients) == 1
+        print(f"✅ {len(paths)} prompts resolved over one socket")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_polling_fallback():
+    """Without a websocket the service falls back to /history polling"""
+    server = FakeComfyUIServer(render_time=0.2, websocket=False).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        comfyui.tracker.connect_timeout = 0.5
+
+        image_path = comfyui.generate_image("a cute cat superhero", "comic", 12345)
+
+        assert not comfyui.tracker.is_connected()
+        assert os.path.exists(image_path), image_path
+        print(f"✅ Polling fallback returned {image_path}")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_polling_uses_whole_timeout():
+    """Backoff doesn't give up early: the last poll lands at the timeout, not a full delay before it"""
+    server = FakeComfyUIServer(render_time=2.0, websocket=False).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        comfyui.poll_interval = 1  # Polls at 0s and 1s; the next 2s delay would overshoot 2.5s
+
+        ticket = comfyui.submit_image("a cute cat superhero", "comic", 12345)
+        started = time.time()
+        outputs = comfyui._poll_for_completion(ticket.prompt_id, 2.5)
+
+        assert outputs and time.time() - started < 3.5
+        print(f"✅ Final poll found the image after {time.time() - started:.1f}s")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_images_fetched_over_view():
+    """Results are downloaded into memory and the cache, not read from ComfyUI's disk"""
+    from services.image_cache import ImageCache
+    import tempfile
+
+    server = FakeComfyUIServer(render_time=0.1).start()
+    try:
+        cache = ImageCache(tempfile.mkdtemp(), 10 * 1024 ** 2)
+        comfyui = ComfyUIService(server.url, image_cache=cache)
+
+        ticket = comfyui.submit_image("a cute cat superhero", "comic", 12345)
+        image_path = comfyui.collect_image(ticket)
+
+        assert image_path == cache.path_for(ticket.cache_key)
+        assert ticket.image_data.startswith(b"\x89PNG")
+        with open(image_path, "rb") as f:
+            assert f.read() == ticket.image_data
+        print(f"✅ Image fetched over /view into {image_path}")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_waits_for_final_output():
+    """The intermediate save (node 43) arrives first, but the panel is the upscaled image (node 9)"""
+    for websocket in (True, False):
+        server = FakeComfyUIServer(render_time=0.1, websocket=websocket).start()
+        try:
+            comfyui = ComfyUIService(server.url, image_cache=False)
+            comfyui.tracker.connect_timeout = 0.5
+            ticket = comfyui.submit_image("a cute cat superhero", "comic", 12345)
+            assert ticket.output_nodes == ['9', '43'], ticket.output_nodes
+
+            image_path = comfyui.collect_image(ticket)
+            assert image_path.endswith('_9.png'), image_path
+            # The render slot is only given back once the whole prompt is done
+            assert server.running is None
+            print(f"✅ Final output used, not the intermediate save (websocket={websocket})")
+        finally:
+            comfyui.tracker.stop()
+            server.stop()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing ComfyUI completion tracking...")
+    print("=" * 50)
+    test_websocket_completion()
+    test_shared_socket_multiplexes_prompts()
+    test_polling_fallback()
+    test_polling_uses_whole_timeout()
+    test_images_fetched_over_view()
+    test_waits_for_final_output()
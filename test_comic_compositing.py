@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test that comics are composited from in-memory panels, writing panel files
+only when asked to, against a local fake ComfyUI server
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from config import TEMP_DIR, COMFYUI_OUTPUT_DIR
+from fakes.comfyui_server import FakeComfyUIServer
+from services import metrics
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+def panel_files():
+    """Every file in the directories rendered panels and placeholders are written to"""
+    return {os.path.join(root, name) for directory in (TEMP_DIR, COMFYUI_OUTPUT_DIR)
+            for root, _, names in os.walk(directory) for name in names}
+
+
+def test_unpersisted_comic_writes_only_the_page():
+    """Rendered panels and placeholders go straight onto the page; only persist_panels writes them out"""
+    # Some renders fail, so both rendered panels and placeholders are composited
+    server = FakeComfyUIServer(render_time=0.05, fail_rate=0.5, seed=3).start()
+    comfyui = ComfyUIService(server.url, image_cache=False)
+    try:
+        generator = ComicGenerator(StoryStub(), comfyui, stream_story=False)
+        before = panel_files()
+        placeholders = metrics.PANEL_PLACEHOLDERS.value()
+        comic_path = generator.create_comic("a cat's day", "comic", 4, persist_panels=False)
+
+        assert panel_files() == before
+        assert 0 < metrics.PANEL_PLACEHOLDERS.value() - placeholders < 4
+        with Image.open(comic_path) as page:
+            assert page.size[0] > 0
+
+        generator.create_comic("a cat's day", "comic", 4, persist_panels=True)
+        assert len(panel_files() - before) == 4
+        print(f"✅ {comic_path} composited without writing panel files")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_unpersisted_comic_writes_only_the_page()
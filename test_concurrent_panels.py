@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test that panels are rendered concurrently up to max_in_flight prompts,
+against a local fake ComfyUI server
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+def render_comic(max_in_flight):
+    """Render a 4 panel comic; returns the most prompts ComfyUI held at once and the panels"""
+    server = FakeComfyUIServer(render_time=0.2).start()
+    comfyui = ComfyUIService(server.url, image_cache=False)
+    depths = []
+    submit = server.submit
+
+    def counting_submit(workflow, client_id):
+        prompt_id = submit(workflow, client_id)
+        with server.lock:
+            depths.append(len(server.pending) + (server.running is not None))
+        return prompt_id
+
+    server.submit = counting_submit
+    try:
+        generator = ComicGenerator(StoryStub(), comfyui, max_in_flight=max_in_flight,
+                                   stream_story=False, batch_size=1)
+        panels, images = generator.render_panels(StoryStub().generate_comic_panels("a cat's day", 4, "comic"),
+                                                 "comic", persist_panels=False)
+        assert server.submitted == 4
+        return max(depths), panels
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_panels_render_concurrently():
+    """Up to max_in_flight prompts are queued in ComfyUI together, and panels keep story order"""
+    depth, panels = render_comic(max_in_flight=4)
+    assert depth >= 3, depth
+    assert [panel['index'] for panel in panels] == [0, 1, 2, 3]
+    print(f"✅ {depth} panels were in ComfyUI at once")
+
+
+def test_in_flight_limit():
+    """max_in_flight=1 renders one panel at a time"""
+    depth, panels = render_comic(max_in_flight=1)
+    assert depth == 1, depth
+    assert [panel['index'] for panel in panels] == [0, 1, 2, 3]
+    print("✅ max_in_flight=1 kept a single panel in ComfyUI")
+
+
+if __name__ == "__main__":
+    test_panels_render_concurrently()
+    test_in_flight_limit()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test that a request's time budget bounds the whole comic, against a local
+fake ComfyUI server
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_errors import ComfyUIError
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator
+from services.deadline import Deadline, DeadlineExceeded
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+def test_deadline_timeouts():
+    """Timeouts are cut down to what's left, and nothing is left once it expires"""
+    unlimited = Deadline()
+    assert unlimited.remaining() is None and not unlimited.expired
+    assert unlimited.timeout(300) == 300
+
+    deadline = Deadline(0.5)
+    assert deadline.timeout(300) <= 0.5
+    connect, read = deadline.http_timeout(300)
+    assert connect <= 0.5 and read <= 0.5
+    time.sleep(0.6)
+    assert deadline.expired and deadline.remaining() == 0
+    try:
+        deadline.timeout(300)
+        assert False, "expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+    print("✅ Deadline timeouts")
+
+
+def test_collect_bounded_by_deadline():
+    """collect_image waits no longer than the ticket's budget, whatever its own timeout"""
+    server = FakeComfyUIServer(render_time=10).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        ticket = comfyui.submit_image("a cute cat superhero", "comic", 12345, deadline=Deadline(0.5))
+        start = time.time()
+        try:
+            comfyui.collect_image(ticket, timeout=300)
+            assert False, "expected a timeout"
+        except (ComfyUIError, DeadlineExceeded):
+            pass
+        elapsed = time.time() - start
+        assert elapsed < 2, f"took {elapsed:.2f}s"
+        print(f"✅ Collect gave up after {elapsed:.2f}s")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_comic_returns_partial_result():
+    """When the budget runs out the comic comes back with placeholders and ComfyUI is left idle"""
+    server = FakeComfyUIServer(render_time=10).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        generator = ComicGenerator(StoryStub(), comfyui, max_in_flight=2, stream_story=False)
+        events = {}
+
+        start = time.time()
+        comic_path = generator.create_comic("a cat's day", "comic", 4, deadline=Deadline(1),
+                                            progress_callback=lambda event, data: events.setdefault(event, data))
+        elapsed = time.time() - start
+
+        assert os.path.exists(comic_path), comic_path
+        assert elapsed < 4, f"took {elapsed:.2f}s"
+        assert events['deadline_exceeded']['panels'] == [0, 1, 2, 3], events['deadline_exceeded']
+        # The two prompts in ComfyUI were cancelled and the other two never sent
+        deadline = time.time() + 2
+        while (server.running or server.pending) and time.time() < deadline:
+            time.sleep(0.05)
+        assert server.running is None and server.pending == []
+        assert server.submitted == 2, server.submitted
+        print(f"✅ Partial comic after {elapsed:.2f}s: {comic_path}")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_deadline_timeouts()
+    test_collect_bounded_by_deadline()
+    test_comic_returns_partial_result()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test background health checks of Ollama and the ComfyUI backends
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+from services.ollama_service import OllamaService
+from services.health_monitor import HealthMonitor
+
+# Nothing listens here, so connections are refused at once
+DEAD_URL = "http://127.0.0.1:9"
+
+
+def test_snapshot_reports_every_backend():
+    """One probe round fills in status, queue depth and VRAM for each service"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    comfyui = ComfyUIService(backend_urls=[server.url, DEAD_URL], image_cache=False)
+    monitor = HealthMonitor(OllamaService(DEAD_URL, "test"), comfyui, interval=60)
+    try:
+        assert monitor.snapshot()['comfyui'] == 'checking'
+        comfyui.pool.monitored = True
+        status = monitor.check_now()
+
+        assert status['ollama'] == 'offline' and status['comfyui'] == 'online'
+        live, dead = status['comfyui_backends']
+        assert live['healthy'] and live['vram_total'] == 8 << 30 and live['vram_free'] == 6 << 30
+        assert live['probe_latency'] is not None and live['queue_depth'] == 0
+        assert not dead['healthy'] and dead['vram_total'] is None
+        assert monitor.snapshot() is status
+        print(f"✅ Snapshot: {status['comfyui']} ComfyUI, {status['ollama']} Ollama")
+    finally:
+        comfyui.pool.monitored = False
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_known_down_services_are_skipped():
+    """With fresh health checks, calls to dead services fail fast instead of timing out"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    comfyui = ComfyUIService(server.url, image_cache=False)
+    ollama = OllamaService(DEAD_URL, "test")
+    monitor = HealthMonitor(ollama, comfyui, interval=60)
+    monitor.start()
+    try:
+        deadline = time.time() + 5
+        while monitor.snapshot()['checked_at'] is None and time.time() < deadline:
+            time.sleep(0.01)
+        assert comfyui.is_available()
+
+        server.stop()
+        monitor.check_now()
+        started = time.time()
+        assert not comfyui.is_available()
+        try:
+            comfyui.submit_image("a cat", "comic", seed=1)
+            assert False, "Prompt submitted to a dead backend"
+        except Exception:
+            pass
+        # The story falls back to template panels without trying the LLM
+        story_id, panels = ollama.generate_story("a cat", 3, "comic")
+        assert story_id is None and len(panels) == 3
+        assert time.time() - started < 0.5
+        print(f"✅ Dead services skipped in {time.time() - started:.3f}s")
+    finally:
+        monitor.stop()
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing health monitor...")
+    print("=" * 50)
+    test_snapshot_reports_every_backend()
+    test_known_down_services_are_skipped()
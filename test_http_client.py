@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the pooled HTTP sessions: keep-alive connection reuse, and retries for
+idempotent requests only
+"""
+
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.http_client import create_session, DEFAULT_TIMEOUT
+
+
+class UnavailableHandler(BaseHTTPRequestHandler):
+    """Answers every request with 503, counting them by method"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _unavailable(self):
+        self.server.requests.append(self.command)
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_GET = do_POST = _unavailable
+
+
+def test_connections_are_reused():
+    """Many calls over one session open a single keep-alive connection"""
+    server = FakeComfyUIServer().start()
+    accepted = []
+    process_request = server._httpd.process_request
+
+    def counting_process_request(request, address):
+        accepted.append(address)
+        process_request(request, address)
+
+    server._httpd.process_request = counting_process_request
+    session = create_session()
+    try:
+        for _ in range(10):
+            response = session.get(f"{server.url}/system_stats", timeout=DEFAULT_TIMEOUT)
+            assert response.status_code == 200
+        assert len(accepted) == 1, accepted
+        print("✅ 10 requests shared one connection")
+    finally:
+        session.close()
+        server.stop()
+
+
+def test_only_idempotent_requests_retry():
+    """GETs are retried on 503, POSTs are sent exactly once"""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), UnavailableHandler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    session = create_session(retries=2, backoff=0)
+    try:
+        assert session.get(f"{url}/queue", timeout=DEFAULT_TIMEOUT).status_code == 503
+        assert httpd.requests == ['GET'] * 3, httpd.requests
+
+        httpd.requests.clear()
+        assert session.post(f"{url}/prompt", json={}, timeout=DEFAULT_TIMEOUT).status_code == 503
+        assert httpd.requests == ['POST'], httpd.requests
+        print("✅ GET was retried twice, POST was sent once")
+    finally:
+        session.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_only_idempotent_requests_retry()
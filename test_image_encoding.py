@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test comic page encoding options
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from utils.image_encoding import OutputFormat, save_page
+
+
+def test_formats():
+    """Each format is written with its extension, and nothing else is written"""
+    page = Image.new('RGB', (2480, 3508), '#ffffff')
+    directory = tempfile.mkdtemp()
+
+    for options, image_format in (({'format': 'png'}, 'PNG'),
+                                  ({'format': 'webp', 'quality': 80}, 'WEBP'),
+                                  ({'format': 'webp', 'lossless': True}, 'WEBP'),
+                                  ({'format': 'jpg', 'quality': 85}, 'JPEG')):
+        output_format = OutputFormat.from_dict(options)
+        path = save_page(page, os.path.join(directory, f"page_{len(os.listdir(directory))}"), output_format)
+
+        assert path.endswith(output_format.extension), path
+        assert Image.open(path).format == image_format
+        assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+        os.remove(path)
+        print(f"✅ {options} -> {os.path.basename(path)}")
+
+
+def test_defaults_and_validation():
+    """Request options override defaults; bad options are rejected"""
+    output_format = OutputFormat.from_dict({'quality': 70, 'lossless': None}, format='webp', lossless=True)
+    assert (output_format.format, output_format.quality, output_format.lossless) == ('webp', 70, True)
+
+    for options in ({'format': 'gif'}, {'quality': 0}, {'compress_level': 10}, 'webp', ['png']):
+        try:
+            OutputFormat.from_dict(options)
+        except ValueError:
+            continue
+        raise AssertionError(f"{options} was accepted")
+    print("✅ Output options validated")
+
+
+def test_endpoints_reject_bad_output_options():
+    """Output options that aren't an object are a 400 from both comic endpoints"""
+    from app import app
+    client = app.test_client()
+    for url in ('/api/generate_comic', '/api/jobs'):
+        for output in ('webp', ['png'], 5):
+            response = client.post(url, json={'prompt': "a cat's day", 'output': output})
+            assert response.status_code == 400, (url, output, response.get_json())
+            assert 'Invalid output options' in response.get_json()['error']
+    print("✅ Non-object output options were rejected with 400")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing page encoding...")
+    print("=" * 50)
+    test_formats()
+    test_defaults_and_validation()
+    test_endpoints_reject_bad_output_options()
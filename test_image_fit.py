@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test fitting panel images into layout cells
+"""
+
+import sys
+import os
+import io
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image, ImageDraw
+from utils.image_fit import fit_image, open_for_size
+
+
+def _panel():
+    """A 768x1152 panel: red border column on the left, blue elsewhere"""
+    image = Image.new('RGB', (768, 1152), '#0000ff')
+    ImageDraw.Draw(image).rectangle([0, 0, 99, 1151], fill='#ff0000')
+    return image
+
+
+def test_fit_modes_keep_aspect():
+    """cover crops, contain pads, stretch distorts; all hit the exact cell size"""
+    panel = _panel()
+    cell = (1000, 500)  # Much wider than the panel
+
+    cover = fit_image(panel, cell, 'cover')
+    assert cover.size == cell
+    assert cover.getpixel((50, 250)) == (255, 0, 0)  # Scaled 1000/768: border ~130px wide
+    assert cover.getpixel((200, 250)) == (0, 0, 255)
+
+    contain = fit_image(panel, cell, 'contain', background='#ffffff')
+    assert contain.size == cell
+    assert contain.getpixel((10, 250)) == (255, 255, 255)  # Padding either side
+    assert contain.getpixel((500, 250)) == (0, 0, 255)
+
+    crop = fit_image(panel, (300, 300), 'crop')
+    assert crop.size == (300, 300) and crop.getpixel((150, 150)) == (0, 0, 255)
+
+    assert fit_image(panel, cell, 'stretch').size == cell
+    print("✅ cover, contain, crop and stretch fits")
+
+
+def test_jpeg_draft_decoding():
+    """JPEG panels decode at a reduced scale when the cell is much smaller"""
+    buffer = io.BytesIO()
+    _panel().save(buffer, format='JPEG', quality=90)
+
+    image = open_for_size(io.BytesIO(buffer.getvalue()), (150, 200))
+    assert image.size == (192, 288), image.size  # 1/4 scale straight from the decoder
+    assert fit_image(image, (150, 200), 'cover').size == (150, 200)
+    print(f"✅ JPEG drafted to {image.size}")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing panel fitting...")
+    print("=" * 50)
+    test_fit_modes_keep_aspect()
+    test_jpeg_draft_decoding()
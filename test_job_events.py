@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test the job progress event stream: live server-sent events and replay from
+Last-Event-ID, against a local fake ComfyUI server
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator
+from services.job_queue import JobQueue
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def get_story(self, story_id):
+        return None
+
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+def parse_events(body):
+    """(id, event, data) for each message in a text/event-stream body, skipping keep-alives"""
+    events = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_events_stream_and_replay():
+    """Subscribers get every event live, and a reconnect resumes after Last-Event-ID"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    comfyui = ComfyUIService(server.url, image_cache=False)
+    real_queue = app_module.job_queue
+    app_module.job_queue = JobQueue(ComicGenerator(StoryStub(), comfyui, stream_story=False),
+                                    os.path.join(tempfile.mkdtemp(), 'jobs.db'))
+    try:
+        client = app_module.app.test_client()
+        app_module.job_queue.start()
+        job_id = app_module.job_queue.submit({'prompt': "a cat's day", 'style': 'comic', 'num_panels': 3})
+
+        response = client.get(f'/api/jobs/{job_id}/events')
+        assert response.mimetype == 'text/event-stream'
+        events = parse_events(response.get_data(as_text=True))
+        assert [event_id for event_id, _, _ in events] == list(range(1, len(events) + 1))
+        names = [event for _, event, _ in events]
+        assert names[0] == 'running' and names[-1] == 'completed', names
+        done = [data for _, event, data in events if event == 'panel_done']
+        assert sorted(data['index'] for data in done) == [0, 1, 2]
+        assert all(data['image_url'] for data in done)
+        assert events[-1][2]['comic_url'].startswith('/comics/')
+
+        replay = parse_events(client.get(f'/api/jobs/{job_id}/events',
+                                         headers={'Last-Event-ID': '3'}).get_data(as_text=True))
+        assert replay == events[3:]
+        assert parse_events(client.get(f'/api/jobs/{job_id}/events?after=3').get_data(as_text=True)) == replay
+        assert client.get('/api/jobs/missing/events').status_code == 404
+        print(f"✅ Streamed {len(events)} events and replayed {len(replay)} after Last-Event-ID 3")
+    finally:
+        app_module.job_queue = real_queue
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_events_stream_and_replay()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test the background job queue: SQLite persistence, requeueing after a
+restart, cancellation and progress events, against a local fake ComfyUI server
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator, GenerationCancelled
+from services.job_queue import JobQueue, QUEUED, RUNNING, COMPLETED, CANCELLED
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def get_story(self, story_id):
+        return None
+
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+class GeneratorStub:
+    """Stands in for ComicGenerator; blocks until cancelled when block is set"""
+    def __init__(self, block=False):
+        self.block = block
+        self.started = threading.Event()
+        self.prompts = []
+
+    def create_comic(self, prompt, cancel_event=None, **kwargs):
+        self.prompts.append(prompt)
+        self.started.set()
+        if self.block:
+            cancel_event.wait(10)
+            raise GenerationCancelled("Comic generation cancelled")
+        return f"{prompt}.png"
+
+
+def follow(jobs, job_id):
+    """Every event of a job until it finishes"""
+    return [(event, data) for _, event, data in filter(None, jobs.events(job_id, timeout=10))]
+
+
+def test_job_progress_events():
+    """A job reports story, panel and assembly progress live and in the database"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    comfyui = ComfyUIService(server.url, image_cache=False)
+    try:
+        generator = ComicGenerator(StoryStub(), comfyui, stream_story=False)
+        jobs = JobQueue(generator, os.path.join(tempfile.mkdtemp(), 'jobs.db'))
+        jobs.start()
+
+        job_id = jobs.submit({'prompt': "a cat's day", 'style': 'comic', 'num_panels': 3})
+        names = [event for event, _ in follow(jobs, job_id)]
+
+        assert names[0] == RUNNING and names[-1] == COMPLETED, names
+        assert names.count('panel_done') == 3 and 'story_ready' in names and 'comic_assembled' in names
+        job = jobs.get(job_id)
+        assert job['status'] == COMPLETED and os.path.exists(job['result'])
+        assert job['progress']['panels_total'] == 3 and job['progress']['panels_done'] == 3
+        assert [panel['status'] for panel in job['progress']['panels']] == ['done'] * 3
+        print(f"✅ Job reported {len(names)} progress events and completed")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_requeue_after_restart():
+    """Jobs left queued or running by a stopped process run when the next one starts"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'jobs.db')
+    before_restart = JobQueue(GeneratorStub(), db_path)
+    queued = before_restart.submit({'prompt': 'queued'})
+    interrupted = before_restart.submit({'prompt': 'interrupted'})
+    with sqlite3.connect(db_path) as db:
+        db.execute("UPDATE jobs SET status = ? WHERE id = ?", (RUNNING, interrupted))
+    assert before_restart.get(queued)['params'] == {'prompt': 'queued'}
+
+    generator = GeneratorStub()
+    jobs = JobQueue(generator, db_path)
+    jobs.start()
+    for job_id in (queued, interrupted):
+        assert follow(jobs, job_id)[-1][0] == COMPLETED
+    assert sorted(generator.prompts) == ['interrupted', 'queued']
+    assert jobs.get(interrupted)['result'] == 'interrupted.png'
+    print("✅ Unfinished jobs were requeued and completed after a restart")
+
+
+def test_cancel_jobs():
+    """Cancelling a queued job drops it; cancelling a running one stops its generation"""
+    generator = GeneratorStub(block=True)
+    jobs = JobQueue(generator, os.path.join(tempfile.mkdtemp(), 'jobs.db'), workers=1)
+    jobs.start()
+
+    running = jobs.submit({'prompt': 'running'})
+    assert generator.started.wait(10)
+    waiting = jobs.submit({'prompt': 'waiting'})
+    assert jobs.get(waiting)['status'] == QUEUED
+
+    assert jobs.cancel(waiting)
+    assert jobs.get(waiting)['status'] == CANCELLED
+    assert jobs.cancel(running)
+    assert follow(jobs, running)[-1][0] == CANCELLED
+    assert jobs.get(running)['status'] == CANCELLED
+    assert not jobs.cancel(running)
+    assert generator.prompts == ['running']
+    print("✅ Queued and running jobs were cancelled")
+
+
+if __name__ == "__main__":
+    test_job_progress_events()
+    test_requeue_after_restart()
+    test_cancel_jobs()
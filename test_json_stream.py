@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test pulling panels out of a streamed JSON story as each one completes,
+directly and through OllamaService against a local fake Ollama server
+"""
+
+import sys
+import os
+import json
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.ollama_server import FakeOllamaServer
+from services.ollama_service import OllamaService
+from utils.json_stream import PanelStreamParser
+
+STORY = {
+    "title": "A {tricky} \"story\"",
+    "meta": {"panels": [{"index": 99, "description": "not a top-level panel"}]},
+    "panels": [
+        {"index": 0, "description": "a cat says \"hi\" }", "characters": "a cat"},
+        {"index": 1, "description": "braces [ { in text", "extra": {"mood": "calm", "tags": ["a", "b"]}},
+        {"index": 2, "description": "back\\slash", "characters": "a cat"},
+    ],
+    "after": [{"index": 3}],
+}
+
+
+def test_panels_from_any_chunking():
+    """The same panels come out whether the JSON arrives whole or one character at a time"""
+    text = json.dumps(STORY, indent=2)
+    expected = STORY["panels"]
+    for chunk_size in (1, 2, 7, len(text)):
+        parser = PanelStreamParser()
+        panels = []
+        for start in range(0, len(text), chunk_size):
+            panels += parser.feed(text[start:start + chunk_size])
+        assert panels == expected, (chunk_size, panels)
+    print(f"✅ {len(expected)} panels parsed at every chunk size")
+
+
+def test_panel_emitted_as_soon_as_it_closes():
+    """A panel is returned by the feed that closes it, before the rest of the array arrives"""
+    parser = PanelStreamParser()
+    assert parser.feed('{"panels": [{"index": 0, "description": "one"') == []
+    assert parser.feed('}, {"index": 1,') == [{"index": 0, "description": "one"}]
+    assert parser.feed(' "description": "two"}') == [{"index": 1, "description": "two"}]
+    assert parser.feed(']}') == []
+    print("✅ Each panel was emitted as soon as it closed")
+
+
+def test_malformed_panel_skipped():
+    """A panel that isn't valid JSON is dropped without losing the ones after it"""
+    parser = PanelStreamParser()
+    panels = parser.feed('{"panels": [{"index": 0, "description": oops}, {"index": 1}]}')
+    assert panels == [{"index": 1}], panels
+    print("✅ Malformed panel skipped")
+
+
+def test_stream_yields_panels_before_story_ends():
+    """OllamaService hands out the first panel long before the LLM finishes the story"""
+    server = FakeOllamaServer(generation_time=1.0, chunk_size=20).start()
+    try:
+        ollama = OllamaService(server.url, 'fake-llm')
+        started = time.perf_counter()
+        arrivals = [time.perf_counter() - started
+                    for _ in ollama.stream_comic_panels("a courier's long night", 4, 'comic')]
+        assert len(arrivals) == 4
+        assert arrivals[0] < 0.6 * arrivals[-1], arrivals
+        print(f"✅ First panel after {arrivals[0]:.2f}s, last after {arrivals[-1]:.2f}s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_panels_from_any_chunking()
+    test_panel_emitted_as_soon_as_it_closes()
+    test_malformed_panel_skipped()
+    test_stream_yields_panels_before_story_ends()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test the server-side layout engine
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.layout_engine import get_layout, layout_from_geometry, normalize_page, PAGE_SIZES
+from utils.layout_presets import LAYOUT_PRESETS
+
+
+def test_page_formats():
+    """Short page names from older clients map onto the canonical ones"""
+    assert normalize_page('a4p') == 'A4-P'
+    assert normalize_page('a4l') == 'A4-L'
+    assert normalize_page('letter-l') == 'Letter-L'
+    assert normalize_page(None) == 'A4-P'
+    try:
+        normalize_page('b5')
+        assert False, "Unknown page format accepted"
+    except ValueError:
+        pass
+    assert get_layout('Layout0', 'a4l').page_size == (3508, 2480)
+    print("✅ Page formats normalized")
+
+
+def test_preset_rects_tile_exactly():
+    """Cells fill the content box exactly, with equal gutters and no rounding gaps"""
+    for page in PAGE_SIZES:
+        for layout_id, preset in LAYOUT_PRESETS.items():
+            layout = get_layout(layout_id, page, margin=24, gutter=8)
+            width, height = layout.page_size
+            assert len(layout) == len(preset['panels'])
+            # The union of the cells' extents is the content box
+            assert min(x for x, _, _, _ in layout.rects) == 24
+            assert min(y for _, y, _, _ in layout.rects) == 24
+            assert max(x + w for x, _, w, _ in layout.rects) == width - 24
+            assert max(y + h for _, y, _, h in layout.rects) == height - 24
+
+    # Layout0: the four cells of a 2x2 grid have the same gutter on both sides
+    (x0, y0, w0, h0), (x1, _, w1, _), (_, y2, _, h2), _ = get_layout('Layout0', 'A4-P').rects
+    gap = round((2480 - 48) * 8 / 1000)
+    assert x1 - (x0 + w0) == gap and abs(w0 - w1) <= 1
+    assert y2 - (y0 + h0) == round((3508 - 48) * 8 / 1000) and abs(h0 - h2) <= 1
+    print("✅ Preset cells tile the page exactly")
+
+
+def test_layouts_are_memoized():
+    """The same preset, page, margin and gutter resolve to one shared layout"""
+    assert get_layout('Layout5', 'A4-P', 24, 8) is get_layout('Layout5', 'a4p', 24, 8)
+    assert get_layout('Layout5', 'A4-P', 24, 8) is not get_layout('Layout5', 'A4-P', 24, 12)
+    assert len(get_layout('Layout5', 'A4-P', 24, 8, num_cells=2)) == 2
+    try:
+        get_layout('Layout9')
+        assert False, "Unknown preset accepted"
+    except ValueError:
+        pass
+    print("✅ Layouts memoized")
+
+
+def test_borders_and_custom_geometry():
+    """Borders are drawn inside the cells; custom geometry keeps its own styling"""
+    geometry = {
+        'outerMarginPx': 100,
+        'page': {'bg': '#ff0000'},
+        'panel': {'borderPx': 3, 'borderColor': '#0000ff', 'fit': 'contain'},
+        'cells': [{'index': 0, 'x': 0.0, 'y': 0.0, 'w': 0.5, 'h': 1.0}]
+    }
+    layout = layout_from_geometry('A5-P', geometry)
+    assert layout.rects == ((100, 100, 774, 2280),)
+    assert layout.fit_mode(0) == 'contain'
+
+    canvas = layout.new_canvas()
+    layout.draw_borders(canvas)
+    assert canvas.getpixel((50, 50)) == (255, 0, 0)  # Margin shows the page background
+    assert canvas.getpixel((101, 500)) == (0, 0, 255)  # Border inside the cell
+    assert canvas.getpixel((103, 500)) == (255, 0, 0)  # Interior untouched
+    print("✅ Borders drawn")
+
+
+def test_malformed_geometry_cells():
+    """A cell missing its position or size is a ValueError naming the cell, and a 400 from the API"""
+    good = {'x': 0.0, 'y': 0.0, 'w': 0.5, 'h': 1.0}
+    for bad in ({'x': 0.5, 'y': 0.0, 'w': 0.5}, {**good, 'w': '0.5'}, [0.5, 0, 0.5, 1]):
+        try:
+            layout_from_geometry('A4-P', {'cells': [good, bad]})
+            assert False, f"{bad} accepted"
+        except ValueError as e:
+            assert 'cell 1' in str(e), e
+
+    from app import app
+    response = app.test_client().post('/api/generate_comic', json={
+        'prompt': "a cat's day", 'geometry': {'cells': [{'x': 0, 'y': 0}]}
+    })
+    assert response.status_code == 400, response.get_json()
+    print("✅ Malformed geometry cells rejected")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing layout engine...")
+    print("=" * 50)
+    test_page_formats()
+    test_preset_rects_tile_exactly()
+    test_layouts_are_memoized()
+    test_borders_and_custom_geometry()
+    test_malformed_geometry_cells()
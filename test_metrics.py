@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test the Prometheus metrics: the text format, and the stage timings and
+counters a comic records, against local fake Ollama and ComfyUI servers
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from fakes.ollama_server import FakeOllamaServer
+from services import metrics
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator
+from services.ollama_service import OllamaService
+
+
+def test_exposition_format():
+    """Histograms render cumulative buckets, sum and count; label values are escaped"""
+    registry = metrics.Registry()
+    latency = metrics.Histogram('test_seconds', "Test latency", ('stage',), buckets=(0.1, 1), registry=registry)
+    errors = metrics.Counter('test_errors_total', "Test errors", ('type',), registry=registry)
+    latency.observe(0.05, stage='render')
+    latency.observe(0.5, stage='render')
+    latency.observe(5, stage='render')
+    errors.inc(type='say "hi"\n')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE test_seconds histogram' in lines
+    assert 'test_seconds_bucket{stage="render",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="render",le="1"} 2' in lines
+    assert 'test_seconds_bucket{stage="render",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{stage="render"} 5.55' in lines
+    assert 'test_seconds_count{stage="render"} 3' in lines
+    assert 'test_errors_total{type="say \\"hi\\"\\n"} 1' in lines, lines
+
+    try:
+        errors.inc(kind='oops')
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Metrics render in the Prometheus text format")
+
+
+def test_comic_records_stage_metrics():
+    """A comic observes every stage it goes through and leaves nothing in flight"""
+    ollama_server = FakeOllamaServer(generation_time=0.05).start()
+    comfyui_server = FakeComfyUIServer(render_time=0.05).start()
+    try:
+        comfyui = ComfyUIService(comfyui_server.url, image_cache=False)
+        generator = ComicGenerator(OllamaService(ollama_server.url, 'fake-llm'), comfyui)
+        histograms = [metrics.COMFYUI_QUEUE_WAIT_SECONDS, metrics.COMFYUI_EXECUTION_SECONDS,
+                      metrics.COMFYUI_RENDER_SECONDS, metrics.COMFYUI_DOWNLOAD_SECONDS,
+                      metrics.COMIC_ASSEMBLY_SECONDS]
+        before = [histogram.count() for histogram in histograms]
+        stories = metrics.OLLAMA_SECONDS.count(mode='stream')
+        encodes = metrics.PAGE_ENCODE_SECONDS.count(format='png')
+        renders = metrics.PIPELINE_STAGE_SECONDS.count(stage='render')
+
+        generator.create_comic("a courier's long night", 'comic', 3, output_format={'format': 'png'})
+
+        after = [histogram.count() for histogram in histograms]
+        assert [a - b for a, b in zip(after, before)] == [3, 3, 3, 3, 1], (before, after)
+        assert metrics.OLLAMA_SECONDS.count(mode='stream') == stories + 1
+        assert metrics.PAGE_ENCODE_SECONDS.count(format='png') == encodes + 1
+        assert metrics.PIPELINE_STAGE_SECONDS.count(stage='render') == renders + 3
+        assert metrics.OLLAMA_IN_FLIGHT.value() == 0
+        assert metrics.COMFYUI_IN_FLIGHT.value(backend=comfyui_server.url) == 0
+        print("✅ Comic recorded story, queue, execution, download, assembly and encode timings")
+    finally:
+        comfyui.tracker.stop()
+        ollama_server.stop()
+        comfyui_server.stop()
+
+
+def test_failures_are_counted():
+    """Story fallbacks, panel placeholders and errors each bump their counter"""
+    ollama_server = FakeOllamaServer(generation_time=0.01, fail_rate=1.0).start()
+    comfyui_server = FakeComfyUIServer(render_time=0.05, fail_with='error').start()
+    try:
+        comfyui = ComfyUIService(comfyui_server.url, image_cache=False)
+        generator = ComicGenerator(OllamaService(ollama_server.url, 'fake-llm'), comfyui, stream_story=False)
+        fallbacks = metrics.STORY_FALLBACKS.value()
+        placeholders = metrics.PANEL_PLACEHOLDERS.value()
+        story_errors = metrics.ERRORS.value(stage='story', type='Exception')
+        render_errors = metrics.ERRORS.value(stage='render', type='ExecutionError')
+
+        generator.create_comic("a courier's long night", 'comic', 2)
+
+        assert metrics.STORY_FALLBACKS.value() == fallbacks + 1
+        assert metrics.PANEL_PLACEHOLDERS.value() == placeholders + 2
+        assert metrics.ERRORS.value(stage='story', type='Exception') == story_errors + 1
+        assert metrics.ERRORS.value(stage='render', type='ExecutionError') == render_errors + 2
+        print("✅ Fallbacks, placeholders and errors were counted")
+    finally:
+        comfyui.tracker.stop()
+        ollama_server.stop()
+        comfyui_server.stop()
+
+
+def test_metrics_endpoint():
+    """/metrics serves request timings by route and the cache counters"""
+    from app import app
+    client = app.test_client()
+    assert client.get('/api/layouts').status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'http_request_seconds_count{endpoint="/api/layouts",method="GET",status="200"}' in text
+    assert 'cache_hit_ratio{cache="stories"}' in text
+    assert 'cache_misses_total{cache="workflows"}' in text
+    assert '# TYPE comfyui_queue_wait_seconds histogram' in text
+    print("✅ /metrics served request timings and cache counters")
+
+
+if __name__ == "__main__":
+    test_exposition_format()
+    test_comic_records_stage_metrics()
+    test_failures_are_counted()
+    test_metrics_endpoint()
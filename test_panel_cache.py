@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test that the panel image cache serves repeated comics and stays out of the
+way of random-seed renders, and that panels only get repeatable seeds when
+asked, against a local fake ComfyUI server
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService
+from services.comic_generator import ComicGenerator
+from services.image_cache import ImageCache
+
+
+class StoryStub:
+    """Stands in for OllamaService with a fixed story"""
+    def get_story(self, story_id):
+        return self.generate_comic_panels("", 3, "comic")
+
+    def generate_comic_panels(self, prompt, num_panels, style, deadline=None):
+        return [{'index': i, 'description': f"panel {i}", 'characters': 'a cat'} for i in range(num_panels)]
+
+
+def test_repeated_comic_served_from_cache():
+    """An explicit seed fixes the panel seeds, so the same comic again is all cache hits"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    try:
+        cache = ImageCache(tempfile.mkdtemp(), 10 * 1024 ** 2)
+        comfyui = ComfyUIService(server.url, image_cache=cache)
+        generator = ComicGenerator(StoryStub(), comfyui, stream_story=False)
+
+        generator.create_comic("a cat's day", "comic", 3, seed=7)
+        submitted = server.submitted
+        assert cache.stats()['entries'] == 3, cache.stats()
+
+        generator.create_comic("a cat's day", "comic", 3, seed=7)
+        assert server.submitted == submitted
+        assert cache.stats()['hits'] == 3, cache.stats()
+        print(f"✅ Repeated comic rendered nothing new ({cache.stats()['hits']} cache hits)")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def panel_seeds(server, since=0):
+    """The KSampler seed of each workflow the server got after the first since"""
+    return [workflow["31"]["inputs"]["seed"] for workflow in server.workflows[since:]]
+
+
+def test_default_seeds_are_random():
+    """Two default requests render different images; a reused story_id renders the same ones"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    try:
+        comfyui = ComfyUIService(server.url, image_cache=False)
+        generator = ComicGenerator(StoryStub(), comfyui, stream_story=False, batch_size=1)
+
+        generator.create_comic("a cat's day", "comic", 3)
+        first = panel_seeds(server)
+        generator.create_comic("a cat's day", "comic", 3)
+        second = panel_seeds(server, len(first))
+        assert len(first) == len(second) == 3
+        assert first != second, (first, second)
+
+        generator.create_comic("a cat's day", "comic", 3, story_id="story-1")
+        reused = panel_seeds(server, 6)
+        generator.create_comic("a cat's day", "comic", 3, story_id="story-1")
+        assert sorted(panel_seeds(server, 9)) == sorted(reused)
+        assert len(set(reused)) == 3
+        print("✅ Default requests got random seeds; a reused story got the same ones")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+def test_random_seed_skips_cache():
+    """A random-seed render can never be a hit, so it is neither looked up nor stored"""
+    server = FakeComfyUIServer(render_time=0.05).start()
+    try:
+        directory = tempfile.mkdtemp()
+        cache = ImageCache(directory, 10 * 1024 ** 2)
+        comfyui = ComfyUIService(server.url, image_cache=cache)
+
+        ticket = comfyui.submit_image("a cute cat superhero", "comic", -1)
+        assert ticket.cache_key is None
+        comfyui.collect_image(ticket, persist=False)
+        assert ticket.image_data.startswith(b"\x89PNG")
+        assert cache.stats()['misses'] == 0 and os.listdir(directory) == []
+        print("✅ Random-seed render skipped the panel cache")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_repeated_comic_served_from_cache()
+    test_default_seeds_are_random()
+    test_random_seed_skips_cache()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test rendering panels at their layout cell's shape and size
+"""
+
+import sys
+import os
+import io
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from fakes.comfyui_server import FakeComfyUIServer
+from services.comfyui_service import ComfyUIService, render_plan
+from services.workflow_cache import workflow_cache, batch_workflow
+from config import COMFYUI_WORKFLOW
+
+
+def test_render_plan():
+    """Latents follow the cell's aspect ratio; only big cells get the upscale pass"""
+    # A4 2x2 cell: portrait latent, upscaled to cover the cell
+    width, height, upscale_by = render_plan((1204, 1706))
+    assert (width % 64, height % 64) == (0, 0) and height > width
+    assert width * upscale_by >= 1204 and height * upscale_by >= 1706
+
+    # Full-width banner: landscape latent instead of a squashed portrait one
+    width, height, _ = render_plan((2432, 1120))
+    assert width > 2 * height - 128
+
+    # Small cell: rendered near its own size, no upscale
+    width, height, upscale_by = render_plan((500, 700))
+    assert upscale_by is None and (width, height) == (512, 704)
+    print("✅ Render plans follow the cell")
+
+
+def test_workflow_patched_per_size():
+    """Node 27 gets the planned size and the unused output branch is dropped"""
+    comfyui = ComfyUIService("http://127.0.0.1:1", image_cache=False)
+
+    large = comfyui._prepare_ticket("a cat", "comic", 1, size=(1204, 1706)).workflow
+    assert (large["27"]["inputs"]["width"], large["27"]["inputs"]["height"]) == (768, 1088)
+    assert large["42"]["inputs"]["upscale_by"] == 1.57
+    assert "43" not in large and "9" in large
+
+    small = comfyui._prepare_ticket("a cat", "comic", 1, size=(500, 700)).workflow
+    assert "42" not in small and "9" not in small and "43" in small
+
+    # The shared template is untouched
+    template = workflow_cache.get(COMFYUI_WORKFLOW)
+    assert template["27"]["inputs"]["width"] == 768 and "43" in template
+
+    # Panels of different sizes batch with their own latents
+    merged, outputs = batch_workflow([large, small])
+    assert merged["27"]["inputs"]["height"] == 1088 and merged["27_1"]["inputs"]["height"] == 704
+    assert merged["31_1"]["inputs"]["latent_image"] == ["27_1", 0]
+    assert outputs == [["9"], ["43_1"]], outputs
+    print("✅ Workflows patched per panel size")
+
+
+def test_panel_rendered_at_cell_size():
+    """The image collected for a panel covers its cell without further upscaling"""
+    server = FakeComfyUIServer(render_time=0.05, true_size=True).start()
+    comfyui = ComfyUIService(server.url, image_cache=False)
+    try:
+        ticket = comfyui.submit_image("a cat", "comic", seed=7, size=(2432, 1120))
+        comfyui.collect_image(ticket, persist=False)
+        image = Image.open(io.BytesIO(ticket.image_data))
+        assert image.width >= 2432 and image.height >= 1120, image.size
+        assert image.width > image.height
+        print(f"✅ Banner panel rendered at {image.size[0]}x{image.size[1]}")
+    finally:
+        comfyui.tracker.stop()
+        server.stop()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing panel render sizes...")
+    print("=" * 50)
+    test_render_plan()
+    test_workflow_patched_per_size()
+    test_panel_rendered_at_cell_size()
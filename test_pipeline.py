@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test the pipeline scheduler: results in source order, stages overlapping,
+and aborting on the first stage error
+"""
+
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.pipeline import Pipeline, Stage
+
+
+def test_results_keep_source_order():
+    """Items finishing out of order across workers still come back in source order"""
+    def slow_for_early_items(item):
+        time.sleep(0.01 * (16 - item))
+        return item * 10
+
+    pipeline = Pipeline([Stage('square', lambda item: item * item),
+                         Stage('scale', slow_for_early_items, workers=5)], queue_size=5)
+    assert pipeline.run(range(5)) == [0, 10, 40, 90, 160]
+    timings = pipeline.stage_timings()
+    assert timings['source']['items'] == 5 and timings['scale']['items'] == 5
+    print("✅ Results came back in source order")
+
+
+def test_stages_overlap():
+    """A later stage starts on the first item while the source is still producing"""
+    started = {}
+
+    def source():
+        for item in range(4):
+            time.sleep(0.05)
+            yield item
+
+    def record(item):
+        started.setdefault('second', time.time())
+        return item
+
+    pipeline = Pipeline([Stage('first', lambda item: item), Stage('second', record)])
+    pipeline.run(source())
+    assert started['second'] < pipeline.stats['source'].last_end
+    print("✅ Second stage started before the source finished")
+
+
+def test_abort_on_stage_error():
+    """The first stage error stops the feed, drops queued items and is raised from run()"""
+    processed = []
+    produced = []
+    lock = threading.Lock()
+
+    def source():
+        for item in range(1000):
+            produced.append(item)
+            yield item
+
+    def fail_on_three(item):
+        if item == 3:
+            raise ValueError("bad panel")
+        time.sleep(0.01)
+        return item
+
+    def collect(item):
+        with lock:
+            processed.append(item)
+        return item
+
+    pipeline = Pipeline([Stage('check', fail_on_three), Stage('collect', collect)], queue_size=2)
+    try:
+        pipeline.run(source())
+        assert False, "expected ValueError"
+    except ValueError as e:
+        assert str(e) == "bad panel"
+    assert pipeline.aborted.is_set()
+    assert 3 not in processed and len(produced) < 20, (processed, len(produced))
+    print(f"✅ Pipeline aborted after {len(produced)} of 1000 source items")
+
+
+if __name__ == "__main__":
+    test_results_keep_source_order()
+    test_stages_overlap()
+    test_abort_on_stage_error()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test comic page renditions and how they are served
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image
+from services.renditions import RenditionStore
+
+
+def test_lazy_and_eager_renditions():
+    """Renditions are built on first request, or in the background from the in-memory page"""
+    comics_dir = tempfile.mkdtemp()
+    store = RenditionStore(comics_dir, os.path.join(comics_dir, "renditions"), {'thumb': 320, 'screen': 1200})
+    page = Image.new('RGB', (2480, 3508), '#ffffff')
+    page.save(os.path.join(comics_dir, "comic_lazy.png"))
+
+    thumb = store.path_for("comic_lazy.png", "thumb")
+    assert Image.open(thumb).size == (320, round(3508 * 320 / 2480))
+    assert store.path_for("comic_lazy.png", "print") == os.path.join(comics_dir, "comic_lazy.png")
+    assert store.path_for("missing.png", "thumb") is None
+
+    store.create_all_async(page, os.path.join(comics_dir, "comic_eager.png")).result(timeout=30)
+    assert os.path.exists(os.path.join(comics_dir, "renditions", "comic_eager_screen.webp"))
+
+    try:
+        store.path_for("comic_lazy.png", "poster")
+    except ValueError:
+        print("✅ Renditions built lazily and eagerly")
+    else:
+        raise AssertionError("Unknown rendition was accepted")
+
+
+def test_serving_with_cache_headers():
+    """/comics serves renditions with long-lived caching and answers revalidation with 304"""
+    import config
+    from app import app
+
+    name = f"comic_test_{os.urandom(4).hex()}.png"
+    path = os.path.join(config.OUTPUT_DIR, name)
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    Image.new('RGB', (2480, 3508), '#ffffff').save(path)
+    try:
+        client = app.test_client()
+        response = client.get(f"/comics/{name}?rendition=screen")
+        assert response.status_code == 200
+        assert response.mimetype == 'image/webp'
+        assert 'immutable' in response.headers['Cache-Control']
+        etag = response.headers['ETag']
+
+        assert client.get(f"/comics/{name}?rendition=screen", headers={'If-None-Match': etag}).status_code == 304
+        assert client.get(f"/comics/{name}?rendition=poster").status_code == 400
+        assert client.get(f"/comics/{name}").mimetype == 'image/png'
+        print("✅ Renditions served with ETag and Cache-Control")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing comic renditions...")
+    print("=" * 50)
+    test_lazy_and_eager_renditions()
+    test_serving_with_cache_headers()
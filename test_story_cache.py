@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test the story cache: reuse through OllamaService, regenerating on request,
+expiry after the TTL and eviction of the oldest stories, against a local
+fake Ollama server
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import app as app_module
+from fakes.ollama_server import FakeOllamaServer
+from services.ollama_service import OllamaService
+from services.story_cache import StoryCache
+
+PANELS = [{'index': 0, 'description': "a cat wakes up"}, {'index': 1, 'description': "a cat eats"}]
+
+
+def test_story_reused_without_llm():
+    """The same request again, or the story's ID, is answered without calling Ollama"""
+    server = FakeOllamaServer(generation_time=0.01).start()
+    try:
+        ollama = OllamaService(server.url, 'fake-llm', story_cache=StoryCache(ttl=60, max_entries=10))
+        story_id, panels = ollama.generate_story("a cat's day", 3, 'comic')
+        assert story_id and server.requests == 1
+
+        assert ollama.generate_story("a cat's day", 3, 'comic') == (story_id, panels)
+        assert ollama.get_story(story_id) == panels
+        assert server.requests == 1
+        assert ollama.story_cache.stats()['hits'] == 2
+        print(f"✅ Story {story_id} reused without asking the LLM again")
+    finally:
+        server.stop()
+
+
+def test_regenerate_skips_cached_story():
+    """regenerate asks the LLM for a new story, which then replaces the cached one"""
+    server = FakeOllamaServer(generation_time=0.01).start()
+    real_ollama = app_module.ollama
+    try:
+        ollama = OllamaService(server.url, 'fake-llm', story_cache=StoryCache(ttl=60, max_entries=10))
+        story_id, _ = ollama.generate_story("a cat's day", 3, 'comic')
+        new_id, _ = ollama.generate_story("a cat's day", 3, 'comic', regenerate=True)
+        assert new_id != story_id and server.requests == 2
+
+        list(ollama.stream_comic_panels("a cat's day", 3, 'comic', regenerate=True))
+        assert server.requests == 3
+
+        app_module.ollama = ollama
+        client = app_module.app.test_client()
+        body = {'prompt': "a cat's day", 'style': 'comic', 'num_panels': 3}
+        reused = client.post('/api/generate_story', json=body).get_json()['story_id']
+        assert server.requests == 3
+        fresh = client.post('/api/generate_story', json={**body, 'regenerate': True}).get_json()['story_id']
+        assert fresh != reused and server.requests == 4
+        assert client.post('/api/generate_story', json=body).get_json()['story_id'] == fresh
+        print(f"✅ Regenerated the story {server.requests - 1} times on request")
+    finally:
+        app_module.ollama = real_ollama
+        server.stop()
+
+
+def test_story_expires_after_ttl():
+    """A story past its TTL is gone by ID and by lookup"""
+    cache = StoryCache(ttl=0.05, max_entries=10)
+    story_id = cache.store("a cat's day", 2, 'comic', 'fake-llm', PANELS)
+    assert cache.get(story_id) == PANELS
+
+    time.sleep(0.1)
+    assert cache.get(story_id) is None
+    assert cache.lookup("a cat's day", 2, 'comic', 'fake-llm') is None
+    assert cache.stats()['entries'] == 0
+    print("✅ Story expired after its TTL")
+
+
+def test_oldest_story_evicted():
+    """Past max_entries the oldest story is dropped; returned panels are copies"""
+    cache = StoryCache(ttl=60, max_entries=2)
+    first = cache.store("first", 2, 'comic', 'fake-llm', PANELS)
+    second = cache.store("second", 2, 'comic', 'fake-llm', PANELS)
+    third = cache.store("third", 2, 'comic', 'fake-llm', PANELS)
+
+    assert cache.get(first) is None and cache.lookup("first", 2, 'comic', 'fake-llm') is None
+    assert cache.get(second) == PANELS and cache.get(third) == PANELS
+    assert cache.stats()['entries'] == 2
+
+    cache.get(second)[0]['description'] = "changed"
+    assert cache.get(second) == PANELS
+    print("✅ Oldest story evicted at max_entries")
+
+
+if __name__ == "__main__":
+    test_story_reused_without_llm()
+    test_regenerate_skips_cached_story()
+    test_story_expires_after_ttl()
+    test_oldest_story_evicted()
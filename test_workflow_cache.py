@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test the workflow template cache: reloading when the file changes, and
+copy-on-write checkouts that never touch the shared template
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.workflow_cache import WorkflowCache
+
+
+def write_workflow(path, text, mtime_ns=None):
+    workflow = {
+        "6": {"class_type": "CLIPTextEncode", "inputs": {"text": text, "clip": ["30", 0]}},
+        "30": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}},
+        "31": {"class_type": "KSampler", "inputs": {"seed": 0, "positive": ["6", 0]}},
+    }
+    with open(path, 'w') as f:
+        json.dump(workflow, f)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reloads_when_file_changes():
+    """A template is parsed once, and again only after the file's mtime changes"""
+    path = os.path.join(tempfile.mkdtemp(), 'workflow.json')
+    write_workflow(path, "first", mtime_ns=1_000_000_000_000_000_000)
+    cache = WorkflowCache()
+
+    template = cache.get(path)
+    assert cache.get(path) is template and cache.loads == 1
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'entries': 1}
+
+    write_workflow(path, "second", mtime_ns=1_000_000_001_000_000_000)
+    assert cache.get(path)["6"]["inputs"]["text"] == "second"
+    assert cache.loads == 2
+
+    cache.invalidate(path)
+    cache.get(path)
+    assert cache.loads == 3
+    print("✅ Template reloaded after the file changed and after invalidation")
+
+
+def test_checkout_is_copy_on_write():
+    """Patched nodes are private to a checkout; every other node is shared with the template"""
+    path = os.path.join(tempfile.mkdtemp(), 'workflow.json')
+    write_workflow(path, "template")
+    cache = WorkflowCache()
+    template = cache.get(path)
+
+    first = cache.checkout(path)
+    second = cache.checkout(path)
+    first["6"]["inputs"]["text"] = "panel 1"
+    first["31"]["inputs"]["seed"] = 42
+    first["9"] = {"class_type": "SaveImage", "inputs": {}}
+
+    assert template["6"]["inputs"]["text"] == "template" and template["31"]["inputs"]["seed"] == 0
+    assert "9" not in template
+    assert second["6"]["inputs"]["text"] == "template"
+    assert first["30"] is template["30"] and second["30"] is template["30"]
+    assert cache.loads == 1
+    print("✅ Checkouts changed their own nodes and shared the rest")
+
+
+if __name__ == "__main__":
+    test_reloads_when_file_changes()
+    test_checkout_is_copy_on_write()
@@ -0,0 +1,69 @@
+"""
+Page encoding: output format and quality settings for finished comics.
+Smaller derivatives are renditions (services/renditions.py), not written here.
+"""
+
+import os
+from typing import Dict, Optional
+
+from PIL import Image
+
+# Supported output formats and their file extensions
+EXTENSIONS = {'png': '.png', 'webp': '.webp', 'jpeg': '.jpg'}
+
+
+class OutputFormat:
+    """How a finished page is encoded"""
+
+    def __init__(self, format: str = 'png', quality: int = 90, compress_level: int = 3,
+                 lossless: bool = False):
+        format = (format or 'png').lower()
+        if format == 'jpg':
+            format = 'jpeg'
+        if format not in EXTENSIONS:
+            raise ValueError(f"Unsupported output format: {format}")
+        if not 1 <= int(quality) <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if not 0 <= int(compress_level) <= 9:
+            raise ValueError("compress_level must be between 0 and 9")
+
+        self.format = format
+        self.quality = int(quality)
+        self.compress_level = int(compress_level)
+        self.lossless = bool(lossless)
+
+    @classmethod
+    def from_dict(cls, options: Optional[Dict], **defaults) -> 'OutputFormat':
+        """Build from request options, falling back to defaults for missing keys"""
+        if options is not None and not isinstance(options, dict):
+            raise ValueError("output options must be an object")
+        settings = dict(defaults)
+        settings.update({key: value for key, value in (options or {}).items() if value is not None})
+        known = ('format', 'quality', 'compress_level', 'lossless')
+        return cls(**{key: settings[key] for key in known if key in settings})
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS[self.format]
+
+    def save_options(self) -> Dict:
+        """Keyword arguments for Image.save"""
+        if self.format == 'png':
+            # Level 9 is several times slower than 1-3 for a few percent smaller files
+            return {'format': 'PNG', 'compress_level': self.compress_level}
+        if self.format == 'webp':
+            if self.lossless:
+                # For lossless WebP "quality" is compression effort; mid effort keeps encoding fast
+                return {'format': 'WEBP', 'lossless': True, 'quality': 50, 'method': 3}
+            return {'format': 'WEBP', 'quality': self.quality, 'method': 4}
+        return {'format': 'JPEG', 'quality': self.quality, 'progressive': True}
+
+
+def save_page(image: Image.Image, path_stem: str, output_format: OutputFormat) -> str:
+    """Encode a page to path_stem plus the format's extension"""
+    path = f"{path_stem}{output_format.extension}"
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if output_format.format == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.save(path, **output_format.save_options())
+    return path
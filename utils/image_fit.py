@@ -0,0 +1,80 @@
+"""
+Panel fitting: scale an image into a layout cell without distorting it, using
+the cheapest resampling path that keeps quality
+"""
+
+from typing import Optional, Tuple
+
+from PIL import Image
+
+# cover: fill the cell, cropping the overflow (default)
+# contain: fit inside the cell, padding the rest with the background
+# crop: keep native scale, centre-cropped (or padded) to the cell
+# stretch: scale to the cell ignoring aspect ratio
+FIT_MODES = ('cover', 'contain', 'crop', 'stretch')
+
+# Shrinking by at least this factor pre-shrinks with a box reduce first
+REDUCING_GAP = 2.0
+
+
+def open_for_size(source, size: Tuple[int, int]) -> Image.Image:
+    """
+    Open an image file or file-like object and decode it, letting JPEG
+    decoding scale down towards size in the DCT domain
+    """
+    image = Image.open(source)
+    if image.format == 'JPEG':
+        # draft() keeps both dimensions >= size, so cover and contain stay sharp
+        image.draft('RGB', size)
+    image.load()
+    return image
+
+
+def resample(image: Image.Image, size: Tuple[int, int], box: Optional[Tuple[float, float, float, float]] = None) -> Image.Image:
+    """Resize image (or the box region of it) to size, picking the filter by scale factor"""
+    if box is None:
+        box = (0, 0, image.width, image.height)
+    source_width, source_height = box[2] - box[0], box[3] - box[1]
+    if (round(source_width), round(source_height)) == tuple(size):
+        return image.crop(tuple(int(round(v)) for v in box))
+
+    scale = min(source_width / size[0], source_height / size[1])
+    if scale >= REDUCING_GAP:
+        # Large shrink: integer box reduce does most of the work, Lanczos finishes it
+        return image.resize(size, Image.LANCZOS, box=box, reducing_gap=REDUCING_GAP)
+    if scale > 1:
+        return image.resize(size, Image.LANCZOS, box=box)
+    # Enlarging gains nothing visible from Lanczos over bicubic
+    return image.resize(size, Image.BICUBIC, box=box)
+
+
+def fit_image(image: Image.Image, size: Tuple[int, int], mode: str = 'cover',
+              background='#ffffff', centering: Tuple[float, float] = (0.5, 0.5)) -> Image.Image:
+    """Return image fitted to exactly size according to mode"""
+    if mode not in FIT_MODES:
+        raise ValueError(f"Unknown fit mode: {mode}")
+    width, height = max(1, size[0]), max(1, size[1])
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGB')
+
+    if mode == 'stretch':
+        return resample(image, (width, height))
+
+    if mode == 'cover':
+        # Crop the source to the cell's aspect first so only visible pixels are resampled
+        scale = max(width / image.width, height / image.height)
+        crop_width, crop_height = width / scale, height / scale
+        left = (image.width - crop_width) * centering[0]
+        top = (image.height - crop_height) * centering[1]
+        return resample(image, (width, height), box=(left, top, left + crop_width, top + crop_height))
+
+    if mode == 'contain':
+        scale = min(width / image.width, height / image.height)
+        image = resample(image, (max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+
+    # contain and crop: centre the image on a cell-sized background, cropping any overflow
+    cell = Image.new(image.mode, (width, height), background)
+    x = round((width - image.width) * centering[0])
+    y = round((height - image.height) * centering[1])
+    cell.paste(image, (x, y))
+    return cell
@@ -0,0 +1,73 @@
+"""
+Incremental JSON parsing for streamed LLM output
+"""
+
+import json
+from typing import List, Dict
+
+
+class PanelStreamParser:
+    """
+    Pulls complete objects out of the top-level "panels" array of a JSON
+    document that arrives in arbitrary chunks, as soon as each object closes.
+    """
+
+    def __init__(self, array_key: str = 'panels'):
+        self.array_key = array_key
+        self._text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None
+        self._expect_array = False
+        self._array_depth = None
+        self._object_start = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Add text and return any array items that are now complete"""
+        self._text += chunk
+        completed = []
+
+        while self._pos < len(self._text):
+            char = self._text[self._pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = self._text[self._string_start:self._pos]
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos + 1
+            elif char == ':':
+                # "panels": at the top level of the document
+                self._expect_array = self._depth == 1 and self._last_string == self.array_key
+            elif char in '{[':
+                if char == '[' and self._expect_array and self._array_depth is None:
+                    self._array_depth = self._depth + 1
+                elif char == '{' and self._array_depth is not None and self._depth == self._array_depth:
+                    self._object_start = self._pos
+                self._depth += 1
+                self._expect_array = False
+            elif char in '}]':
+                self._depth -= 1
+                if char == '}' and self._object_start is not None and self._depth == self._array_depth:
+                    item = self._text[self._object_start:self._pos + 1]
+                    self._object_start = None
+                    try:
+                        completed.append(json.loads(item))
+                    except json.JSONDecodeError:
+                        pass  # Skip malformed items rather than lose the rest
+                elif char == ']' and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._array_depth = None
+            elif not char.isspace():
+                self._expect_array = False
+
+            self._pos += 1
+
+        return completed
@@ -0,0 +1,188 @@
+"""
+Layout engine: resolves a layout preset (or a custom geometry) on a page
+format into exact pixel rectangles, and draws the page around the panels
+"""
+
+import functools
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+from config import DEFAULT_PAGE, LAYOUT_MARGIN, LAYOUT_GUTTER, PANEL_BORDER_PX, PANEL_BORDER_COLOR
+from utils.layout_presets import LAYOUT_PRESETS
+
+# Page formats in pixels at 300 DPI
+PAGE_SIZES = {
+    'A4-P': (2480, 3508),  # 210x297mm
+    'A4-L': (3508, 2480),
+    'A5-P': (1748, 2480),  # 148x210mm
+    'A5-L': (2480, 1748),
+    'Letter-P': (2550, 3300),  # 8.5x11in
+    'Letter-L': (3300, 2550),
+    'Square': (2400, 2400),  # 8x8in
+}
+
+PAGE_LABELS = {
+    'A4-P': "A4 - Portrait",
+    'A4-L': "A4 - Landscape",
+    'A5-P': "A5 - Portrait",
+    'A5-L': "A5 - Landscape",
+    'Letter-P': "Letter - Portrait",
+    'Letter-L': "Letter - Landscape",
+    'Square': "Square",
+}
+
+# Also accepts the short forms older clients send ('a4p', 'a4l', ...)
+_PAGE_NAMES = {name.lower().replace('-', ''): name for name in PAGE_SIZES}
+
+
+class PageLayout:
+    """
+    A page size plus one pixel rectangle (x, y, w, h) per panel cell.
+    Preset layouts are cached and shared, so treat instances as read-only.
+    """
+
+    def __init__(self, page_size: Tuple[int, int], rects: List[Tuple[int, int, int, int]],
+                 background: str = '#ffffff', panel_background: str = '#ffffff',
+                 border_width: int = 0, border_color: str = '#000000',
+                 fit: Optional[str] = None, cell_fits: Optional[List[Optional[str]]] = None):
+        self.page_size = tuple(page_size)
+        self.rects = tuple(tuple(rect) for rect in rects)
+        self.background = background
+        self.panel_background = panel_background
+        self.border_width = max(0, int(border_width))
+        self.border_color = border_color
+        self.fit = fit
+        self.cell_fits = tuple(cell_fits or (None,) * len(self.rects))
+
+    def __len__(self):
+        return len(self.rects)
+
+    def rect(self, i: int) -> Optional[Tuple[int, int, int, int]]:
+        """Pixel (x, y, w, h) of cell i, or None if the layout has no such cell"""
+        return self.rects[i] if 0 <= i < len(self.rects) else None
+
+    @property
+    def panel_sizes(self) -> List[Tuple[int, int]]:
+        """(w, h) of every cell, i.e. the resolution each panel is shown at"""
+        return [(w, h) for _, _, w, h in self.rects]
+
+    def fit_mode(self, i: int) -> Optional[str]:
+        """The fit mode cell i asks for (its own, else the layout's), if any"""
+        if 0 <= i < len(self.cell_fits) and self.cell_fits[i]:
+            return self.cell_fits[i]
+        return self.fit
+
+    def new_canvas(self) -> Image.Image:
+        """A blank page; gutters and margins are the page background showing through"""
+        return Image.new('RGB', self.page_size, self.background)
+
+    def draw_borders(self, canvas: Image.Image):
+        """Outline every cell, inside its rectangle so panels keep their size"""
+        if not self.border_width:
+            return
+        draw = ImageDraw.Draw(canvas)
+        for x, y, w, h in self.rects:
+            draw.rectangle([x, y, x + w - 1, y + h - 1], outline=self.border_color, width=self.border_width)
+
+    def as_dict(self) -> Dict:
+        return {
+            'width': self.page_size[0],
+            'height': self.page_size[1],
+            'cells': [{'index': i, 'x': x, 'y': y, 'w': w, 'h': h} for i, (x, y, w, h) in enumerate(self.rects)],
+        }
+
+
+def normalize_page(page: Optional[str]) -> str:
+    """Canonical page format name ('a4l' -> 'A4-L'); raises ValueError for an unknown one"""
+    if not page:
+        return DEFAULT_PAGE
+    name = _PAGE_NAMES.get(str(page).lower().replace('-', ''))
+    if name is None:
+        raise ValueError(f"Unknown page format: {page}")
+    return name
+
+
+def page_size(page: Optional[str]) -> Tuple[int, int]:
+    """Page dimensions in pixels"""
+    return PAGE_SIZES[normalize_page(page)]
+
+
+def get_layout(layout_id: str, page: Optional[str] = None, margin: int = LAYOUT_MARGIN,
+               gutter: int = LAYOUT_GUTTER, num_cells: Optional[int] = None) -> PageLayout:
+    """
+    Pixel layout of a preset on a page. margin is in pixels; gutter is in
+    thousandths of the content box, as the UI has always sent it. num_cells
+    keeps only the first cells, for a short last page.
+    """
+    if layout_id not in LAYOUT_PRESETS:
+        raise ValueError(f"Unknown layout preset: {layout_id}")
+    margin, gutter = int(margin), int(gutter)
+    if margin < 0 or gutter < 0:
+        raise ValueError("margin and gutter must not be negative")
+    return _preset_layout(layout_id, normalize_page(page), margin, gutter, num_cells)
+
+
+@functools.lru_cache(maxsize=256)
+def _preset_layout(layout_id: str, page: str, margin: int, gutter: int, num_cells: Optional[int]) -> PageLayout:
+    preset = LAYOUT_PRESETS[layout_id]
+    page_width, page_height = PAGE_SIZES[page]
+    content_width = page_width - 2 * margin
+    content_height = page_height - 2 * margin
+    if content_width <= 0 or content_height <= 0:
+        raise ValueError(f"margin {margin} leaves no room on a {page} page")
+
+    columns = _tracks(margin, content_width, preset['cols'], gutter)
+    rows = _tracks(margin, content_height, preset['rows'], gutter)
+
+    rects = []
+    for panel in preset['panels'][:num_cells]:
+        first_col, last_col = panel['colStart'] - 1, panel['colStart'] + panel['colSpan'] - 2
+        first_row, last_row = panel['rowStart'] - 1, panel['rowStart'] + panel['rowSpan'] - 2
+        x, y = columns[first_col][0], rows[first_row][0]
+        rects.append((x, y, columns[last_col][1] - x, rows[last_row][1] - y))
+
+    return PageLayout((page_width, page_height), rects, border_width=PANEL_BORDER_PX, border_color=PANEL_BORDER_COLOR)
+
+
+def _tracks(start: int, length: int, count: int, gutter: int) -> List[Tuple[int, int]]:
+    """
+    Split length into count (start, end) pixel tracks separated by equal
+    gutters; rounding is spread so the tracks exactly fill the length
+    """
+    gap = round(length * gutter / 1000)
+    usable = max(count, length - (count - 1) * gap)
+    edges = [round(i * usable / count) for i in range(count + 1)]
+    return [(start + edges[i] + i * gap, start + edges[i + 1] + i * gap) for i in range(count)]
+
+
+def layout_from_geometry(page: Optional[str], geometry: Dict) -> PageLayout:
+    """
+    Pixel layout from a custom geometry: cells given as x/y/w/h fractions of
+    the content box inside outerMarginPx, plus optional page/panel styling
+    """
+    page_width, page_height = page_size(page)
+    margin = int(geometry.get('outerMarginPx', LAYOUT_MARGIN))
+    content_width = page_width - 2 * margin
+    content_height = page_height - 2 * margin
+
+    rects, cell_fits = [], []
+    for index, cell in enumerate(geometry.get('cells', [])):
+        if not isinstance(cell, dict) or not all(isinstance(cell.get(key), (int, float))
+                                                 for key in ('x', 'y', 'w', 'h')):
+            raise ValueError(f"cell {index} needs numeric x, y, w and h")
+        x = margin + int(cell['x'] * content_width)
+        y = margin + int(cell['y'] * content_height)
+        rects.append((x, y, max(1, int(cell['w'] * content_width)), max(1, int(cell['h'] * content_height))))
+        cell_fits.append(cell.get('fit'))
+
+    panel_style = geometry.get('panel', {})
+    return PageLayout(
+        (page_width, page_height), rects,
+        background=geometry.get('page', {}).get('bg', '#ffffff'),
+        panel_background=panel_style.get('bg', '#ffffff'),
+        border_width=panel_style.get('borderPx', 0),
+        border_color=panel_style.get('borderColor', PANEL_BORDER_COLOR),
+        fit=panel_style.get('fit'),
+        cell_fits=cell_fits
+    )
@@ -0,0 +1,93 @@
+"""
+Page layout presets (served to the UI from /api/layouts) and page planning
+for multi-page books
+"""
+
+from typing import List, Optional, Tuple
+
+# Grid layouts adapted from AI Comic Factory; cells are 1-based grid spans
+LAYOUT_PRESETS = {
+    'Layout0': {
+        'label': "2×2 grid (4 equal)",
+        'cols': 2,
+        'rows': 2,
+        'panels': [
+            {'colStart': 1, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 2, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 1, 'colSpan': 1, 'rowStart': 2, 'rowSpan': 1},
+            {'colStart': 2, 'colSpan': 1, 'rowStart': 2, 'rowSpan': 1},
+        ]
+    },
+    'Layout1': {
+        'label': "Tall middle columns",
+        'cols': 2,
+        'rows': 3,
+        'panels': [
+            {'colStart': 1, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 2, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 2},
+            {'colStart': 1, 'colSpan': 1, 'rowStart': 2, 'rowSpan': 2},
+            {'colStart': 2, 'colSpan': 1, 'rowStart': 3, 'rowSpan': 1},
+        ]
+    },
+    'Layout2': {
+        'label': "Right column tall",
+        'cols': 3,
+        'rows': 2,
+        'panels': [
+            {'colStart': 1, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 2, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 3, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 2},
+            {'colStart': 1, 'colSpan': 2, 'rowStart': 2, 'rowSpan': 1},
+        ]
+    },
+    'Layout3': {
+        'label': "Wide top + mixed right",
+        'cols': 3,
+        'rows': 2,
+        'panels': [
+            {'colStart': 1, 'colSpan': 2, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 3, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 1, 'colSpan': 1, 'rowStart': 2, 'rowSpan': 1},
+            {'colStart': 2, 'colSpan': 2, 'rowStart': 2, 'rowSpan': 1},
+        ]
+    },
+    'Layout5': {
+        'label': "Stacked big bottom (5 panels)",
+        'cols': 3,
+        'rows': 3,
+        'panels': [
+            {'colStart': 1, 'colSpan': 2, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 3, 'colSpan': 1, 'rowStart': 1, 'rowSpan': 1},
+            {'colStart': 1, 'colSpan': 1, 'rowStart': 2, 'rowSpan': 1},
+            {'colStart': 2, 'colSpan': 2, 'rowStart': 2, 'rowSpan': 1},
+            {'colStart': 1, 'colSpan': 3, 'rowStart': 3, 'rowSpan': 1},
+        ]
+    },
+}
+
+DEFAULT_LAYOUT = 'Layout0'
+
+
+def plan_pages(num_panels: int, layouts: Optional[List[str]] = None) -> List[Tuple[str, int]]:
+    """
+    Split a story across pages, cycling through layouts. Returns one
+    (layout_id, panel_count) per page; the last page takes the layout that
+    fits the remaining panels with the fewest empty cells.
+    """
+    layouts = [layout for layout in (layouts or list(LAYOUT_PRESETS)) if layout in LAYOUT_PRESETS]
+    if not layouts:
+        raise ValueError("No known layout presets given")
+
+    pages = []
+    remaining = num_panels
+    while remaining > 0:
+        layout = layouts[len(pages) % len(layouts)]
+        capacity = len(LAYOUT_PRESETS[layout]['panels'])
+        if capacity > remaining:
+            layout = min(layouts, key=lambda l: (len(LAYOUT_PRESETS[l]['panels']) < remaining,
+                                                 abs(len(LAYOUT_PRESETS[l]['panels']) - remaining)))
+            capacity = len(LAYOUT_PRESETS[layout]['panels'])
+        count = min(capacity, remaining)
+        pages.append((layout, count))
+        remaining -= count
+    return pages